@@ -1,23 +1,121 @@
 """
 FastAPI application for real-time transaction ingestion.
+
+Ingest handlers validate and enqueue transactions on a bounded asyncio.Queue;
+a background consumer runs anomaly detection and storage in batches. With
+INGEST_ACK_MODE=accepted (default) a request returns 202 once its
+transactions are queued; with INGEST_ACK_MODE=processed it waits until they
+are stored (and fsynced to the write-ahead log, when enabled). A full queue
+is answered with 429, and a stopped consumer or a failed write-ahead log
+fsync with 503, all with Retry-After.
+
+High-volume loads use POST /api/v1/ingest/bulk: columnar JSON, NDJSON or
+Arrow IPC bodies are validated column-wise with NumPy, valid rows are queued
+without building pydantic models, and the response is a summary (accepted
+and rejected counts plus the rejected row indices per field). A bulk body
+larger than the whole queue is queued in batch_size chunks as the consumer
+frees room, instead of being refused with 413.
+
+Durability: each batch is appended to a write-ahead log under
+INGEST_WAL_DIR before it is applied, fsynced in groups every
+INGEST_WAL_FLUSH_MS, replayed on startup and compacted every
+INGEST_COMPACT_INTERVAL_S into date-partitioned Parquet under
+INGEST_PARQUET_DIR (readable by spark_jobs/financial/transaction_processor.py).
+Only uncompacted segments are replayed into the in-memory store. A lookup
+that misses it falls back to the compacted Parquet through an index of the
+newest INGEST_COMPACTED_INDEX_SIZE compacted ids (timestamps normalized to
+UTC ISO strings); older ids, and every id when the size is 0, are 404.
+
+Observability: GET /metrics serves Prometheus text-format request counters,
+latency and batch-size histograms and ingest gauges. With
+METRICS_TRACE_SAMPLE_RATE > 0 a sample of requests is also kept as timing
+traces, served by GET /api/v1/traces.
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
-from pydantic import BaseModel, Field
-from typing import List, Optional
-import logging
-import uuid
-from datetime import datetime
+import asyncio
 import json
+import logging
+import math
+import os
+import random
+import struct
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left
+from collections import Counter, OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from itertools import compress, islice, repeat
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Financial Data Ingestion API")
+ACK_MODES = ("accepted", "processed")
+DATA_DIR = Path(__file__).resolve().parents[1] / "data" / "api"
 
-# In-memory storage (replace with Redis/S3 in production)
-transactions_store = {}
-anomalies_store = []
+
+@dataclass
+class IngestSettings:
+    queue_size: int = 10_000
+    batch_size: int = 500
+    ack_mode: str = "accepted"
+    # processed mode: how long a request waits for its batch before 503.
+    process_timeout_s: float = 5.0
+    retry_after_s: int = 1
+    # Most recent anomalies kept for /api/v1/anomalies; older ones are dropped.
+    anomaly_retention: int = 10_000
+    # Per-account rolling window (rows, including the current one) and the
+    # number of accounts whose state is kept; idle accounts are evicted.
+    anomaly_window: int = 1001
+    anomaly_max_accounts: int = 20_000
+    # Fraction of requests recorded as timing traces, and how many are kept.
+    trace_sample_rate: float = 0.0
+    trace_retention: int = 1_000
+    # Write-ahead log directory; None keeps transactions in memory only.
+    wal_dir: Optional[str] = None
+    wal_flush_ms: float = 10.0
+    compact_interval_s: float = 60.0
+    # Defaults to a "transactions" directory next to wal_dir.
+    parquet_dir: Optional[str] = None
+    # Newest compacted ids still served by GET /api/v1/transactions/{id}; 0 disables it.
+    compacted_index_size: int = 100_000
+
+    @classmethod
+    def from_env(cls) -> "IngestSettings":
+        settings = cls(
+            queue_size=int(os.environ.get("INGEST_QUEUE_SIZE", cls.queue_size)),
+            batch_size=int(os.environ.get("INGEST_BATCH_SIZE", cls.batch_size)),
+            ack_mode=os.environ.get("INGEST_ACK_MODE", cls.ack_mode),
+            process_timeout_s=float(os.environ.get("INGEST_PROCESS_TIMEOUT_S", cls.process_timeout_s)),
+            retry_after_s=int(os.environ.get("INGEST_RETRY_AFTER_S", cls.retry_after_s)),
+            anomaly_retention=int(os.environ.get("ANOMALY_RETENTION", cls.anomaly_retention)),
+            anomaly_window=int(os.environ.get("ANOMALY_WINDOW", cls.anomaly_window)),
+            anomaly_max_accounts=int(os.environ.get("ANOMALY_MAX_ACCOUNTS", cls.anomaly_max_accounts)),
+            trace_sample_rate=float(os.environ.get("METRICS_TRACE_SAMPLE_RATE", cls.trace_sample_rate)),
+            trace_retention=int(os.environ.get("METRICS_TRACE_RETENTION", cls.trace_retention)),
+            # Set INGEST_WAL_DIR="" to disable the write-ahead log.
+            wal_dir=os.environ.get("INGEST_WAL_DIR", str(DATA_DIR / "wal")) or None,
+            wal_flush_ms=float(os.environ.get("INGEST_WAL_FLUSH_MS", cls.wal_flush_ms)),
+            compact_interval_s=float(os.environ.get("INGEST_COMPACT_INTERVAL_S", cls.compact_interval_s)),
+            parquet_dir=os.environ.get("INGEST_PARQUET_DIR") or None,
+            compacted_index_size=int(os.environ.get("INGEST_COMPACTED_INDEX_SIZE", cls.compacted_index_size)),
+        )
+        if settings.ack_mode not in ACK_MODES:
+            raise ValueError(f"INGEST_ACK_MODE must be one of {ACK_MODES}, got {settings.ack_mode!r}")
+        return settings
+
+
+settings = IngestSettings.from_env()
 
 
 class Transaction(BaseModel):
@@ -30,6 +128,18 @@ class Transaction(BaseModel):
     currency: Optional[str] = "USD"
 
 
+class TransactionRow(NamedTuple):
+    """A bulk-ingested transaction, already validated; stored and logged like ``Transaction``."""
+
+    transaction_id: str
+    account_id: str
+    timestamp: str
+    amount: float
+    merchant_category: Optional[str]
+    location: Optional[str]
+    currency: Optional[str]
+
+
 class BatchTransactionRequest(BaseModel):
     transactions: List[Transaction]
 
@@ -40,6 +150,14 @@ class TransactionResponse(BaseModel):
     message: Optional[str] = None
 
 
+class BulkIngestResponse(BaseModel):
+    status: str
+    accepted: int
+    rejected: int
+    # Field name -> indices of the rows rejected for it.
+    errors: Dict[str, List[int]] = {}
+
+
 class AnomalyResponse(BaseModel):
     transaction_id: str
     account_id: str
@@ -48,13 +166,1088 @@ class AnomalyResponse(BaseModel):
     timestamp: str
 
 
+# Rules of FinancialPipeline.detect_anomalies, checked in the same order.
+HIGH_AMOUNT_SIGMAS = 3
+VELOCITY_THRESHOLD = 10
+VERY_HIGH_AMOUNT = 10_000
+
+
+class _AccountWindow:
+    """Last ``window`` amounts of one account (a ring) with their running mean and M2."""
+
+    __slots__ = ("amounts", "next", "mean", "m2")
+
+    def __init__(self) -> None:
+        self.amounts = array("d")
+        self.next = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+
+class AnomalyDetector:
+    """Online version of the Spark job's per-account anomaly rules.
+
+    The batch job evaluates each transaction against a window of the
+    account's previous 1,000 transactions plus itself (``rowsBetween(-1000,
+    0)``). Here the window's mean and variance are kept with Welford updates
+    (add while filling, replace-oldest once full), so each transaction costs
+    O(1) regardless of window size. Results match the batch job when an
+    account's transactions arrive in timestamp order.
+
+    State is kept for the ``max_accounts`` most recently seen accounts; an
+    evicted account starts again from an empty window.
+    """
+
+    def __init__(self, window: int, max_accounts: int) -> None:
+        self.window = window
+        self.max_accounts = max_accounts
+        self.accounts: "OrderedDict[str, _AccountWindow]" = OrderedDict()
+
+    def clear(self) -> None:
+        self.accounts.clear()
+
+    def __len__(self) -> int:
+        return len(self.accounts)
+
+    def observe(self, account_id: str, amount: float) -> Optional[str]:
+        """Add ``amount`` to the account's window and return its anomaly type, if any."""
+        accounts = self.accounts
+        state = accounts.get(account_id)
+        if state is None:
+            state = accounts[account_id] = _AccountWindow()
+            if len(accounts) > self.max_accounts:
+                accounts.popitem(last=False)
+        else:
+            accounts.move_to_end(account_id)
+
+        amounts = state.amounts
+        mean = state.mean
+        if len(amounts) < self.window:
+            amounts.append(amount)
+            n = len(amounts)
+            delta = amount - mean
+            mean += delta / n
+            m2 = state.m2 + delta * (amount - mean)
+        else:
+            n = self.window
+            oldest = amounts[state.next]
+            amounts[state.next] = amount
+            state.next = (state.next + 1) % n
+            delta = amount - oldest
+            new_mean = mean + delta / n
+            m2 = state.m2 + delta * (amount - new_mean + oldest - mean)
+            mean = new_mean
+        state.mean = mean
+        # Rounding can push M2 of a constant window slightly negative.
+        state.m2 = m2 = m2 if m2 > 0.0 else 0.0
+
+        # Sample stddev, undefined (never anomalous) for a single transaction.
+        # The slack absorbs running-sum rounding, e.g. a window of equal
+        # amounts whose mean lands an ulp below them.
+        if n > 1 and amount - mean > HIGH_AMOUNT_SIGMAS * math.sqrt(m2 / (n - 1)) + 1e-9 * amount:
+            return "high_amount"
+        if n > VELOCITY_THRESHOLD:
+            return "high_velocity"
+        if amount > VERY_HIGH_AMOUNT:
+            return "very_high_amount"
+        return None
+
+
+anomaly_detector = AnomalyDetector(settings.anomaly_window, settings.anomaly_max_accounts)
+
+
 def detect_anomaly(txn: Transaction) -> Optional[str]:
-    """Simple anomaly detection for real-time ingestion."""
-    # High amount
-    if txn.amount > 10000:
-        return "very_high_amount"
-    # Add more rules as needed
-    return None
+    """Anomaly detection for real-time ingestion; updates the account's running state."""
+    return anomaly_detector.observe(txn.account_id, txn.amount)
+
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+# Timestamp encodings: ISO strings that round-trip are kept as epoch micros.
+_TS_RAW, _TS_ISO_T, _TS_ISO_SPACE = 0, 1, 2
+
+
+class _Dictionary:
+    """Interns strings as small integer codes; code 0 is ``None``."""
+
+    __slots__ = ("codes", "values")
+
+    def __init__(self) -> None:
+        self.codes: Dict[str, int] = {}
+        self.values: List[Optional[str]] = [None]
+
+    def encode(self, value: Optional[str]) -> int:
+        if value is None:
+            return 0
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class TransactionStore:
+    """Columnar in-memory transactions: one typed array per field.
+
+    Account ids and the low-cardinality string fields are dictionary-encoded,
+    timestamps that are naive ISO strings are stored as epoch microseconds
+    (others verbatim in a side table), and ``transaction_id`` maps to its row
+    through a hash index. A record costs ~185 bytes, mostly its id string
+    and index entry, against ~460 bytes as a ``model_dump()`` dict.
+    """
+
+    def __init__(self) -> None:
+        self.clear()
+
+    def clear(self) -> None:
+        self.index: Dict[str, int] = {}
+        self.transaction_ids: List[str] = []
+        self.accounts = _Dictionary()
+        self.categories = _Dictionary()
+        self.account_codes = array("I")
+        self.amounts = array("d")
+        self.ts_micros = array("q")
+        self.ts_kinds = array("B")
+        self.raw_timestamps: Dict[int, str] = {}
+        self.merchant_codes = array("I")
+        self.location_codes = array("I")
+        self.currency_codes = array("I")
+
+    def __len__(self) -> int:
+        return len(self.transaction_ids)
+
+    def __contains__(self, transaction_id: str) -> bool:
+        return transaction_id in self.index
+
+    def _encode_timestamp(self, row: int, value: str) -> tuple:
+        kind = _TS_RAW
+        try:
+            ts = datetime.fromisoformat(value)
+        except ValueError:
+            ts = None
+        if ts is None or ts.tzinfo is not None:
+            pass
+        elif len(value) == 19 and value[10] in "T " and value[4] == "-" and value[13] == ":" and value[16] == ":":
+            # Fast path: "YYYY-MM-DD[T ]HH:MM:SS" always round-trips. fromisoformat
+            # accepts any separator character, so others are kept raw below.
+            kind = _TS_ISO_T if value[10] == "T" else _TS_ISO_SPACE
+        elif ts.isoformat(sep="T") == value:
+            kind = _TS_ISO_T
+        elif ts.isoformat(sep=" ") == value:
+            kind = _TS_ISO_SPACE
+        if kind == _TS_RAW:
+            self.raw_timestamps[row] = value
+            return 0, kind
+        if self.raw_timestamps:
+            self.raw_timestamps.pop(row, None)
+        return (ts - _EPOCH) // _MICROSECOND, kind
+
+    def timestamp(self, row: int) -> str:
+        kind = self.ts_kinds[row]
+        if kind == _TS_RAW:
+            return self.raw_timestamps[row]
+        ts = _EPOCH + timedelta(microseconds=self.ts_micros[row])
+        return ts.isoformat(sep="T" if kind == _TS_ISO_T else " ")
+
+    def add(self, txn: Transaction) -> int:
+        """Store ``txn`` and return its row; a known ``transaction_id`` is overwritten in place."""
+        row = self.index.get(txn.transaction_id)
+        if row is not None:
+            self._overwrite(row, txn)
+            return row
+        row = len(self.transaction_ids)
+        micros, kind = self._encode_timestamp(row, txn.timestamp)
+        encode = self.categories.encode
+        self.index[txn.transaction_id] = row
+        self.transaction_ids.append(txn.transaction_id)
+        self.account_codes.append(self.accounts.encode(txn.account_id))
+        self.amounts.append(txn.amount)
+        self.ts_micros.append(micros)
+        self.ts_kinds.append(kind)
+        self.merchant_codes.append(encode(txn.merchant_category))
+        self.location_codes.append(encode(txn.location))
+        self.currency_codes.append(encode(txn.currency))
+        return row
+
+    def _overwrite(self, row: int, txn: Transaction) -> None:
+        encode = self.categories.encode
+        self.ts_micros[row], self.ts_kinds[row] = self._encode_timestamp(row, txn.timestamp)
+        self.account_codes[row] = self.accounts.encode(txn.account_id)
+        self.amounts[row] = txn.amount
+        self.merchant_codes[row] = encode(txn.merchant_category)
+        self.location_codes[row] = encode(txn.location)
+        self.currency_codes[row] = encode(txn.currency)
+
+    def get(self, transaction_id: str) -> Optional[dict]:
+        """The stored transaction as ``Transaction.model_dump()`` would return it."""
+        row = self.index.get(transaction_id)
+        if row is None:
+            return None
+        category = self.categories.values
+        return {
+            "transaction_id": transaction_id,
+            "account_id": self.accounts.values[self.account_codes[row]],
+            "timestamp": self.timestamp(row),
+            "amount": self.amounts[row],
+            "merchant_category": category[self.merchant_codes[row]],
+            "location": category[self.location_codes[row]],
+            "currency": category[self.currency_codes[row]],
+        }
+
+
+class AnomalyLog:
+    """Ring buffer of the most recent anomalies, as ``(row, anomaly_type)``."""
+
+    def __init__(self, store: TransactionStore, retention: int) -> None:
+        self.store = store
+        self.recent_rows: deque = deque(maxlen=retention)
+        self.total = 0
+        self.by_type: Counter = Counter()
+
+    def clear(self) -> None:
+        self.recent_rows.clear()
+        self.total = 0
+        self.by_type.clear()
+
+    def __len__(self) -> int:
+        return len(self.recent_rows)
+
+    def append(self, row: int, anomaly_type: str) -> None:
+        self.recent_rows.append((row, anomaly_type))
+        self.total += 1
+        self.by_type[anomaly_type] += 1
+
+    def recent(self, limit: int) -> List[dict]:
+        """The last ``limit`` anomalies, oldest first (``list[-limit:]`` semantics)."""
+        if limit > 0:
+            entries = list(islice(reversed(self.recent_rows), limit))[::-1]
+        else:
+            entries = list(self.recent_rows)[-limit:]
+        store = self.store
+        return [
+            {
+                "transaction_id": store.transaction_ids[row],
+                "account_id": store.accounts.values[store.account_codes[row]],
+                "amount": store.amounts[row],
+                "anomaly_type": anomaly_type,
+                "timestamp": store.timestamp(row),
+            }
+            for row, anomaly_type in entries
+        ]
+
+
+# In-memory storage (replace with Redis/S3 in production)
+transactions_store = TransactionStore()
+anomalies_store = AnomalyLog(transactions_store, settings.anomaly_retention)
+
+
+def process_batch(batch: Sequence[Transaction]) -> int:
+    """Run anomaly detection on and store a batch; returns the anomalies found.
+
+    A transaction id already in the store is a client retry: it overwrites
+    the stored row but is not observed again, so retries neither add
+    anomalies nor skew the per-account amount and velocity state.
+    """
+    anomalies = 0
+    for txn in batch:
+        seen = txn.transaction_id in transactions_store
+        row = transactions_store.add(txn)
+        if seen:
+            continue
+        anomaly_type = detect_anomaly(txn)
+        if anomaly_type:
+            anomalies_store.append(row, anomaly_type)
+            anomalies += 1
+    return anomalies
+
+
+# Column order of log records and of the compacted Parquet files.
+LOG_FIELDS = ("transaction_id", "account_id", "timestamp", "amount", "merchant_category", "location", "currency")
+_FRAME_HEADER = struct.Struct("<II")  # payload length, crc32
+# Hive's name for a NULL partition value, which Spark reads back as null.
+_NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+
+def _read_frames(path: Path) -> Iterator[list]:
+    """Decoded batches in ``path``; a torn or corrupt tail is truncated away."""
+    data = path.read_bytes()
+    pos = 0
+    while pos + _FRAME_HEADER.size <= len(data):
+        length, crc = _FRAME_HEADER.unpack_from(data, pos)
+        start = pos + _FRAME_HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        yield json.loads(payload)
+        pos = start + length
+    if pos < len(data):
+        logger.warning("Truncating %d bytes of incomplete log tail in %s", len(data) - pos, path.name)
+        os.truncate(path, pos)
+
+
+def _partition_date(value: str) -> tuple:
+    """``(UTC timestamp or None, date partition)`` for a transaction timestamp string."""
+    try:
+        ts = datetime.fromisoformat(value)
+    except ValueError:
+        return None, _NULL_PARTITION
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts, ts.date().isoformat()
+
+
+def compact_segment(segment: Path, parquet_dir: Path) -> Dict[Path, List[str]]:
+    """Rewrite one sealed log segment as Parquet under ``parquet_dir/date=YYYY-MM-DD/``.
+
+    Files are named after the segment, so re-running after a crash between
+    writing and deleting the segment overwrites rather than duplicates.
+    Returns the transaction ids written to each file, in log order.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        pa.field("transaction_id", pa.string(), nullable=False),
+        pa.field("account_id", pa.string(), nullable=False),
+        # UTC-adjusted micros, which Spark reads as TimestampType.
+        pa.field("timestamp", pa.timestamp("us", tz="UTC")),
+        pa.field("amount", pa.float64(), nullable=False),
+        pa.field("merchant_category", pa.string()),
+        pa.field("location", pa.string()),
+        pa.field("currency", pa.string()),
+    ])
+    partitions: Dict[str, List[list]] = {}
+    for batch in _read_frames(segment):
+        for record in batch:
+            ts, date = _partition_date(record[2])
+            partitions.setdefault(date, []).append([*record[:2], ts, *record[3:]])
+
+    written: Dict[Path, List[str]] = {}
+    for date, records in partitions.items():
+        columns = list(zip(*records))
+        table = pa.Table.from_arrays([pa.array(col, type=f.type) for col, f in zip(columns, schema)], schema=schema)
+        out = parquet_dir / f"date={date}" / f"part-{segment.stem}.parquet"
+        out.parent.mkdir(parents=True, exist_ok=True)
+        tmp = out.with_name(out.name + ".tmp")
+        pq.write_table(table, tmp)
+        os.replace(tmp, out)
+        written[out] = list(columns[0])
+    segment.unlink()
+    return written
+
+
+class TransactionLog:
+    """Append-only, group-committed write-ahead log of ingested batches.
+
+    Each batch is one ``length | crc32 | json`` frame appended to the active
+    ``wal-NNNNNNNN.log`` segment without fsync; ``run`` fsyncs every
+    ``flush_ms`` (in a worker thread) and then resolves the futures of the
+    batches that fsync covered, so the cost is amortized over every batch in
+    the window. Every ``compact_interval_s`` the active segment is sealed and
+    sealed segments are compacted to Parquet and deleted.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        parquet_dir: Path,
+        flush_ms: float,
+        compact_interval_s: float,
+        index_size: int = 100_000,
+    ) -> None:
+        self.directory = directory
+        self.parquet_dir = parquet_dir
+        # transaction_id -> compacted part with its newest copy, oldest first and
+        # capped at index_size; written by the compaction thread, read by lookups.
+        self.index_size = index_size
+        self._index: "OrderedDict[str, Path]" = OrderedDict()
+        self._index_lock = threading.Lock()
+        self.flush_s = flush_ms / 1000
+        self.compact_interval_s = compact_interval_s
+        self._fd: Optional[int] = None
+        self._segment: Optional[Path] = None
+        self._dirty = False
+        self._waiters: List[asyncio.Future] = []
+        self._task: Optional[asyncio.Task] = None
+        self._compaction: Optional[asyncio.Task] = None
+        self._pyarrow_missing_logged = False
+        self.fsyncs = 0
+        # Set by the first failed fsync. Linux may drop the dirty pages of a
+        # failed fsync, so a retry could report success for lost writes; the
+        # log stays failed and ingestion is refused until a restart.
+        self.failed: Optional[OSError] = None
+
+    def segments(self) -> List[Path]:
+        return sorted(self.directory.glob("wal-*.log"))
+
+    def replay(self) -> Iterator[List[Transaction]]:
+        """Batches from every segment still on disk, oldest first."""
+        for segment in self.segments():
+            for batch in _read_frames(segment):
+                yield [Transaction.model_construct(**dict(zip(LOG_FIELDS, record))) for record in batch]
+
+    def open(self) -> None:
+        """Start a new active segment (previous ones stay sealed until compacted)."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        existing = self.segments()
+        seq = int(existing[-1].stem.split("-")[1]) + 1 if existing else 1
+        self._segment = self.directory / f"wal-{seq:08d}.log"
+        self._fd = os.open(self._segment, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def append(self, txns: List[Transaction]) -> None:
+        records = [[getattr(txn, name) for name in LOG_FIELDS] for txn in txns]
+        payload = json.dumps(records, separators=(",", ":")).encode()
+        frame = memoryview(_FRAME_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+        while frame:
+            frame = frame[os.write(self._fd, frame):]
+        self._dirty = True
+
+    def when_durable(self, done: asyncio.Future) -> None:
+        """Resolve ``done`` after the next fsync (everything appended so far is covered)."""
+        if self.failed is not None:
+            done.set_exception(self.failed)
+            return
+        self._waiters.append(done)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run())
+
+    async def run(self) -> None:
+        last_compaction = time.monotonic()
+        while True:
+            await asyncio.sleep(self.flush_s)
+            await self.sync()
+            if self.failed is not None:
+                return
+            if time.monotonic() - last_compaction >= self.compact_interval_s:
+                last_compaction = time.monotonic()
+                await self.rotate()
+                self.compact()
+
+    async def _fsync(self, fd: int, waiters: List[asyncio.Future], close: bool = False) -> None:
+        """fsync ``fd`` and settle ``waiters``; a failure marks the log failed instead of raising."""
+        try:
+            await asyncio.to_thread(os.fsync, fd)
+            self.fsyncs += 1
+        except OSError as exc:
+            logger.exception("fsync of the transaction log failed; refusing ingestion until restart")
+            self.failed = exc
+            for done in [*waiters, *self._waiters]:
+                if not done.done():
+                    done.set_exception(exc)
+            self._waiters = []
+            return
+        finally:
+            if close:
+                os.close(fd)
+        for done in waiters:
+            if not done.done():
+                done.set_result(None)
+
+    async def sync(self) -> None:
+        waiters, self._waiters = self._waiters, []
+        if self.failed is not None:
+            for done in waiters:
+                if not done.done():
+                    done.set_exception(self.failed)
+            return
+        if not self._dirty:
+            for done in waiters:
+                if not done.done():
+                    done.set_result(None)
+            return
+        self._dirty = False
+        await self._fsync(self._fd, waiters)
+
+    async def rotate(self) -> None:
+        """Seal the active segment: switch appends to a new one, then fsync and close the old."""
+        old_fd, waiters, dirty = self._fd, self._waiters, self._dirty
+        self._waiters, self._dirty = [], False
+        self.open()
+        if dirty or waiters:
+            await self._fsync(old_fd, waiters, close=True)
+        else:
+            os.close(old_fd)
+
+    def compact(self) -> None:
+        """Compact sealed segments to Parquet in a worker thread, one run at a time."""
+        if self._compaction is not None and not self._compaction.done():
+            return
+        sealed = [segment for segment in self.segments() if segment != self._segment]
+        if not sealed:
+            return
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            if not self._pyarrow_missing_logged:
+                logger.warning("pyarrow is not installed; keeping the transaction log uncompacted")
+                self._pyarrow_missing_logged = True
+            return
+        self._compaction = asyncio.create_task(asyncio.to_thread(self._compact_segments, sealed))
+
+    def _compact_segments(self, sealed: List[Path]) -> None:
+        for segment in sealed:
+            try:
+                written = compact_segment(segment, self.parquet_dir)
+            except Exception:
+                logger.exception("Compacting %s failed; it will be retried", segment.name)
+                return
+            for part, ids in written.items():
+                self._index_part(part, ids)
+            logger.info("Compacted %s: %d transactions", segment.name, sum(map(len, written.values())))
+
+    def _index_part(self, part: Path, ids: Sequence[str]) -> None:
+        with self._index_lock:
+            index = self._index
+            for transaction_id in ids:
+                index[transaction_id] = part
+                index.move_to_end(transaction_id)
+            while len(index) > self.index_size:
+                index.popitem(last=False)
+
+    def load_index(self) -> None:
+        """Index the ids of the newest compacted parts, up to ``index_size`` (at startup)."""
+        if self.index_size <= 0:
+            return
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            return
+        # Parts are named after their segment, so names sort oldest to newest.
+        parts = sorted(self.parquet_dir.glob("date=*/part-wal-*.parquet"), key=lambda path: path.name, reverse=True)
+        newest: List[tuple] = []
+        total = 0
+        for part in parts:
+            if total >= self.index_size:
+                break
+            ids = pq.read_table(part, columns=["transaction_id"]).column(0).to_pylist()
+            newest.append((part, ids))
+            total += len(ids)
+        for part, ids in reversed(newest):
+            self._index_part(part, ids)
+
+    def lookup(self, transaction_id: str) -> Optional[dict]:
+        """The newest compacted copy of ``transaction_id``, or None.
+
+        Only indexed ids are looked up, reading the one part that holds
+        them, so a miss costs a dict lookup instead of a scan of the history.
+        """
+        with self._index_lock:
+            part = self._index.get(transaction_id)
+        if part is None:
+            return None
+        import pyarrow.parquet as pq
+
+        rows = pq.read_table(part, filters=[("transaction_id", "=", transaction_id)]).to_pylist()
+        if not rows:
+            return None
+        record = rows[-1]
+        ts = record["timestamp"]
+        record["timestamp"] = None if ts is None else ts.replace(tzinfo=None).isoformat()
+        return record
+
+    async def close(self) -> None:
+        """Stop the flusher, fsync and close the active segment, and let compaction finish."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                logger.exception("Transaction log flusher failed")
+        try:
+            await self.sync()
+            if self._compaction is not None:
+                await self._compaction
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+
+class IngestQueue:
+    """Bounded transaction queue drained in batches by one consumer task.
+
+    Items are ``(chunk, done)``: up to ``batch_size`` transactions from one
+    request and a future set once they are stored, and durable when there
+    is a ``log`` (processed mode only). Capacity is counted in transactions,
+    not items. The queue is FIFO and the consumer handles batches in order,
+    so a request only needs a future on its last chunk.
+    """
+
+    def __init__(self, maxsize: int, batch_size: int, log: Optional[TransactionLog] = None) -> None:
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.log = log
+        self.depth = 0
+        self.processed = 0
+        self._consumer: Optional[asyncio.Task] = None
+        # Set whenever the consumer frees capacity (or stops), for put_progressively.
+        self._space = asyncio.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._consumer is not None and not self._consumer.done()
+
+    def free_slots(self) -> int:
+        return self.maxsize - self.depth
+
+    def start(self) -> None:
+        self._consumer = asyncio.create_task(self._consume())
+
+    async def stop(self) -> None:
+        """Process everything already queued, then stop the consumer."""
+        if self.running:
+            await self.queue.join()
+            self._consumer.cancel()
+            try:
+                await self._consumer
+            except asyncio.CancelledError:
+                pass
+        self._consumer = None
+        self._space.set()
+
+    def put_all(self, txns: Sequence[Transaction], wait: bool) -> Optional[asyncio.Future]:
+        """Enqueue all of ``txns`` or none of them (caller checked ``free_slots``)."""
+        done = asyncio.get_running_loop().create_future() if wait else None
+        size = self.batch_size
+        starts = range(0, len(txns), size)
+        for start in starts:
+            self.queue.put_nowait((txns[start:start + size], done if start == starts[-1] else None))
+        self.depth += len(txns)
+        return done
+
+    async def put_progressively(self, txns: Sequence[Transaction], wait: bool) -> Optional[asyncio.Future]:
+        """Enqueue ``txns`` one ``batch_size`` chunk at a time, waiting for room before each.
+
+        For bodies larger than the whole queue: at most ``maxsize`` of them
+        are ever queued. Raises RuntimeError if the consumer stops midway;
+        the chunks already queued are still processed.
+        """
+        done = asyncio.get_running_loop().create_future() if wait else None
+        size = self.batch_size
+        starts = range(0, len(txns), size)
+        for start in starts:
+            chunk = txns[start:start + size]
+            while self.free_slots() < len(chunk):
+                if not self.running:
+                    raise RuntimeError("ingest consumer stopped")
+                self._space.clear()
+                await self._space.wait()
+            self.queue.put_nowait((chunk, done if start == starts[-1] else None))
+            self.depth += len(chunk)
+        return done
+
+    async def _consume(self) -> None:
+        queue = self.queue
+        while True:
+            items = [await queue.get()]
+            n = len(items[0][0])
+            while n < self.batch_size and not queue.empty():
+                items.append(queue.get_nowait())
+                n += len(items[-1][0])
+            try:
+                batch = items[0][0] if len(items) == 1 else [txn for chunk, _ in items for txn in chunk]
+                if self.log is not None:
+                    self.log.append(batch)
+                anomalies = process_batch(batch)
+                self.processed += n
+                BATCH_SIZE.observe((), n)
+                logger.debug("Processed %d transactions, %d anomalies", len(items), anomalies)
+                for _, done in items:
+                    if done is None or done.done():
+                        continue
+                    if self.log is not None:
+                        self.log.when_durable(done)
+                    else:
+                        done.set_result(None)
+            except Exception as exc:
+                logger.exception("Failed to process a batch of %d transactions", len(items))
+                for _, done in items:
+                    if done is not None and not done.done():
+                        done.set_exception(exc)
+            finally:
+                self.depth -= n
+                self._space.set()
+                for _ in items:
+                    queue.task_done()
+
+
+ingest_queue: Optional[IngestQueue] = None
+transaction_log: Optional[TransactionLog] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global ingest_queue, transaction_log
+    log = None
+    if settings.wal_dir:
+        wal_dir = Path(settings.wal_dir)
+        parquet_dir = Path(settings.parquet_dir) if settings.parquet_dir else wal_dir.parent / "transactions"
+        log = TransactionLog(
+            wal_dir, parquet_dir, settings.wal_flush_ms, settings.compact_interval_s, settings.compacted_index_size
+        )
+        log.load_index()
+        replayed = 0
+        for batch in log.replay():
+            process_batch(batch)
+            replayed += len(batch)
+        logger.info("Replayed %d transactions from %s", replayed, wal_dir)
+        log.open()
+        log.start()
+    transaction_log = log
+    ingest_queue = IngestQueue(settings.queue_size, settings.batch_size, log)
+    ingest_queue.start()
+    try:
+        yield
+    finally:
+        await ingest_queue.stop()
+        if log is not None:
+            await log.close()
+        transaction_log = None
+
+
+# Metrics. Everything is updated from the event loop thread (middleware and
+# the ingest consumer), so plain counters need no locks.
+def log_buckets(start: float, factor: float, count: int) -> tuple:
+    """``count`` histogram upper bounds: ``start``, ``start * factor``, ..."""
+    return tuple(start * factor ** i for i in range(count))
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class CounterMetric:
+    """Monotonic counter with one series per label tuple."""
+
+    def __init__(self, name: str, help: str, labels: tuple = ()) -> None:
+        self.name, self.help, self.labels = name, help, labels
+        self.values: Dict[tuple, float] = {}
+
+    def clear(self) -> None:
+        self.values.clear()
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_labels(self.labels, labels)} {value:g}")
+        return lines
+
+
+class HistogramMetric:
+    """Histogram over fixed bucket bounds; ``observe`` is one bisect and three adds."""
+
+    def __init__(self, name: str, help: str, buckets: tuple, labels: tuple = ()) -> None:
+        self.name, self.help, self.labels = name, help, labels
+        self.buckets = buckets
+        # labels -> [per-bucket counts (last is +Inf), sum, count]
+        self.series: Dict[tuple, list] = {}
+
+    def clear(self) -> None:
+        self.series.clear()
+
+    def observe(self, labels: tuple, value: float) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, n in zip((*(f"{b:g}" for b in self.buckets), "+Inf"), counts):
+                cumulative += n
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {total:g}")
+            lines.append(f"{self.name}_count{_labels(self.labels, labels)} {count}")
+        return lines
+
+
+REQUESTS = CounterMetric("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+# 100us .. ~13s in powers of two.
+REQUEST_LATENCY = HistogramMetric(
+    "http_request_duration_seconds", "HTTP request latency.", log_buckets(0.0001, 2, 18), ("method", "route")
+)
+BATCH_SIZE = HistogramMetric("ingest_batch_size", "Transactions per consumer batch.", log_buckets(1, 2, 17))
+# Sampled request timings, newest last.
+request_traces: deque = deque(maxlen=settings.trace_retention)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts and latency by route template.
+
+    Unmatched paths share one ``route`` label so path parameters cannot
+    create unbounded series. A ``trace_sample_rate`` fraction of requests is
+    also kept in ``request_traces``.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_status(message) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            method = scope["method"]
+            REQUESTS.inc((method, path, status[0]))
+            REQUEST_LATENCY.observe((method, path), elapsed)
+            if settings.trace_sample_rate and random.random() < settings.trace_sample_rate:
+                request_traces.append({
+                    "start": time.time() - elapsed,
+                    "method": method,
+                    "route": path,
+                    "path": scope["path"],
+                    "status": status[0],
+                    "duration_ms": round(elapsed * 1000, 3),
+                    "queue_depth": ingest_queue.depth if ingest_queue is not None else 0,
+                })
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in (REQUESTS, REQUEST_LATENCY, BATCH_SIZE):
+        lines.extend(metric.render())
+    processed = ingest_queue.processed if ingest_queue is not None else 0
+    depth = ingest_queue.depth if ingest_queue is not None else 0
+    log = ingest_queue.log if ingest_queue is not None else None
+    lines += [
+        "# HELP ingest_transactions_total Transactions processed by the ingest consumer.",
+        "# TYPE ingest_transactions_total counter",
+        f"ingest_transactions_total {processed}",
+        "# HELP ingest_anomalies_total Anomalies detected, by rule.",
+        "# TYPE ingest_anomalies_total counter",
+        *(f'ingest_anomalies_total{{type="{t}"}} {n}' for t, n in sorted(anomalies_store.by_type.items())),
+        "# HELP ingest_queue_depth Transactions waiting in the ingest queue.",
+        "# TYPE ingest_queue_depth gauge",
+        f"ingest_queue_depth {depth}",
+        "# HELP ingest_queue_capacity Maximum transactions in the ingest queue.",
+        "# TYPE ingest_queue_capacity gauge",
+        f"ingest_queue_capacity {settings.queue_size}",
+        "# HELP ingest_wal_fsyncs_total Group-commit fsyncs of the write-ahead log.",
+        "# TYPE ingest_wal_fsyncs_total counter",
+        f"ingest_wal_fsyncs_total {log.fsyncs if log is not None else 0}",
+        "# HELP anomaly_tracked_accounts Accounts with online anomaly state.",
+        "# TYPE anomaly_tracked_accounts gauge",
+        f"anomaly_tracked_accounts {len(anomaly_detector)}",
+        "# HELP stored_transactions Transactions in the in-memory store.",
+        "# TYPE stored_transactions gauge",
+        f"stored_transactions {len(transactions_store)}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+app = FastAPI(title="Financial Data Ingestion API", lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+
+
+def _unavailable(status_code: int, detail: str) -> HTTPException:
+    return HTTPException(status_code=status_code, detail=detail, headers={"Retry-After": str(settings.retry_after_s)})
+
+
+async def _enqueue(txns: Sequence[Transaction], response: Response, progressive: bool = False) -> str:
+    """Queue ``txns`` and, in processed mode, wait for them; returns the ack status.
+
+    With ``progressive`` (bulk bodies), more transactions than the queue holds
+    are queued chunk by chunk as room frees up; only the first chunk has to
+    fit right away.
+    """
+    if ingest_queue is None or not ingest_queue.running:
+        raise _unavailable(503, "Ingestion consumer is not running")
+    if ingest_queue.log is not None and ingest_queue.log.failed is not None:
+        raise _unavailable(503, "Write-ahead log failed; transactions cannot be made durable")
+    oversized = len(txns) > ingest_queue.maxsize
+    if oversized and not progressive:
+        raise HTTPException(status_code=413, detail=f"Batch larger than the ingest queue ({ingest_queue.maxsize})")
+    if ingest_queue.free_slots() < (min(len(txns), ingest_queue.batch_size) if oversized else len(txns)):
+        raise _unavailable(429, "Ingest queue is full")
+
+    wait = settings.ack_mode == "processed"
+    if oversized:
+        try:
+            done = await ingest_queue.put_progressively(txns, wait)
+        except RuntimeError:
+            raise _unavailable(503, "Ingestion stopped while queueing; retrying is safe")
+    else:
+        done = ingest_queue.put_all(txns, wait)
+    if done is None:
+        response.status_code = 202
+        return "accepted"
+    try:
+        await asyncio.wait_for(asyncio.shield(done), settings.process_timeout_s)
+    except asyncio.TimeoutError:
+        raise _unavailable(503, "Accepted but not processed in time; retrying is safe")
+    except OSError:
+        raise _unavailable(503, "Write-ahead log failed; transactions cannot be made durable")
+    return "processed"
+
+
+# Bulk request bodies, by Content-Type.
+_BULK_JSON = "application/json"
+_BULK_NDJSON = ("application/x-ndjson", "application/ndjson")
+_BULK_ARROW = ("application/vnd.apache.arrow.stream", "application/vnd.apache.arrow.file")
+_REQUIRED_COLUMNS = ("transaction_id", "account_id", "timestamp", "amount")
+_OPTIONAL_COLUMNS = {"merchant_category": None, "location": None, "currency": "USD"}
+
+
+def _unprocessable(detail: str) -> HTTPException:
+    return HTTPException(status_code=422, detail=detail)
+
+
+def _ndjson_columns(body: bytes) -> Dict[str, list]:
+    lines = [line for line in body.splitlines() if line.strip()]
+    try:
+        rows = json.loads(b"[" + b",".join(lines) + b"]")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid NDJSON: {exc}")
+    if not all(map(isinstance, rows, repeat(dict))):
+        raise _unprocessable("Every NDJSON line must be a transaction object")
+    columns: Dict[str, list] = {name: [row.get(name) for row in rows] for name in _REQUIRED_COLUMNS}
+    for name, default in _OPTIONAL_COLUMNS.items():
+        columns[name] = [row.get(name, default) for row in rows]
+    return columns
+
+
+def _arrow_columns(body: bytes, content_type: str) -> Dict[str, Any]:
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise HTTPException(status_code=415, detail="Arrow bodies need pyarrow installed on the server")
+    try:
+        reader = pa.ipc.open_stream(body) if content_type == _BULK_ARROW[0] else pa.ipc.open_file(body)
+        table = reader.read_all()
+    except pa.ArrowInvalid as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid Arrow IPC body: {exc}")
+    columns: Dict[str, Any] = {}
+    for name in table.column_names:
+        column = table.column(name)
+        if name == "amount":
+            try:
+                # Nulls become NaN and fail the amount check.
+                columns[name] = column.cast(pa.float64()).to_numpy(zero_copy_only=False)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                columns[name] = column.to_pylist()
+        else:
+            columns[name] = column.to_pylist()
+    return columns
+
+
+def parse_bulk_body(body: bytes, content_type: str) -> Dict[str, Any]:
+    """Columns of a bulk request body, keyed by ``Transaction`` field name."""
+    content_type = content_type.split(";")[0].strip().lower()
+    if content_type in _BULK_NDJSON:
+        return _ndjson_columns(body)
+    if content_type in _BULK_ARROW:
+        return _arrow_columns(body, content_type)
+    if content_type != _BULK_JSON:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Use {_BULK_JSON} (columnar), {_BULK_NDJSON[0]} or {_BULK_ARROW[0]}",
+        )
+    try:
+        columns = json.loads(body)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {exc}")
+    if not isinstance(columns, dict):
+        raise _unprocessable('Columnar JSON must be an object of arrays, e.g. {"amount": [...], ...}')
+    return columns
+
+
+def _is_str(values: Sequence, n: int, nullable: bool = False) -> np.ndarray:
+    ok = np.fromiter(map(isinstance, values, repeat(str)), dtype=bool, count=n)
+    if nullable:
+        ok |= np.fromiter(map(isinstance, values, repeat(type(None))), dtype=bool, count=n)
+    return ok
+
+
+def _amounts(values: Any, n: int) -> np.ndarray:
+    """``values`` as float64; entries that are not numbers become NaN."""
+    if isinstance(values, np.ndarray) and values.dtype == np.float64:
+        return values
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        numeric = (int, float)
+        return np.fromiter(
+            (v if isinstance(v, numeric) and not isinstance(v, bool) else np.nan for v in values),
+            dtype=np.float64,
+            count=n,
+        )
+
+
+def validate_columns(columns: Dict[str, Any]) -> tuple:
+    """Check ``columns`` against the ``Transaction`` model, one column at a time.
+
+    Returns ``(rows, rejected, errors)``: the valid rows as ``TransactionRow``
+    tuples in request order, the number of rejected rows, and their indices
+    by offending field.
+    """
+    missing = [name for name in _REQUIRED_COLUMNS if columns.get(name) is None]
+    if missing:
+        raise _unprocessable(f"Missing columns: {', '.join(missing)}")
+    lengths = set()
+    for name in TransactionRow._fields:
+        column = columns.get(name)
+        if column is None and name in _OPTIONAL_COLUMNS:
+            continue
+        if not isinstance(column, (list, np.ndarray)):
+            raise _unprocessable(f"Column {name!r} must be an array")
+        lengths.add(len(column))
+    if len(lengths) != 1:
+        raise _unprocessable("Every column must have the same length")
+    n = lengths.pop()
+
+    amounts = _amounts(columns["amount"], n)
+    checks = {
+        "transaction_id": _is_str(columns["transaction_id"], n),
+        "account_id": _is_str(columns["account_id"], n),
+        "timestamp": _is_str(columns["timestamp"], n),
+        # Also rejects NaN, as Field(gt=0) does.
+        "amount": amounts > 0,
+    }
+    for name in _OPTIONAL_COLUMNS:
+        if columns.get(name) is not None:
+            checks[name] = _is_str(columns[name], n, nullable=True)
+    valid = np.logical_and.reduce(list(checks.values()))
+    errors = {name: np.flatnonzero(~ok).tolist() for name, ok in checks.items() if not ok.all()}
+
+    values = [
+        amounts.tolist() if name == "amount"
+        else columns.get(name) if columns.get(name) is not None
+        else repeat(_OPTIONAL_COLUMNS[name], n)
+        for name in TransactionRow._fields
+    ]
+    records = zip(*values)
+    if errors:
+        records = compress(records, valid.tolist())
+    rows = list(map(TransactionRow._make, records))
+    return rows, n - len(rows), errors
 
 
 @app.get("/health")
@@ -63,79 +1256,58 @@ def health_check():
 
 
 @app.post("/api/v1/ingest", response_model=TransactionResponse)
-def ingest_transaction(txn: Transaction, background_tasks: BackgroundTasks):
+async def ingest_transaction(txn: Transaction, response: Response):
     """Ingest a single transaction."""
-    logger.info(f"Received transaction: {txn.transaction_id}")
-    
-    # Check for anomaly
-    anomaly_type = detect_anomaly(txn)
-    
-    # Store transaction
-    transactions_store[txn.transaction_id] = txn.dict()
-    
-    if anomaly_type:
-        anomaly = AnomalyResponse(
-            transaction_id=txn.transaction_id,
-            account_id=txn.account_id,
-            amount=txn.amount,
-            anomaly_type=anomaly_type,
-            timestamp=txn.timestamp
-        )
-        anomalies_store.append(anomaly.dict())
-        logger.warning(f"Anomaly detected: {txn.transaction_id} - {anomaly_type}")
-    
-    return TransactionResponse(
-        transaction_id=txn.transaction_id,
-        status="processed"
-    )
+    status = await _enqueue([txn], response)
+    return TransactionResponse(transaction_id=txn.transaction_id, status=status)
 
 
 @app.post("/api/v1/ingest/batch", response_model=List[TransactionResponse])
-def ingest_batch(request: BatchTransactionRequest):
-    """Ingest multiple transactions."""
-    logger.info(f"Received batch of {len(request.transactions)} transactions")
-    
-    responses = []
-    for txn in request.transactions:
-        try:
-            anomaly_type = detect_anomaly(txn)
-            transactions_store[txn.transaction_id] = txn.dict()
-            
-            if anomaly_type:
-                anomalies_store.append({
-                    "transaction_id": txn.transaction_id,
-                    "account_id": txn.account_id,
-                    "amount": txn.amount,
-                    "anomaly_type": anomaly_type,
-                    "timestamp": txn.timestamp
-                })
-            
-            responses.append(TransactionResponse(
-                transaction_id=txn.transaction_id,
-                status="processed"
-            ))
-        except Exception as e:
-            responses.append(TransactionResponse(
-                transaction_id=getattr(txn, 'transaction_id', 'unknown'),
-                status="error",
-                message=str(e)
-            ))
-    
-    return responses
+async def ingest_batch(request: BatchTransactionRequest, response: Response):
+    """Ingest multiple transactions; the whole batch is queued or rejected."""
+    status = await _enqueue(request.transactions, response)
+    return [TransactionResponse(transaction_id=txn.transaction_id, status=status) for txn in request.transactions]
+
+
+@app.post("/api/v1/ingest/bulk", response_model=BulkIngestResponse)
+async def ingest_bulk(request: Request, response: Response):
+    """Ingest a columnar, NDJSON or Arrow batch; valid rows are queued, invalid ones reported."""
+    columns = parse_bulk_body(await request.body(), request.headers.get("content-type", _BULK_JSON))
+    rows, rejected, errors = validate_columns(columns)
+    if not rows:
+        response.status_code = 422
+        return BulkIngestResponse(status="rejected", accepted=0, rejected=rejected, errors=errors)
+    status = await _enqueue(rows, response, progressive=True)
+    return BulkIngestResponse(status=status, accepted=len(rows), rejected=rejected, errors=errors)
 
 
 @app.get("/api/v1/transactions/{transaction_id}")
 def get_transaction(transaction_id: str):
     """Get a specific transaction."""
-    if transaction_id not in transactions_store:
+    txn = transactions_store.get(transaction_id)
+    if txn is None and transaction_log is not None:
+        txn = transaction_log.lookup(transaction_id)
+    if txn is None:
         raise HTTPException(status_code=404, detail="Transaction not found")
-    return transactions_store[transaction_id]
+    return txn
 
 
 @app.get("/api/v1/anomalies", response_model=List[AnomalyResponse])
 def get_anomalies(limit: int = 100):
     """Get detected anomalies."""
-    return anomalies_store[-limit:]
+    return anomalies_store.recent(limit)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/api/v1/traces")
+def get_traces(limit: int = 100):
+    """Most recent sampled request traces (METRICS_TRACE_SAMPLE_RATE)."""
+    return list(request_traces)[-limit:] if limit > 0 else []
 
 
 @app.get("/api/v1/stats")
@@ -143,7 +1315,12 @@ def get_stats():
     """Get pipeline statistics."""
     return {
         "total_transactions": len(transactions_store),
-        "total_anomalies": len(anomalies_store),
+        "total_anomalies": anomalies_store.total,
+        "retained_anomalies": len(anomalies_store),
+        "tracked_accounts": len(anomaly_detector),
+        "queue_depth": ingest_queue.depth if ingest_queue is not None else 0,
+        "ack_mode": settings.ack_mode,
+        "durable": ingest_queue is not None and ingest_queue.log is not None and ingest_queue.log.failed is None,
         "timestamp": datetime.utcnow().isoformat()
     }
 
@@ -0,0 +1,164 @@
+"""Local uvicorn throughput benchmark for the ingestion API.
+
+Starts ``api.main:app`` (or ``--app``) under uvicorn in a subprocess and
+drives it over concurrent keep-alive connections, reporting requests/s and
+transactions/s plus the status codes seen (429s mean the ingest queue
+pushed back).
+
+Usage:
+    python -m benchmarks.bench_api --requests 5000 --concurrency 64
+    python -m benchmarks.bench_api --endpoint batch --batch-size 500 --requests 200
+    python -m benchmarks.bench_api --endpoint bulk --batch-size 10000 --requests 50
+    INGEST_ACK_MODE=processed python -m benchmarks.bench_api
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import Counter
+from typing import Any
+
+from pipeline.config import BASE_DIR
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _transaction(i: int) -> dict[str, Any]:
+    # Every 100th transaction trips the very_high_amount rule.
+    return {
+        "transaction_id": f"bench-{i}",
+        "account_id": f"acct-{i % 1000}",
+        "timestamp": "2026-01-01T00:00:00",
+        "amount": 12_500.0 if i % 100 == 0 else 10.0 + i % 500,
+        "merchant_category": "grocery",
+        "location": "NYC",
+    }
+
+
+def _request(path: str, body: bytes) -> bytes:
+    head = (
+        f"POST {path} HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n"
+    )
+    return head.encode() + body
+
+
+async def _read_status(reader: asyncio.StreamReader) -> int:
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    length = next(int(line.split(":", 1)[1]) for line in lines if line.lower().startswith("content-length:"))
+    await reader.readexactly(length)
+    return int(lines[0].split()[1])
+
+
+def _columns(rows: list[dict[str, Any]]) -> dict[str, list]:
+    return {name: [row[name] for row in rows] for name in rows[0]}
+
+
+def _build_requests(endpoint: str, n_requests: int, batch_size: int) -> list[bytes]:
+    if endpoint == "single":
+        return [_request("/api/v1/ingest", json.dumps(_transaction(i)).encode()) for i in range(n_requests)]
+    if endpoint == "bulk":
+        return [
+            _request(
+                "/api/v1/ingest/bulk",
+                json.dumps(_columns([_transaction(i * batch_size + j) for j in range(batch_size)])).encode(),
+            )
+            for i in range(n_requests)
+        ]
+    return [
+        _request(
+            "/api/v1/ingest/batch",
+            json.dumps({"transactions": [_transaction(i * batch_size + j) for j in range(batch_size)]}).encode(),
+        )
+        for i in range(n_requests)
+    ]
+
+
+async def _drive(port: int, requests: list[bytes], concurrency: int) -> Counter:
+    """Keep-alive HTTP/1.1 over raw sockets; an HTTP client library would saturate the CPU first."""
+    statuses: Counter = Counter()
+    pending = iter(requests)
+
+    async def worker() -> None:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            for request in pending:
+                writer.write(request)
+                statuses[await _read_status(reader)] += 1
+        finally:
+            writer.close()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return statuses
+
+
+def _get_json(url: str) -> dict[str, Any]:
+    with urllib.request.urlopen(url, timeout=5) as response:
+        return json.loads(response.read())
+
+
+def _wait_ready(base_url: str, proc: subprocess.Popen, timeout_s: float = 20) -> None:
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            sys.exit(f"uvicorn exited with {proc.returncode}")
+        try:
+            _get_json(f"{base_url}/health")
+            return
+        except OSError:
+            time.sleep(0.1)
+    sys.exit("uvicorn did not become ready")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default="api.main:app")
+    parser.add_argument("--app-dir", default=str(BASE_DIR), help="Directory uvicorn imports --app from")
+    parser.add_argument("--endpoint", choices=("single", "batch", "bulk"), default="single")
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", args.app, "--app-dir", args.app_dir,
+            "--port", str(port), "--log-level", "warning", "--no-access-log",
+        ],
+        cwd=BASE_DIR,
+        env=os.environ.copy(),
+    )
+    try:
+        requests = _build_requests(args.endpoint, args.requests, args.batch_size)
+        _wait_ready(base_url, server)
+        start = time.perf_counter()
+        statuses = asyncio.run(_drive(port, requests, args.concurrency))
+        wall = time.perf_counter() - start
+        stats = _get_json(f"{base_url}/api/v1/stats")
+    finally:
+        server.terminate()
+        server.wait()
+
+    per_request = 1 if args.endpoint == "single" else args.batch_size
+    print(f"{args.app} {args.endpoint}: {args.requests:,} requests in {wall:.2f}s")
+    print(f"  {args.requests / wall:,.0f} requests/s, {args.requests * per_request / wall:,.0f} transactions/s")
+    print(f"  status codes: {dict(sorted(statuses.items()))}")
+    print(f"  stored: {stats['total_transactions']:,}, anomalies: {stats['total_anomalies']:,}")
+
+
+if __name__ == "__main__":
+    main()
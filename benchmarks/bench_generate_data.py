@@ -0,0 +1,49 @@
+"""Throughput benchmark for the synthetic raw-data generator.
+
+Usage:
+    python -m benchmarks.bench_generate_data --n-users 20000
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from pipeline.generate_data import (
+    GeneratorConfig,
+    build_events,
+    build_payments,
+    build_support_tickets,
+    build_users,
+)
+
+
+def bench(n_users: int, repeat: int) -> None:
+    cfg = GeneratorConfig(
+        random_seed=42,
+        days_back=120,
+        n_users=n_users,
+        avg_events_per_user=26,
+        avg_tickets_per_user=0.8,
+    )
+    users = build_users(cfg)
+
+    for builder in (build_events, build_payments, build_support_tickets):
+        best = float("inf")
+        n_rows = 0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            n_rows = len(builder(users, cfg))
+            best = min(best, time.perf_counter() - start)
+        print(f"{builder.__name__}: {n_rows:,} rows in {best:.3f}s ({n_rows / best:,.0f} rows/sec)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n-users", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    bench(args.n_users, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""End-to-end pipeline benchmark at several user scales.
+
+Each scale runs ``pipeline.run_all`` in a fresh subprocess against a scratch
+data directory, so timings start cold and peak RSS is per scale. Results are
+appended to a JSON history file; ``--compare`` flags regressions against a
+stored baseline. Scales above ``LARGE_SCALE_USERS`` generate in chunks (see
+``--chunk-size``) so 1M users fits in memory.
+
+Usage:
+    python -m benchmarks.bench_pipeline --scales 10000 100000 1000000
+    python -m benchmarks.bench_pipeline --scales 10000 --save-baseline
+    python -m benchmarks.bench_pipeline --scales 10000 --compare --threshold 0.15
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import yaml
+
+from pipeline.config import BASE_DIR, load_config
+
+DEFAULT_SCALES = [10_000, 100_000, 1_000_000]
+RESULTS_DIR = BASE_DIR / "benchmarks" / "results"
+HISTORY_PATH = RESULTS_DIR / "history.json"
+BASELINE_PATH = RESULTS_DIR / "baseline.json"
+# Stages faster than this are reported but too noisy to flag as regressions.
+MIN_COMPARE_SECONDS = 0.25
+LARGE_SCALE_USERS = 100_000
+LARGE_SCALE_CHUNK = 100_000
+# Stages whose row counts are not rows processed (quality reports checks).
+NO_THROUGHPUT_STAGES = {"connect", "quality"}
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True)
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+def _stage_summary(metrics: dict[str, Any]) -> dict[str, dict[str, Any]]:
+    """Per-stage wall time, throughput and RSS, with SQL split by model layer.
+
+    ``rss_growth_mb`` is how much a stage raised the process high-water mark;
+    ``rss_high_water_mb`` is that mark once the stage (or layer) finished.
+    """
+    stages: dict[str, dict[str, Any]] = {}
+    for stage in metrics["stages"]:
+        if stage["name"] == "sql_models":
+            for layer in ("staging", "int", "marts"):
+                models = [m for m in metrics["models"] if m["name"].startswith(f"{layer}_")]
+                rows = sum(m["rows_out"] or 0 for m in models)
+                # Models in a layer can overlap, so this is summed model time.
+                wall = sum(m["wall_s"] for m in models)
+                stages[layer] = {
+                    "wall_s": round(wall, 4),
+                    "rows": rows,
+                    "rows_per_s": round(rows / wall) if wall else None,
+                    "rss_high_water_mb": max((m["rss_high_water_mb"] or 0 for m in models), default=None),
+                }
+            continue
+        rows = stage["rows_in"] or stage["rows_out"] or 0
+        measurable = rows and stage["wall_s"] and stage["name"] not in NO_THROUGHPUT_STAGES
+        stages[stage["name"]] = {
+            "wall_s": stage["wall_s"],
+            "rows": rows,
+            "rows_per_s": round(rows / stage["wall_s"]) if measurable else None,
+            "rss_growth_mb": stage["rss_growth_mb"],
+            "rss_high_water_mb": stage["rss_high_water_mb"],
+        }
+    return stages
+
+
+def bench_scale(n_users: int, overrides: dict[str, Any]) -> dict[str, Any]:
+    cfg = load_config()
+    if n_users > LARGE_SCALE_USERS:
+        cfg["pipeline"]["chunk_size"] = LARGE_SCALE_CHUNK
+    cfg["pipeline"].update(n_users=n_users, reset_database=True, incremental=False, profiler="none", **overrides)
+
+    with tempfile.TemporaryDirectory(prefix=f"bench_{n_users}_") as tmp:
+        config_path = Path(tmp) / "pipeline.yaml"
+        config_path.write_text(yaml.safe_dump(cfg), encoding="utf-8")
+        env = {**os.environ, "LAKEHOUSE_DATA_DIR": str(Path(tmp) / "data")}
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", "pipeline.run_all", "--force", "--config", str(config_path)],
+            cwd=BASE_DIR,
+            env=env,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        wall = time.perf_counter() - start
+        metrics = json.loads((Path(tmp) / "data" / "exports" / "run_metrics.json").read_text(encoding="utf-8"))
+
+    return {
+        "n_users": n_users,
+        "wall_s": round(wall, 3),
+        "peak_rss_mb": metrics["peak_rss_mb"],
+        "stages": _stage_summary(metrics),
+    }
+
+
+def compare(results: list[dict[str, Any]], baseline: dict[str, Any], threshold: float) -> list[str]:
+    """Regression messages for stages slower, or runs larger, than baseline by more than ``threshold``."""
+    by_scale = {str(r["n_users"]): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        base = by_scale.get(str(result["n_users"]))
+        if base is None:
+            continue
+        checks = [("peak_rss_mb", result["peak_rss_mb"], base["peak_rss_mb"], 0.0)]
+        for name, stage in result["stages"].items():
+            if name in base["stages"]:
+                checks.append((f"{name}.wall_s", stage["wall_s"], base["stages"][name]["wall_s"], MIN_COMPARE_SECONDS))
+        for label, value, reference, floor in checks:
+            if value is None or not reference or max(value, reference) < floor:
+                continue
+            change = value / reference - 1
+            if change > threshold:
+                regressions.append(f"{result['n_users']:,} users {label}: {reference} -> {value} (+{change:.0%})")
+    return regressions
+
+
+def _print_result(result: dict[str, Any]) -> None:
+    print(f"{result['n_users']:,} users: {result['wall_s']:.2f}s, peak RSS {result['peak_rss_mb']} MB")
+    for name, stage in result["stages"].items():
+        throughput = f"{stage['rows_per_s']:,} rows/s" if stage["rows_per_s"] else "-"
+        growth = stage.get("rss_growth_mb")
+        memory = f"+{growth} MB" if growth is not None else f"high-water {stage['rss_high_water_mb']} MB"
+        print(f"  {name:<10} {stage['wall_s']:>8.3f}s  {throughput:>16}  {memory}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES)
+    parser.add_argument("--chunk-size", type=int, help="Override chunk_size for the generator")
+    parser.add_argument("--workers", type=int, help="Override generator workers")
+    parser.add_argument("--history", type=Path, default=HISTORY_PATH)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--compare", action="store_true", help="Exit non-zero on regressions against the baseline")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative slowdown (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    overrides = {
+        key: value
+        for key, value in (("chunk_size", args.chunk_size), ("workers", args.workers))
+        if value is not None
+    }
+    results = []
+    for n_users in args.scales:
+        results.append(bench_scale(n_users, overrides))
+        _print_result(results[-1])
+
+    run = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "overrides": overrides,
+        "results": results,
+    }
+    args.history.parent.mkdir(parents=True, exist_ok=True)
+    history = json.loads(args.history.read_text(encoding="utf-8")) if args.history.exists() else []
+    history.append(run)
+    args.history.write_text(json.dumps(history, indent=2), encoding="utf-8")
+    print(f"Appended to {args.history}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(run, indent=2), encoding="utf-8")
+        print(f"Saved baseline to {args.baseline}")
+
+    if args.compare:
+        if not args.baseline.exists():
+            sys.exit(f"No baseline at {args.baseline}; run with --save-baseline first")
+        regressions = compare(results, json.loads(args.baseline.read_text(encoding="utf-8")), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 from pathlib import Path
 from typing import Any
 
@@ -7,12 +8,17 @@ import yaml
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 CONFIG_PATH = BASE_DIR / "configs" / "pipeline.yaml"
-DATA_DIR = BASE_DIR / "data"
+SQL_DIR = BASE_DIR / "sql"
+# Model layers, in build order: staging -> intermediate (int_*) -> marts.
+SQL_FOLDERS = [SQL_DIR / "staging", SQL_DIR / "intermediate", SQL_DIR / "marts"]
+# Overridable so benchmarks and scratch runs don't touch the checked-in data/.
+DATA_DIR = Path(os.environ.get("LAKEHOUSE_DATA_DIR", BASE_DIR / "data"))
 RAW_DIR = DATA_DIR / "raw"
 STAGED_DIR = DATA_DIR / "staged"
 MARTS_DIR = DATA_DIR / "marts"
 EXPORT_DIR = DATA_DIR / "exports"
 WAREHOUSE_PATH = DATA_DIR / "warehouse.sqlite"
+DUCKDB_PATH = DATA_DIR / "warehouse.duckdb"
 
 
 def load_config(path: Path = CONFIG_PATH) -> dict[str, Any]:
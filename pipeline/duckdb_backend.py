@@ -0,0 +1,117 @@
+"""Embedded DuckDB engine for the SQL models.
+
+DuckDB reads the raw CSV/Parquet files itself and runs each model across all
+cores. The model SQL is written to the dialect both engines share; the few
+SQLite date idioms left are rewritten by :func:`translate_sql`.
+"""
+from __future__ import annotations
+
+import re
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from .config import DUCKDB_PATH, RAW_DIR
+from .metrics import peak_rss_mb
+from .sql_dag import ModelTiming, SqlModel
+
+try:
+    import duckdb
+except ImportError:  # optional dependency
+    duckdb = None
+
+# SQLite declared types -> DuckDB column types. Timestamps are TEXT in SQLite
+# but native TIMESTAMP here, which DATE() and comparisons use directly.
+_DUCKDB_TYPES = {"INTEGER": "BIGINT", "REAL": "DOUBLE", "TEXT": "VARCHAR"}
+
+_NOW_OFFSET_RE = re.compile(r"\b(date|datetime)\(\s*'now'\s*,\s*'([+-]?\d+) (day|hour|minute)s?'\s*\)", re.IGNORECASE)
+_DATETIME_RE = re.compile(r"\bdatetime\(\s*([A-Za-z_][A-Za-z0-9_.]*)\s*\)", re.IGNORECASE)
+
+
+def _require_duckdb() -> Any:
+    if duckdb is None:
+        raise RuntimeError("engine 'duckdb' requires `pip install duckdb`")
+    return duckdb
+
+
+def is_duckdb(con: object) -> bool:
+    return duckdb is not None and isinstance(con, duckdb.DuckDBPyConnection)
+
+
+def connect(reset_database: bool = False, path: Path | None = None) -> Any:
+    db = _require_duckdb()
+    path = path or DUCKDB_PATH
+    if reset_database:
+        for stale in (path, path.with_name(path.name + ".wal")):
+            stale.unlink(missing_ok=True)
+    con = db.connect(str(path))
+    # SQLite's 'now' is UTC; match it.
+    con.execute("SET TimeZone = 'UTC'")
+    return con
+
+
+def translate_sql(sql: str) -> str:
+    """Rewrite the SQLite-only date functions the models use into DuckDB SQL."""
+    def now_offset(m: re.Match[str]) -> str:
+        shifted = f"(CAST(current_timestamp AS TIMESTAMP) + INTERVAL ({m.group(2)}) {m.group(3).upper()})"
+        return f"CAST({shifted} AS DATE)" if m.group(1).lower() == "date" else shifted
+
+    sql = _NOW_OFFSET_RE.sub(now_offset, sql)
+    return _DATETIME_RE.sub(r"CAST(\1 AS TIMESTAMP)", sql)
+
+
+def _raw_source(source: str, raw_format: str) -> str:
+    if raw_format == "parquet":
+        return f"read_parquet('{(RAW_DIR / source).as_posix()}/*.parquet')"
+    return f"read_csv_auto('{(RAW_DIR / f'{source}.csv').as_posix()}', header = true)"
+
+
+def raw_table_sql(table_name: str, source: str, schema: dict[str, str], raw_format: str) -> str:
+    """``CREATE TABLE`` reading a raw file in place, with the declared column types."""
+    columns = []
+    for col, sql_type in schema.items():
+        duck_type = "TIMESTAMP" if col.endswith("_ts") else _DUCKDB_TYPES[sql_type]
+        columns.append(f"CAST({col} AS {duck_type}) AS {col}")
+    return (
+        f"CREATE OR REPLACE TABLE {table_name} AS "
+        f"SELECT {', '.join(columns)} FROM {_raw_source(source, raw_format)}"
+    )
+
+
+def run_models(
+    con: Any,
+    models: dict[str, SqlModel],
+    on_built: Callable[[Any, str], None] | None = None,
+) -> dict[str, ModelTiming]:
+    """Build models one at a time in dependency order; DuckDB parallelizes each query."""
+    timings: dict[str, ModelTiming] = {}
+    pending = dict(models)
+    while pending:
+        ready = [m for m in pending.values() if not (m.depends_on & pending.keys())]
+        if not ready:
+            raise ValueError(f"Cyclic model dependencies: {sorted(pending)}")
+        for model in ready:
+            start, cpu_start = time.perf_counter(), time.process_time()
+            con.execute("BEGIN TRANSACTION")
+            try:
+                con.execute(translate_sql(model.sql))
+                if on_built is not None:
+                    on_built(con, model.name)
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+            # DuckDB works on its own threads, so process (not thread) CPU time.
+            timings[model.name] = ModelTiming(
+                time.perf_counter() - start, time.process_time() - cpu_start, peak_rss_mb()
+            )
+            print(f"      {model.name}: {timings[model.name].wall_s:.2f}s")
+            del pending[model.name]
+    return timings
+
+
+def query_plan(con: Any, select_sql: str) -> list[str]:
+    """Physical plan lines from ``EXPLAIN``."""
+    rows = con.execute(f"EXPLAIN {translate_sql(select_sql)}").fetchall()
+    return [line for _, plan in rows for line in plan.splitlines() if line.strip()]
@@ -1,10 +1,19 @@
 from __future__ import annotations
 
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
 import sqlite3
-
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any
 
 from .config import EXPORT_DIR
+from .sql_dag import Connection, warehouse_file
 
 
 MART_TABLES = [
@@ -14,10 +23,248 @@ MART_TABLES = [
     "marts_experiment_performance",
 ]
 
+EXPORT_FORMATS = ("csv", "csv.gz", "jsonl", "parquet")
+EXPORT_BATCH_ROWS = 50_000
+# gzip level 6 is ~3x faster than the default 9 for a few percent larger files.
+GZIP_LEVEL = 6
+MANIFEST_NAME = "manifest.json"
+
+
+class _CsvWriter:
+    compress = False
+
+    def __init__(self, path: Path, columns: list[str], con: Connection, table: str) -> None:
+        self._raw = path.open("wb")
+        if self.compress:
+            # Fixed mtime and no embedded name keep identical content byte-identical.
+            binary: io.IOBase = gzip.GzipFile(filename="", fileobj=self._raw, mode="wb", compresslevel=GZIP_LEVEL, mtime=0)
+        else:
+            binary = self._raw
+        self._file = io.TextIOWrapper(binary, encoding="utf-8", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def write(self, rows: list[tuple[Any, ...]]) -> None:
+        self._writer.writerows(rows)
+
+    def close(self) -> None:
+        self._file.close()
+        self._raw.close()
+
+
+class _GzipCsvWriter(_CsvWriter):
+    compress = True
+
+
+class _JsonlWriter:
+    def __init__(self, path: Path, columns: list[str], con: Connection, table: str) -> None:
+        self._file = path.open("w", encoding="utf-8")
+        self._columns = columns
+
+    def write(self, rows: list[tuple[Any, ...]]) -> None:
+        columns = self._columns
+        # default=str covers DuckDB's date/timestamp values.
+        self._file.writelines(json.dumps(dict(zip(columns, row)), default=str) + "\n" for row in rows)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _ParquetWriter:
+    def __init__(self, path: Path, columns: list[str], con: Connection, table: str) -> None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise RuntimeError("export format 'parquet' requires `pip install pyarrow`") from exc
+
+        self._pa = pa
+        self._schema = _arrow_schema(con, table, columns)
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write(self, rows: list[tuple[Any, ...]]) -> None:
+        pa = self._pa
+        arrays = [
+            pa.array(values, type=field.type)
+            for values, field in zip(zip(*rows), self._schema)
+        ]
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+_WRITERS = {"csv": _CsvWriter, "csv.gz": _GzipCsvWriter, "jsonl": _JsonlWriter, "parquet": _ParquetWriter}
+
+
+def _arrow_schema(con: Connection, table: str, columns: list[str]) -> Any:
+    """Arrow types from the storage classes actually present in each column.
+
+    Mart columns are mostly untyped expressions that can mix integer and real
+    values, so one flag pass decides: any text -> string, any real -> float64,
+    otherwise int64.
+    """
+    import pyarrow as pa
+
+    if not isinstance(con, sqlite3.Connection):
+        # DuckDB columns are strictly typed and map to Arrow directly.
+        return con.execute(f"SELECT {', '.join(columns)} FROM {table} LIMIT 0").arrow().schema
+
+    flags = ", ".join(
+        f"MAX(typeof({col}) = 'text'), MAX(typeof({col}) = 'real'), MAX(typeof({col}) = 'integer')"
+        for col in columns
+    )
+    row = con.execute(f"SELECT {flags} FROM {table}").fetchone()
+    fields = []
+    for i, col in enumerate(columns):
+        has_text, has_real, has_int = row[3 * i : 3 * i + 3]
+        if has_text or not (has_real or has_int):
+            arrow_type = pa.string()
+        elif has_real:
+            arrow_type = pa.float64()
+        else:
+            arrow_type = pa.int64()
+        fields.append(pa.field(col, arrow_type))
+    return pa.schema(fields)
+
+
+def mart_fingerprint(con: Connection, table_name: str) -> tuple[str, int]:
+    """Rolling BLAKE2b hash over the column names and rows in export order, plus the row count."""
+    cursor = con.cursor().execute(f"SELECT * FROM {table_name}")
+    digest = hashlib.blake2b(repr([d[0] for d in cursor.description]).encode(), digest_size=16)
+    n_rows = 0
+    while rows := cursor.fetchmany(EXPORT_BATCH_ROWS):
+        digest.update("".join(f"{row!r}\n" for row in rows).encode())
+        n_rows += len(rows)
+    return digest.hexdigest(), n_rows
+
+
+def _file_entry(path: Path) -> dict[str, object]:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        while block := f.read(1 << 20):
+            digest.update(block)
+    return {"file": path.name, "bytes": path.stat().st_size, "sha256": digest.hexdigest()}
+
+
+def load_manifest(out_dir: Path | None = None) -> dict[str, Any]:
+    path = (out_dir or EXPORT_DIR) / MANIFEST_NAME
+    if not path.exists():
+        return {"marts": {}}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _is_current(previous: dict[str, Any] | None, fingerprint: str, formats: list[str], out_dir: Path) -> bool:
+    """True when the last export has this fingerprint and its files are still in place."""
+    if previous is None or previous.get("fingerprint") != fingerprint:
+        return False
+    files = previous.get("files", {})
+    for fmt in formats:
+        entry = files.get(fmt)
+        path = out_dir / entry["file"] if entry else None
+        if path is None or not path.exists() or path.stat().st_size != entry["bytes"]:
+            return False
+    return True
+
+
+def _write_mart(con: Connection, table_name: str, formats: list[str], out_dir: Path) -> dict[str, Path]:
+    """Stream one mart from a cursor into every requested format in a single pass."""
+    out_name = table_name.replace("marts_", "")
+    cursor = con.cursor().execute(f"SELECT * FROM {table_name}")
+    columns = [d[0] for d in cursor.description]
+
+    paths = {fmt: out_dir / f"{out_name}.{fmt}" for fmt in formats}
+    tmp_paths = {fmt: path.with_name(path.name + ".tmp") for fmt, path in paths.items()}
+    writers = [_WRITERS[fmt](tmp_paths[fmt], columns, con, table_name) for fmt in formats]
+    try:
+        while rows := cursor.fetchmany(EXPORT_BATCH_ROWS):
+            for writer in writers:
+                writer.write(rows)
+    except BaseException:
+        for writer in writers:
+            writer.close()
+        for tmp_path in tmp_paths.values():
+            tmp_path.unlink(missing_ok=True)
+        raise
+    for writer in writers:
+        writer.close()
+    # Readers never see a half-written export.
+    for fmt, path in paths.items():
+        os.replace(tmp_paths[fmt], path)
+    return paths
+
+
+def _export_mart(
+    con: Connection,
+    table_name: str,
+    formats: list[str],
+    out_dir: Path,
+    previous: dict[str, Any] | None,
+    force: bool,
+) -> dict[str, Any]:
+    """Export one mart unless its fingerprint matches ``previous``; returns its manifest entry."""
+    fingerprint, n_rows = mart_fingerprint(con, table_name)
+    if not force and _is_current(previous, fingerprint, formats, out_dir):
+        files = {fmt: previous["files"][fmt] for fmt in formats}
+        return {**previous, "files": files, "changed": False}
+
+    paths = _write_mart(con, table_name, formats, out_dir)
+    return {
+        "table": table_name,
+        "rows": n_rows,
+        "fingerprint": fingerprint,
+        "exported_at": datetime.now().isoformat(timespec="seconds"),
+        "changed": True,
+        "files": {fmt: _file_entry(path) for fmt, path in paths.items()},
+    }
+
+
+def export_marts(
+    con: Connection,
+    formats: list[str] | None = None,
+    max_workers: int = 4,
+    out_dir: Path | None = None,
+    force: bool = False,
+) -> dict[str, Any]:
+    """Write each changed mart to ``out_dir`` in ``formats`` and return the manifest.
+
+    A mart is rewritten only when its content fingerprint differs from the one
+    in ``manifest.json`` (or a file is missing, or ``force``), so unchanged
+    exports keep their mtime and ``changed`` is false in the manifest. Marts
+    are streamed in ``EXPORT_BATCH_ROWS`` chunks, so memory does not grow with
+    mart size, and handled concurrently on one connection per thread
+    (serially for in-memory databases).
+    """
+    formats = formats or ["csv"]
+    unknown = [fmt for fmt in formats if fmt not in EXPORT_FORMATS]
+    if unknown:
+        raise ValueError(f"Unsupported export_formats {unknown}; expected any of {EXPORT_FORMATS}")
+    out_dir = out_dir or EXPORT_DIR
+    out_dir.mkdir(parents=True, exist_ok=True)
+    previous = load_manifest(out_dir)["marts"]
+    warehouse_path = warehouse_file(con)
+
+    def export_one(table_name: str, con: Connection | None = None) -> dict[str, Any]:
+        thread_con = con or sqlite3.connect(warehouse_path, timeout=600)
+        try:
+            return _export_mart(thread_con, table_name, formats, out_dir, previous.get(table_name), force)
+        finally:
+            if con is None:
+                thread_con.close()
+
+    if not warehouse_path or max_workers <= 1:
+        entries = [export_one(table_name, con) for table_name in MART_TABLES]
+    else:
+        con.commit()
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(MART_TABLES))) as pool:
+            entries = list(pool.map(export_one, MART_TABLES))
 
-def export_marts(con: sqlite3.Connection) -> None:
-    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
-    for table_name in MART_TABLES:
-        out_name = table_name.replace("marts_", "")
-        df = pd.read_sql_query(f"SELECT * FROM {table_name}", con)
-        df.to_csv(EXPORT_DIR / f"{out_name}.csv", index=False)
+    manifest = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "formats": formats,
+        "marts": dict(zip(MART_TABLES, entries)),
+    }
+    tmp_path = out_dir / f"{MANIFEST_NAME}.tmp"
+    tmp_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    os.replace(tmp_path, out_dir / MANIFEST_NAME)
+    return manifest
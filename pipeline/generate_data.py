@@ -1,6 +1,9 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import shutil
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
 from datetime import datetime, timedelta
 from pathlib import Path
 
@@ -17,6 +20,31 @@ class GeneratorConfig:
     n_users: int
     avg_events_per_user: int
     avg_tickets_per_user: float
+    chunk_size: int = 0
+    workers: int = 1
+    # Users per independently seeded generation block. Output depends only on
+    # random_seed and block_size: chunk_size and workers just group whole
+    # blocks into shards, so every layout writes the same rows.
+    block_size: int = 1_000
+    raw_format: str = "csv"
+    # ISO date/datetime the generated history ends at. None means the start of
+    # the current day, so every run on the same day writes identical files
+    # (and unchanged raw tables hit the load and model cache).
+    reference_date: str | None = None
+
+
+RAW_TABLES = ("users", "events", "payments", "support_tickets")
+RAW_FORMATS = ("csv", "parquet")
+PARTS_DIR_NAME = "parts"
+# Event, payment and ticket keys of block N start at N * BLOCK_ID_STRIDE + 1,
+# so they never depend on how many rows earlier blocks produced.
+BLOCK_ID_STRIDE = 10**12
+
+
+def _end_dt(cfg: GeneratorConfig) -> datetime:
+    if cfg.reference_date:
+        return datetime.fromisoformat(cfg.reference_date)
+    return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
 
 
 def _random_timestamps(
@@ -24,21 +52,48 @@ def _random_timestamps(
     start_dt: datetime,
     end_dt: datetime,
     count: int,
-) -> pd.Series:
+) -> pd.DatetimeIndex:
     total_seconds = int((end_dt - start_dt).total_seconds())
     offsets = rng.integers(0, max(total_seconds, 1), size=count)
-    return pd.to_datetime([start_dt + timedelta(seconds=int(o)) for o in offsets])
+    start_s = np.datetime64(start_dt, "s").astype(np.int64)
+    return _to_timestamps(start_s + offsets)
+
+
+def _to_timestamps(epoch_seconds: np.ndarray) -> pd.DatetimeIndex:
+    return pd.DatetimeIndex(epoch_seconds.astype("datetime64[s]").astype("datetime64[ns]"))
+
+
+def _per_user_timestamps(
+    rng: np.random.Generator,
+    signup_ts: pd.Series,
+    end_dt: datetime,
+    counts: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Draw ``counts[i]`` sorted timestamps between each user's signup and ``end_dt``.
+
+    Returns ``(user_idx, epoch_seconds)`` where rows are grouped by user in
+    input order and sorted by time within each user.
+    """
+    user_idx = np.repeat(np.arange(len(counts)), counts)
+    signup_s = signup_ts.to_numpy().astype("datetime64[s]").astype(np.int64)
+    end_s = np.datetime64(end_dt, "s").astype(np.int64)
+    span_s = np.maximum(end_s - signup_s, 1)
+
+    offsets = rng.integers(0, span_s[user_idx])
+    # Pack (user, offset) into one int64 key so a single sort orders each user's rows.
+    offsets = np.sort((user_idx.astype(np.int64) << 32) | offsets) & 0xFFFFFFFF
+    return user_idx, signup_s[user_idx] + offsets
 
 
-def build_users(cfg: GeneratorConfig) -> pd.DataFrame:
+def build_users(cfg: GeneratorConfig, first_user_id: int = 1) -> pd.DataFrame:
     rng = np.random.default_rng(cfg.random_seed)
-    end_dt = datetime.now().replace(microsecond=0, second=0)
+    end_dt = _end_dt(cfg)
     start_dt = end_dt - timedelta(days=cfg.days_back)
 
     signup_ts = _random_timestamps(rng, start_dt, end_dt, cfg.n_users)
     users = pd.DataFrame(
         {
-            "user_id": np.arange(1, cfg.n_users + 1, dtype=np.int64),
+            "user_id": np.arange(first_user_id, first_user_id + cfg.n_users, dtype=np.int64),
             "signup_ts": signup_ts,
             "acquisition_channel": rng.choice(
                 ["organic", "paid_search", "referral", "partner", "social"],
@@ -65,86 +120,83 @@ def build_users(cfg: GeneratorConfig) -> pd.DataFrame:
     return users.sort_values("signup_ts").reset_index(drop=True)
 
 
+def _sample(rng: np.random.Generator, values: list[str], p: list[float], size: int) -> np.ndarray:
+    """Draw ``size`` categorical values with one uniform draw per row."""
+    codes = np.searchsorted(np.cumsum(p), rng.random(size), side="right")
+    return np.asarray(values, dtype=object)[np.minimum(codes, len(values) - 1)]
+
+
 def build_events(users: pd.DataFrame, cfg: GeneratorConfig) -> pd.DataFrame:
     rng = np.random.default_rng(cfg.random_seed + 1)
-    end_dt = datetime.now().replace(microsecond=0, second=0)
+    end_dt = _end_dt(cfg)
 
     base_events = rng.poisson(lam=cfg.avg_events_per_user, size=len(users))
     uplift = users["plan_tier"].map({"free": 0, "pro": 5, "enterprise": 11}).to_numpy()
     n_events_per_user = np.clip(base_events + uplift, 4, None)
+    n_events = int(n_events_per_user.sum())
+
+    user_idx, event_s = _per_user_timestamps(rng, users["signup_ts"], end_dt, n_events_per_user)
+
+    event_type = _sample(
+        rng,
+        ["session_start", "feature_used", "trial_started", "subscription_started", "churned"],
+        [0.60, 0.25, 0.06, 0.06, 0.03],
+        n_events,
+    )
+    in_experiment = rng.random(n_events) < 0.72
+    variant = _sample(rng, ["A", "B"], [0.5, 0.5], n_events)
+    session_duration = rng.integers(20, 3600, size=n_events).astype(np.float64)
 
-    rows: list[dict[str, object]] = []
-    event_id = 1
-    for user, n_events in zip(users.itertuples(index=False), n_events_per_user):
-        signup_dt = pd.Timestamp(user.signup_ts).to_pydatetime()
-        event_ts = _random_timestamps(rng, signup_dt, end_dt, int(n_events))
-        event_ts = event_ts.sort_values()
-
-        for ts in event_ts:
-            event_type = rng.choice(
-                ["session_start", "feature_used", "trial_started", "subscription_started", "churned"],
-                p=[0.60, 0.25, 0.06, 0.06, 0.03],
-            )
-            exp_name = "new_onboarding" if rng.random() < 0.72 else None
-            exp_variant = rng.choice(["A", "B"], p=[0.5, 0.5]) if exp_name else None
-            rows.append(
-                {
-                    "event_id": event_id,
-                    "user_id": int(user.user_id),
-                    "event_ts": ts,
-                    "event_type": event_type,
-                    "feature_name": rng.choice(
-                        ["dashboard", "alerts", "report_builder", "cohort_view", "copilot"],
-                        p=[0.27, 0.17, 0.26, 0.16, 0.14],
-                    ),
-                    "experiment_name": exp_name,
-                    "experiment_variant": exp_variant,
-                    "session_duration_sec": int(rng.integers(20, 3600)) if event_type == "session_start" else None,
-                }
-            )
-            event_id += 1
-
-    events = pd.DataFrame(rows)
-    return events.sort_values("event_ts").reset_index(drop=True)
+    events = pd.DataFrame(
+        {
+            "event_id": np.arange(1, n_events + 1, dtype=np.int64),
+            "user_id": users["user_id"].to_numpy(dtype=np.int64)[user_idx],
+            "event_ts": _to_timestamps(event_s),
+            "event_type": event_type,
+            "feature_name": _sample(
+                rng,
+                ["dashboard", "alerts", "report_builder", "cohort_view", "copilot"],
+                [0.27, 0.17, 0.26, 0.16, 0.14],
+                n_events,
+            ),
+            "experiment_name": np.where(in_experiment, "new_onboarding", None),
+            "experiment_variant": np.where(in_experiment, variant, None),
+            "session_duration_sec": np.where(event_type == "session_start", session_duration, np.nan),
+        }
+    )
+    return events.sort_values("event_ts", kind="stable").reset_index(drop=True)
 
 
 def build_payments(users: pd.DataFrame, cfg: GeneratorConfig) -> pd.DataFrame:
     rng = np.random.default_rng(cfg.random_seed + 2)
-    end_dt = datetime.now().replace(microsecond=0, second=0)
-
-    paid_users = users[users["plan_tier"].isin(["pro", "enterprise"])].copy()
-    rows: list[dict[str, object]] = []
-    payment_id = 1
-
-    for user in paid_users.itertuples(index=False):
-        signup_dt = pd.Timestamp(user.signup_ts).to_pydatetime()
-        tenure_days = max((end_dt - signup_dt).days, 1)
-        n_invoices = max(1, int(tenure_days / 30) + int(rng.integers(0, 2)))
-        base_price = 49.0 if user.plan_tier == "pro" else 199.0
-
-        invoice_ts = _random_timestamps(rng, signup_dt, end_dt, n_invoices).sort_values()
-        for ts in invoice_ts:
-            status = rng.choice(["success", "refund", "failed"], p=[0.91, 0.05, 0.04])
-            amount = max(5.0, float(base_price + rng.normal(0, base_price * 0.12)))
-            rows.append(
-                {
-                    "payment_id": payment_id,
-                    "user_id": int(user.user_id),
-                    "payment_ts": ts,
-                    "amount_usd": round(amount, 2),
-                    "payment_status": status,
-                    "invoice_type": rng.choice(["subscription", "upgrade"], p=[0.88, 0.12]),
-                }
-            )
-            payment_id += 1
-
-    payments = pd.DataFrame(rows)
-    return payments.sort_values("payment_ts").reset_index(drop=True)
+    end_dt = _end_dt(cfg)
+
+    paid_users = users[users["plan_tier"].isin(["pro", "enterprise"])]
+    signup = paid_users["signup_ts"].to_numpy().astype("datetime64[s]")
+    tenure_days = np.maximum((np.datetime64(end_dt, "s") - signup).astype("timedelta64[D]").astype(np.int64), 1)
+    n_invoices = np.maximum(1, tenure_days // 30 + rng.integers(0, 2, size=len(paid_users)))
+    n_payments = int(n_invoices.sum())
+
+    user_idx, payment_s = _per_user_timestamps(rng, paid_users["signup_ts"], end_dt, n_invoices)
+    base_price = np.where(paid_users["plan_tier"].to_numpy() == "pro", 49.0, 199.0)[user_idx]
+    amount = np.maximum(5.0, base_price + rng.normal(0, base_price * 0.12))
+
+    payments = pd.DataFrame(
+        {
+            "payment_id": np.arange(1, n_payments + 1, dtype=np.int64),
+            "user_id": paid_users["user_id"].to_numpy(dtype=np.int64)[user_idx],
+            "payment_ts": _to_timestamps(payment_s),
+            "amount_usd": np.round(amount, 2),
+            "payment_status": _sample(rng, ["success", "refund", "failed"], [0.91, 0.05, 0.04], n_payments),
+            "invoice_type": _sample(rng, ["subscription", "upgrade"], [0.88, 0.12], n_payments),
+        }
+    )
+    return payments.sort_values("payment_ts", kind="stable").reset_index(drop=True)
 
 
 def build_support_tickets(users: pd.DataFrame, cfg: GeneratorConfig) -> pd.DataFrame:
     rng = np.random.default_rng(cfg.random_seed + 3)
-    end_dt = datetime.now().replace(microsecond=0, second=0)
+    end_dt = _end_dt(cfg)
     start_dt = end_dt - timedelta(days=cfg.days_back)
 
     n_tickets = int(len(users) * cfg.avg_tickets_per_user)
@@ -153,12 +205,7 @@ def build_support_tickets(users: pd.DataFrame, cfg: GeneratorConfig) -> pd.DataF
 
     resolution_hours = rng.integers(2, 96, size=n_tickets)
     unresolved_mask = rng.random(n_tickets) < 0.14
-    resolved_ts = []
-    for created, hrs, unresolved in zip(created_ts, resolution_hours, unresolved_mask):
-        if unresolved:
-            resolved_ts.append(pd.NaT)
-        else:
-            resolved_ts.append(created + pd.Timedelta(hours=int(hrs)))
+    resolved_ts = (created_ts + pd.to_timedelta(resolution_hours, unit="h")).where(~unresolved_mask)
 
     tickets = pd.DataFrame(
         {
@@ -174,17 +221,174 @@ def build_support_tickets(users: pd.DataFrame, cfg: GeneratorConfig) -> pd.DataF
     return tickets.sort_values("created_ts").reset_index(drop=True)
 
 
-def write_raw_files(users: pd.DataFrame, events: pd.DataFrame, payments: pd.DataFrame, tickets: pd.DataFrame) -> None:
-    RAW_DIR.mkdir(parents=True, exist_ok=True)
-    users.to_csv(RAW_DIR / "users.csv", index=False)
-    events.to_csv(RAW_DIR / "events.csv", index=False)
-    payments.to_csv(RAW_DIR / "payments.csv", index=False)
-    tickets.to_csv(RAW_DIR / "support_tickets.csv", index=False)
-
-
-def generate_raw_data(cfg: GeneratorConfig) -> None:
-    users = build_users(cfg)
-    events = build_events(users, cfg)
-    payments = build_payments(users, cfg)
-    tickets = build_support_tickets(users, cfg)
-    write_raw_files(users, events, payments, tickets)
+def _to_columnar(frame: pd.DataFrame) -> pd.DataFrame:
+    """Dictionary-encode string columns; timestamps keep their datetime64 type."""
+    return frame.astype({col: "category" for col in frame.select_dtypes("object").columns})
+
+
+def write_raw_files(
+    users: pd.DataFrame,
+    events: pd.DataFrame,
+    payments: pd.DataFrame,
+    tickets: pd.DataFrame,
+    append: bool = False,
+    out_dir: Path | None = None,
+    raw_format: str = "csv",
+    part_index: int = 0,
+) -> None:
+    """Write one set of raw tables.
+
+    CSV output goes to ``<table>.csv`` (appended to when ``append``). Parquet
+    output is a dataset directory per table holding ``part-<part_index>.parquet``.
+    """
+    out_dir = out_dir or RAW_DIR
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for frame, table in zip((users, events, payments, tickets), RAW_TABLES):
+        if raw_format == "parquet":
+            (out_dir / table).mkdir(exist_ok=True)
+            _to_columnar(frame).to_parquet(out_dir / table / f"part-{part_index:05d}.parquet", index=False)
+        else:
+            frame.to_csv(out_dir / f"{table}.csv", index=False, mode="a" if append else "w", header=not append)
+
+
+def _reset_raw_outputs(out_dir: Path) -> None:
+    for table in RAW_TABLES:
+        (out_dir / f"{table}.csv").unlink(missing_ok=True)
+        shutil.rmtree(out_dir / table, ignore_errors=True)
+    shutil.rmtree(out_dir / PARTS_DIR_NAME, ignore_errors=True)
+
+
+def _block_configs(cfg: GeneratorConfig) -> list[tuple[int, int, GeneratorConfig]]:
+    """``(index, first_user_id, block_cfg)`` per block, seeds spawned from ``cfg.random_seed``."""
+    n_blocks = -(-cfg.n_users // cfg.block_size)
+    seeds = np.random.SeedSequence(cfg.random_seed).spawn(n_blocks)
+    return [
+        (
+            index,
+            index * cfg.block_size + 1,
+            replace(
+                cfg,
+                random_seed=int(seed.generate_state(1)[0]),
+                n_users=min(cfg.block_size, cfg.n_users - index * cfg.block_size),
+            ),
+        )
+        for index, seed in enumerate(seeds)
+    ]
+
+
+def _shards(cfg: GeneratorConfig, shard_size: int) -> list[list[tuple[int, int, GeneratorConfig]]]:
+    """Group blocks into shards of ``shard_size`` users, rounded up to whole blocks."""
+    blocks = _block_configs(cfg)
+    per_shard = max(1, -(-shard_size // cfg.block_size))
+    return [blocks[i : i + per_shard] for i in range(0, len(blocks), per_shard)]
+
+
+def _build_block(
+    index: int,
+    first_user_id: int,
+    block_cfg: GeneratorConfig,
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    users = build_users(block_cfg, first_user_id=first_user_id)
+    events = build_events(users, block_cfg)
+    payments = build_payments(users, block_cfg)
+    tickets = build_support_tickets(users, block_cfg)
+    id_offset = index * BLOCK_ID_STRIDE
+    events["event_id"] += id_offset
+    payments["payment_id"] += id_offset
+    tickets["ticket_id"] += id_offset
+    return users, events, payments, tickets
+
+
+def _build_shard(
+    blocks: list[tuple[int, int, GeneratorConfig]],
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Concatenate blocks in order; each block stays sorted by time on its own."""
+    built = [_build_block(*block) for block in blocks]
+    if len(built) == 1:
+        return built[0]
+    users, events, payments, tickets = (pd.concat(frames, ignore_index=True) for frames in zip(*built))
+    return users, events, payments, tickets
+
+
+def iter_raw_chunks(
+    cfg: GeneratorConfig,
+) -> Iterator[tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]]:
+    """Yield ``(users, events, payments, tickets)`` for consecutive user-id shards.
+
+    Each shard holds ``cfg.chunk_size`` users (rounded up to whole blocks,
+    all users when unset), so only one shard is ever held in memory.
+    """
+    shard_size = cfg.chunk_size if cfg.chunk_size > 0 else cfg.n_users
+    for blocks in _shards(cfg, shard_size):
+        yield _build_shard(blocks)
+
+
+def _write_shard(index: int, blocks: list[tuple[int, int, GeneratorConfig]], parts_dir: Path) -> int:
+    users, events, payments, tickets = _build_shard(blocks)
+    n_rows = len(users) + len(events) + len(payments) + len(tickets)
+
+    if blocks[0][2].raw_format == "parquet":
+        write_raw_files(users, events, payments, tickets, out_dir=parts_dir, raw_format="parquet", part_index=index)
+        return n_rows
+
+    for frame, table in zip((users, events, payments, tickets), RAW_TABLES):
+        (parts_dir / table).mkdir(parents=True, exist_ok=True)
+        frame.to_csv(parts_dir / table / f"part-{index:05d}.csv", index=False)
+    return n_rows
+
+
+def _merge_parts(parts_dir: Path, out_dir: Path) -> None:
+    """Concatenate CSV part files in shard order, keeping only the first header."""
+    for table in RAW_TABLES:
+        parts = sorted((parts_dir / table).glob("part-*.csv"))
+        with (out_dir / f"{table}.csv").open("wb") as out:
+            for part_index, part in enumerate(parts):
+                with part.open("rb") as f:
+                    header = f.readline()
+                    if part_index == 0:
+                        out.write(header)
+                    shutil.copyfileobj(f, out)
+
+
+def generate_raw_data_parallel(cfg: GeneratorConfig) -> int:
+    """Generate shards in a process pool.
+
+    Shards are ``chunk_size`` users (or ``n_users / workers`` when unset) of
+    blocks seeded from ``cfg.random_seed`` via ``SeedSequence.spawn``, so the
+    rows written depend on neither the worker count nor scheduling. Parquet
+    shards are written straight into the raw dataset directories; CSV shards
+    are written as part files and merged afterwards.
+    """
+    shard_size = cfg.chunk_size if cfg.chunk_size > 0 else -(-cfg.n_users // cfg.workers)
+    parquet = cfg.raw_format == "parquet"
+    parts_dir = RAW_DIR if parquet else RAW_DIR / PARTS_DIR_NAME
+
+    with ProcessPoolExecutor(max_workers=cfg.workers) as pool:
+        futures = [
+            pool.submit(_write_shard, index, blocks, parts_dir)
+            for index, blocks in enumerate(_shards(cfg, shard_size))
+        ]
+        n_rows = sum(future.result() for future in futures)
+
+    if not parquet:
+        _merge_parts(parts_dir, RAW_DIR)
+        shutil.rmtree(parts_dir)
+    return n_rows
+
+
+def generate_raw_data(cfg: GeneratorConfig) -> int:
+    """Write the raw tables under ``RAW_DIR`` and return the number of rows generated."""
+    if cfg.raw_format not in RAW_FORMATS:
+        raise ValueError(f"Unsupported raw_format {cfg.raw_format!r}; expected one of {RAW_FORMATS}")
+    # Resolve the default once, so shards and tables agree even across midnight.
+    cfg = replace(cfg, reference_date=_end_dt(cfg).isoformat())
+    _reset_raw_outputs(RAW_DIR)
+
+    if cfg.workers > 1:
+        return generate_raw_data_parallel(cfg)
+
+    n_rows = 0
+    for index, chunk in enumerate(iter_raw_chunks(cfg)):
+        write_raw_files(*chunk, append=index > 0, raw_format=cfg.raw_format, part_index=index)
+        n_rows += sum(len(frame) for frame in chunk)
+    return n_rows
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from .config import BASE_DIR
+from .metrics import peak_rss_mb
+from .sql_dag import ModelTiming, SqlModel, discover_models, run_models
+from .sql_runner import IndexSpec, bulk_load_pragmas, create_indexes, invalidate_fingerprints
+
+WATERMARK_TABLE = "_pipeline_watermarks"
+INCREMENTAL_SQL_DIR = BASE_DIR / "sql" / "incremental"
+
+
+@dataclass
+class IncrementalSpec:
+    model: str
+    key: str
+    ts_column: str
+
+
+# Append-only staging models: new rows are those whose key is above the
+# recorded high-water mark. ts_column drives the affected metric dates
+# (DATE() of a stored date column is a no-op) and the checksum that detects
+# regenerated raw history at the mark.
+INCREMENTAL_STAGING = [
+    IncrementalSpec("staging_users", "user_id", "signup_ts"),
+    IncrementalSpec("staging_events", "event_id", "event_date"),
+    IncrementalSpec("staging_payments", "payment_id", "payment_date"),
+    IncrementalSpec("staging_support_tickets", "ticket_id", "created_ts"),
+]
+
+# Date-keyed indexes so date-partition refreshes read only the affected
+# days. The events one matches STAGING_INDEXES and is created once.
+INCREMENTAL_INDEXES = [
+    IndexSpec("staging_users", ("signup_ts",)),
+    IndexSpec("staging_events", ("event_type", "event_date", "user_id", "event_ts")),
+    IndexSpec("staging_payments", ("payment_date", "payment_status", "amount_usd")),
+    IndexSpec("staging_support_tickets", ("created_ts",)),
+]
+
+# Marts refreshed per metric_date partition, with their partition-filtered SQL.
+INCREMENTAL_MARTS = {
+    "marts_daily_kpis": INCREMENTAL_SQL_DIR / "01_daily_kpis.sql",
+}
+
+# Keys just below the high-water mark whose rows are checksummed to detect
+# regenerated raw history, so the check stages a fixed number of rows
+# instead of the whole history.
+HISTORY_CHECK_KEYS = 1000
+
+
+def _table_exists(con: sqlite3.Connection, table: str) -> bool:
+    row = con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    return row is not None
+
+
+@dataclass
+class Watermark:
+    """High-water mark of a staging table plus a checksum of the keys in (check_from, high_water_mark]."""
+
+    high_water_mark: int
+    check_from: int
+    row_count: int
+    ts_checksum: int
+
+
+def _ensure_watermark_table(con: sqlite3.Connection) -> None:
+    con.execute(
+        f"CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} ("
+        "table_name TEXT PRIMARY KEY, key_column TEXT, high_water_mark INTEGER, "
+        "check_from INTEGER, row_count INTEGER, ts_checksum INTEGER, updated_at TEXT)"
+    )
+    columns = {row[1] for row in con.execute(f"PRAGMA table_info({WATERMARK_TABLE})")}
+    if "check_from" not in columns:
+        # Written without checksums at the mark; dropping it forces one full rebuild.
+        con.execute(f"DROP TABLE {WATERMARK_TABLE}")
+        _ensure_watermark_table(con)
+
+
+def get_watermark(con: sqlite3.Connection, table: str) -> Watermark | None:
+    _ensure_watermark_table(con)
+    row = con.execute(
+        f"SELECT high_water_mark, check_from, row_count, ts_checksum FROM {WATERMARK_TABLE} WHERE table_name = ?",
+        (table,),
+    ).fetchone()
+    return None if row is None or row[0] is None else Watermark(*row)
+
+
+def set_watermark(con: sqlite3.Connection, spec: IncrementalSpec, value: Watermark) -> None:
+    con.execute(
+        f"INSERT OR REPLACE INTO {WATERMARK_TABLE} VALUES (?, ?, ?, ?, ?, ?, datetime('now'))",
+        (spec.model, spec.key, value.high_water_mark, value.check_from, value.row_count, value.ts_checksum),
+    )
+
+
+def _history_sql(spec: IncrementalSpec, source: str) -> str:
+    """Row count and an integer checksum of ``ts_column`` over ``source``."""
+    return (
+        f"SELECT COUNT(*), COALESCE(SUM(CAST(strftime('%s', {spec.ts_column}) AS INTEGER)), 0) "
+        f"FROM {source}"
+    )
+
+
+def history_unchanged(con: sqlite3.Connection, spec: IncrementalSpec, model: SqlModel, mark: Watermark) -> bool:
+    """Whether the raw rows just below ``mark`` are absent or still match what was staged.
+
+    Incremental runs expect raw tables that hold only rows above the mark
+    (or an unchanged history plus them). Keys are only unique within one
+    generated dataset, though: a regenerated raw table renumbers them with
+    different rows behind the same ids, so a bare high-water mark would
+    silently mix two histories. Only the last ``HISTORY_CHECK_KEYS`` keys are
+    compared, so an edit further back in an otherwise unchanged history is
+    not detected; regenerated data changes the rows at the mark too.
+    """
+    sql = _history_sql(spec, f"({model.select_sql}) WHERE {spec.key} > ? AND {spec.key} <= ?")
+    count, checksum = con.execute(sql, (mark.check_from, mark.high_water_mark)).fetchone()
+    return count == 0 or (count, checksum) == (mark.row_count, mark.ts_checksum)
+
+
+def append_staging(
+    con: sqlite3.Connection,
+    models: dict[str, SqlModel],
+    timings: dict[str, ModelTiming] | None = None,
+) -> set[str] | None:
+    """Append raw rows above each staging model's high-water mark.
+
+    A staging table is rebuilt from scratch when it has no watermark or its
+    raw history was rewritten (see ``history_unchanged``). Returns the metric
+    dates touched by the new rows, or ``None`` when any staging table was
+    rebuilt (every date is affected).
+    """
+    affected: set[str] | None = set()
+    for spec in INCREMENTAL_STAGING:
+        start, cpu_start = time.perf_counter(), time.thread_time()
+        model = models[spec.model]
+        watermark = get_watermark(con, spec.model)
+
+        rebuild = watermark is None or not _table_exists(con, spec.model)
+        if not rebuild and not history_unchanged(con, spec, model, watermark):
+            print(f"      {spec.model}: raw history changed below {spec.key} {watermark.high_water_mark}, rebuilding")
+            rebuild = True
+        if rebuild:
+            con.executescript(model.sql)
+            affected = None
+            first_new_rowid = 0
+        else:
+            first_new_rowid = con.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {spec.model}").fetchone()[0]
+            con.execute(
+                f"INSERT INTO {spec.model} SELECT * FROM ({model.select_sql}) WHERE {spec.key} > ?",
+                (watermark.high_water_mark,),
+            )
+
+        # Appended rows get rowids above the previous maximum, so these read only the delta.
+        delta = f"{spec.model} WHERE rowid > {first_new_rowid}"
+        new_max = con.execute(f"SELECT MAX({spec.key}) FROM {delta}").fetchone()[0]
+        if affected is not None:
+            rows = con.execute(f"SELECT DISTINCT DATE({spec.ts_column}) FROM {delta}").fetchall()
+            affected.update(row[0] for row in rows if row[0] is not None)
+        if new_max is not None:
+            # Checksum the keys just below the new mark; all of them are in the delta.
+            check_from = new_max - HISTORY_CHECK_KEYS
+            if not rebuild:
+                check_from = max(check_from, watermark.high_water_mark)
+            sql = _history_sql(spec, f"{delta} AND {spec.key} > ?")
+            count, checksum = con.execute(sql, (check_from,)).fetchone()
+            set_watermark(con, spec, Watermark(new_max, check_from, count, checksum))
+        con.commit()
+
+        timing = ModelTiming(time.perf_counter() - start, time.thread_time() - cpu_start, peak_rss_mb())
+        if timings is not None:
+            timings[spec.model] = timing
+        mark = None if watermark is None or rebuild else watermark.high_water_mark
+        print(f"      {spec.model}: {timing.wall_s:.2f}s (watermark {spec.key} > {mark})")
+    return affected
+
+
+def refresh_partitions(
+    con: sqlite3.Connection,
+    model: SqlModel,
+    sql_path: Path,
+    affected_dates: set[str],
+) -> None:
+    """Replace the ``metric_date`` rows of ``model`` listed in ``affected_dates``."""
+    if not _table_exists(con, model.name):
+        con.executescript(model.sql)
+        return
+    if not affected_dates:
+        return
+
+    con.execute("DROP TABLE IF EXISTS temp.affected_dates")
+    con.execute("CREATE TEMP TABLE affected_dates (metric_date TEXT PRIMARY KEY)")
+    con.executemany("INSERT INTO temp.affected_dates VALUES (?)", [(d,) for d in sorted(affected_dates)])
+    con.execute(f"DELETE FROM {model.name} WHERE metric_date IN (SELECT metric_date FROM temp.affected_dates)")
+    con.execute(f"INSERT INTO {model.name} {sql_path.read_text(encoding='utf-8')}", {"since": min(affected_dates)})
+    con.execute("DROP TABLE temp.affected_dates")
+    con.commit()
+
+
+def run_incremental(
+    con: sqlite3.Connection,
+    folders: list[Path],
+    max_workers: int = 4,
+    indexes: list[IndexSpec] | None = None,
+) -> dict[str, ModelTiming]:
+    """Append staging deltas, refresh affected KPI dates, rebuild the other marts."""
+    models = discover_models(folders)
+    timings: dict[str, ModelTiming] = {}
+    # Tables changed in place here no longer match their cached fingerprints.
+    invalidate_fingerprints(con, list(models))
+
+    with bulk_load_pragmas(con):
+        affected = append_staging(con, models, timings)
+    # Indexes on downstream models (int_*) are built once those models are.
+    all_indexes = [*(indexes or []), *INCREMENTAL_INDEXES]
+    staging = {spec.model for spec in INCREMENTAL_STAGING}
+    create_indexes(con, [spec for spec in all_indexes if spec.table in staging])
+    con.commit()
+
+    for name, sql_path in INCREMENTAL_MARTS.items():
+        start, cpu_start = time.perf_counter(), time.thread_time()
+        if affected is None:
+            con.executescript(models[name].sql)
+            con.commit()
+        else:
+            refresh_partitions(con, models[name], sql_path, affected)
+        timings[name] = ModelTiming(time.perf_counter() - start, time.thread_time() - cpu_start, peak_rss_mb())
+        n_dates = "all" if affected is None else len(affected)
+        print(f"      {name}: {timings[name].wall_s:.2f}s ({n_dates} metric dates)")
+
+    handled = staging | INCREMENTAL_MARTS.keys()
+    rest = {name: model for name, model in models.items() if name not in handled}
+
+    def on_built(con: sqlite3.Connection, table: str) -> None:
+        table_indexes = [spec for spec in all_indexes if spec.table == table]
+        if table_indexes:
+            create_indexes(con, table_indexes)
+
+    timings.update(run_models(con, rest, max_workers=max_workers, on_built=on_built))
+    return timings
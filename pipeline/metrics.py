@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import sys
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .config import EXPORT_DIR
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+if TYPE_CHECKING:
+    from .sql_dag import Connection, ModelTiming, SqlModel
+
+RUN_METRICS_PATH = EXPORT_DIR / "run_metrics.json"
+
+
+def peak_rss_mb() -> float | None:
+    """High-water resident set size of this process or its largest child, in MiB.
+
+    This is ``ru_maxrss``: the peak over the whole process lifetime so far,
+    not over any one stage.
+    """
+    if resource is None:
+        return None
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # ru_maxrss is bytes on macOS and KiB elsewhere.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def table_row_count(con: Connection, table: str) -> int | None:
+    exists = con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    if exists is None:
+        return None
+    return int(con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0])
+
+
+def query_plan(con: Connection, select_sql: str) -> list[str]:
+    """``EXPLAIN QUERY PLAN`` rows, indented by tree depth."""
+    if not isinstance(con, sqlite3.Connection):
+        from .duckdb_backend import query_plan as duckdb_query_plan
+
+        return duckdb_query_plan(con, select_sql)
+    depth: dict[int, int] = {0: -1}
+    lines = []
+    for node_id, parent_id, _, detail in con.execute(f"EXPLAIN QUERY PLAN {select_sql}").fetchall():
+        depth[node_id] = depth.get(parent_id, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+
+@dataclass
+class StageMetrics:
+    name: str
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    # Process-lifetime RSS high-water mark when the stage ended, and how much
+    # the stage raised it (0 when an earlier stage had already peaked higher).
+    rss_high_water_mb: float | None = None
+    rss_growth_mb: float | None = None
+    rows_in: int | None = None
+    rows_out: int | None = None
+
+
+@dataclass
+class ModelMetrics:
+    name: str
+    wall_s: float
+    cpu_s: float
+    # Process-lifetime high-water mark when the model finished.
+    rss_high_water_mb: float | None
+    rows_in: int | None
+    rows_out: int | None
+    query_plan: list[str] = field(default_factory=list)
+
+
+class RunMetrics:
+    """Collects per-stage and per-model measurements for one pipeline run."""
+
+    def __init__(self) -> None:
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.stages: list[StageMetrics] = []
+        self.models: list[ModelMetrics] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageMetrics]:
+        stage = StageMetrics(name=name)
+        start, cpu_start, rss_start = time.perf_counter(), time.process_time(), peak_rss_mb()
+        try:
+            yield stage
+        finally:
+            stage.wall_s = round(time.perf_counter() - start, 4)
+            stage.cpu_s = round(time.process_time() - cpu_start, 4)
+            stage.rss_high_water_mb = peak_rss_mb()
+            if rss_start is not None:
+                stage.rss_growth_mb = round(stage.rss_high_water_mb - rss_start, 1)
+            self.stages.append(stage)
+
+    def record_models(
+        self,
+        con: Connection,
+        models: dict[str, SqlModel],
+        timings: dict[str, ModelTiming],
+        explain_prefix: str = "marts_",
+    ) -> int:
+        """Add row counts (and query plans for matching models); returns total rows out."""
+        counts: dict[str, int | None] = {}
+
+        def count(table: str) -> int | None:
+            if table not in counts:
+                counts[table] = table_row_count(con, table)
+            return counts[table]
+
+        total_out = 0
+        for name, timing in timings.items():
+            model = models[name]
+            inputs = [count(ref) for ref in sorted(model.references)]
+            rows_out = count(name)
+            total_out += rows_out or 0
+            self.models.append(
+                ModelMetrics(
+                    name=name,
+                    wall_s=round(timing.wall_s, 4),
+                    cpu_s=round(timing.cpu_s, 4),
+                    rss_high_water_mb=timing.rss_high_water_mb,
+                    rows_in=sum(n for n in inputs if n is not None),
+                    rows_out=rows_out,
+                    query_plan=query_plan(con, model.select_sql) if name.startswith(explain_prefix) else [],
+                )
+            )
+        return total_out
+
+    def to_dict(self) -> dict[str, object]:
+        return {
+            "started_at": self.started_at,
+            "total_wall_s": round(sum(s.wall_s for s in self.stages), 4),
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": [asdict(s) for s in self.stages],
+            "models": [asdict(m) for m in self.models],
+        }
+
+    def write(self, path: Path | None = None) -> Path:
+        path = path or RUN_METRICS_PATH
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), indent=2), encoding="utf-8")
+        return path
+
+
+@contextmanager
+def profiled(profiler: str, out_dir: Path | None = None) -> Iterator[None]:
+    """Profile the enclosed block with ``cprofile`` or ``pyinstrument``; ``none`` is a no-op."""
+    out_dir = out_dir or EXPORT_DIR
+    if profiler == "cprofile":
+        import cProfile
+
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            prof.dump_stats(out_dir / "run_profile.prof")
+    elif profiler == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError as exc:
+            raise RuntimeError("profiler 'pyinstrument' requires `pip install pyinstrument`") from exc
+
+        prof = Profiler()
+        prof.start()
+        try:
+            yield
+        finally:
+            prof.stop()
+            (out_dir / "run_profile.html").write_text(prof.output_html(), encoding="utf-8")
+    elif profiler in ("none", "", None):
+        yield
+    else:
+        raise ValueError(f"Unknown profiler {profiler!r}; expected none, cprofile or pyinstrument")
@@ -2,65 +2,307 @@ from __future__ import annotations
 
 import json
 import sqlite3
-from dataclasses import dataclass
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+
+import numpy as np
 
 from .config import EXPORT_DIR
+from .sketches import HyperLogLog, sample_size, wilson_interval, z_score
+from .sql_dag import Connection, warehouse_file
+
+
+def rows_where(predicate: str) -> str:
+    """Aggregate counting the rows that match ``predicate`` (0 on an empty table)."""
+    return f"COALESCE(SUM(CASE WHEN {predicate} THEN 1 ELSE 0 END), 0)"
 
 
 @dataclass
 class QualityCheck:
     name: str
-    query: str
+    table: str
+    # Aggregate expression over ``table`` that evaluates to the fail count.
+    fail_count: str
+    max_fail_count: int = 0
+    # Extra per-row columns (e.g. window functions) that ``fail_count`` reads.
+    columns: dict[str, str] = field(default_factory=dict)
+    mode: str = field(default="exact", init=False)
+    error_budget: float = field(default=0.0, init=False)
+
+
+APPROXIMATE_METHODS = ("sample", "distinct", "range")
+
+
+@dataclass
+class ApproximateCheck:
+    """A check answered from a sample or a sketch instead of a full exact query.
+
+    ``method`` decides what ``expr`` is and what ``error_budget`` bounds:
+
+    - ``sample``: ``expr`` is a failing-row predicate evaluated on a Bernoulli
+      sample of rowids; the budget is the confidence half-width on the fail rate.
+    - ``distinct``: ``expr`` is a key column streamed through a HyperLogLog;
+      fail count is duplicate rows and the budget is the relative error of the
+      distinct estimate.
+    - ``range``: ``expr`` is a column whose streaming min/max must stay within
+      ``min_value``/``max_value``. Within bounds the fail count is exactly 0;
+      otherwise out-of-range rows are estimated like ``sample`` and the
+      budget is that sample's half-width.
+    """
+
+    name: str
+    table: str
+    method: str
+    expr: str
+    error_budget: float = 0.01
     max_fail_count: int = 0
+    min_value: float | None = None
+    max_value: float | None = None
+    confidence: float = 0.95
+    mode: str = field(default="approximate", init=False)
+
+    def __post_init__(self) -> None:
+        if self.method not in APPROXIMATE_METHODS:
+            raise ValueError(f"Unknown method {self.method!r}; expected one of {APPROXIMATE_METHODS}")
 
 
 QUALITY_CHECKS = [
     QualityCheck(
         name="duplicate_user_ids",
-        query="""
-            SELECT COUNT(*) AS fail_count
-            FROM (
-              SELECT user_id
-              FROM staging_users
-              GROUP BY user_id
-              HAVING COUNT(*) > 1
-            ) d
-        """,
+        table="staging_users",
+        # The second row of each user_id partition marks one duplicated id.
+        fail_count=rows_where("_user_id_rank = 2"),
+        columns={"_user_id_rank": "ROW_NUMBER() OVER (PARTITION BY user_id)"},
     ),
     QualityCheck(
         name="null_event_timestamp",
-        query="SELECT COUNT(*) AS fail_count FROM staging_events WHERE event_ts IS NULL",
+        table="staging_events",
+        fail_count=rows_where("event_ts IS NULL"),
     ),
     QualityCheck(
         name="negative_payment_amount",
-        query="SELECT COUNT(*) AS fail_count FROM staging_payments WHERE amount_usd < 0",
+        table="staging_payments",
+        fail_count=rows_where("amount_usd < 0"),
     ),
     QualityCheck(
         name="daily_kpi_not_empty",
-        query="SELECT CASE WHEN COUNT(*) > 0 THEN 0 ELSE 1 END AS fail_count FROM marts_daily_kpis",
+        table="marts_daily_kpis",
+        fail_count="CASE WHEN COUNT(*) > 0 THEN 0 ELSE 1 END",
     ),
     QualityCheck(
         name="conversion_rate_range",
-        query="""
-            SELECT COUNT(*) AS fail_count
-            FROM marts_daily_kpis
-            WHERE conversion_rate < 0 OR conversion_rate > 1
-        """,
+        table="marts_daily_kpis",
+        fail_count=rows_where("conversion_rate < 0 OR conversion_rate > 1"),
     ),
 ]
 
 
-def run_checks(con: sqlite3.Connection) -> list[dict[str, object]]:
+# Hourly gate: sketches and samples where the exact check would scan or sort
+# a large table; the cheap emptiness check stays exact.
+APPROXIMATE_CHECKS: list[QualityCheck | ApproximateCheck] = [
+    ApproximateCheck(
+        name="duplicate_user_ids",
+        table="staging_users",
+        method="distinct",
+        expr="user_id",
+        error_budget=0.01,
+    ),
+    ApproximateCheck(
+        name="null_event_timestamp",
+        table="staging_events",
+        method="sample",
+        expr="event_ts IS NULL",
+        error_budget=0.005,
+    ),
+    ApproximateCheck(
+        name="negative_payment_amount",
+        table="staging_payments",
+        method="sample",
+        expr="amount_usd < 0",
+        error_budget=0.005,
+    ),
+    QUALITY_CHECKS[3],
+    ApproximateCheck(
+        name="conversion_rate_range",
+        table="marts_daily_kpis",
+        method="range",
+        expr="conversion_rate",
+        min_value=0,
+        max_value=1,
+        error_budget=0.005,
+    ),
+]
+
+CHECK_SETS = {"exact": QUALITY_CHECKS, "approximate": APPROXIMATE_CHECKS}
+SKETCH_BATCH_ROWS = 100_000
+
+
+def compile_table_checks(table: str, checks: list[QualityCheck]) -> str:
+    """Fuse every check on ``table`` into one aggregate query, one column per check."""
+    columns = {name: expr for check in checks for name, expr in check.columns.items()}
+    source = table
+    if columns:
+        derived = ", ".join(f"{expr} AS {name}" for name, expr in columns.items())
+        source = f"(SELECT *, {derived} FROM {table})"
+    select_list = ",\n  ".join(f"{check.fail_count} AS {check.name}" for check in checks)
+    return f"SELECT\n  {select_list}\nFROM {source}"
+
+
+def _on_connection(warehouse_path: str, fn: Callable[[sqlite3.Connection], dict]) -> dict:
+    """Call ``fn`` on a fresh connection, so each thread reads independently under WAL."""
+    con = sqlite3.connect(warehouse_path, timeout=600)
+    try:
+        return fn(con)
+    finally:
+        con.close()
+
+
+def _exact_results(con: Connection, table: str, checks: list[QualityCheck]) -> dict[str, dict[str, object]]:
+    row = con.execute(compile_table_checks(table, checks)).fetchone()
+    return {
+        check.name: {"fail_count": int(value), "estimate": int(value), "lower": int(value), "upper": int(value)}
+        for check, value in zip(checks, tuple(row))
+    }
+
+
+def _sample_result(con: Connection, check: ApproximateCheck, rng: np.random.Generator) -> dict[str, object]:
+    """Estimate failing rows from uniformly drawn rowids; O(sample) B-tree seeks."""
+    min_rowid, max_rowid = con.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {check.table}").fetchone()
+    # SQLite rowids start at 1, DuckDB's at 0.
+    min_rowid = min_rowid or 0
+    span = 0 if max_rowid is None else max_rowid - min_rowid + 1
+    n = sample_size(check.error_budget, check.confidence)
+    if n >= span:
+        rowids = np.arange(min_rowid, min_rowid + span)
+    else:
+        rowids = np.unique(rng.integers(min_rowid, max_rowid + 1, size=n))
+    sample = con.execute(
+        f"SELECT CASE WHEN {check.expr} THEN 1 ELSE 0 END FROM {check.table} "
+        "WHERE rowid IN (SELECT value FROM json_each(?))",
+        (json.dumps(rowids.tolist()),),
+    ).fetchall()
+    found, failed = len(sample), sum(row[0] for row in sample)
+    # Rowids missing after deletes are uniform misses, so the hit rate scales
+    # the rowid range to a row-count estimate.
+    est_rows = span * found / len(rowids) if len(rowids) else 0
+    if len(rowids) == span:
+        lower = upper = failed
+    else:
+        low_rate, high_rate = wilson_interval(failed, found, check.confidence)
+        lower, upper = low_rate * est_rows, high_rate * est_rows
+    return {
+        "estimate": round(failed / found * est_rows, 2) if found else 0,
+        "lower": round(lower, 2),
+        "upper": round(upper, 2),
+        "sample_rows": found,
+        "rows": round(est_rows),
+    }
+
+
+def _distinct_result(con: Connection, check: ApproximateCheck) -> dict[str, object]:
+    """Duplicate rows as ``rows - distinct``, with the distinct count from a HyperLogLog."""
+    sketch = HyperLogLog.for_error(check.error_budget)
+    cursor = con.cursor().execute(f"SELECT {check.expr} FROM {check.table}")
+    rows = 0
+    while batch := cursor.fetchmany(SKETCH_BATCH_ROWS):
+        sketch.add([row[0] for row in batch])
+        rows += len(batch)
+    distinct = min(sketch.estimate(), rows)
+    spread = z_score(check.confidence) * sketch.relative_error * distinct
+    return {
+        "estimate": round(rows - distinct, 2),
+        "lower": round(max(0.0, rows - distinct - spread), 2),
+        "upper": round(min(float(rows), rows - distinct + spread), 2),
+        "rows": rows,
+        "distinct_estimate": round(distinct),
+    }
+
+
+def _range_result(con: Connection, check: ApproximateCheck, rng: np.random.Generator) -> dict[str, object]:
+    """One streaming MIN/MAX pass; out-of-range rows are only counted (by sample) when a bound is violated."""
+    low, high = con.execute(f"SELECT MIN({check.expr}), MAX({check.expr}) FROM {check.table}").fetchone()
+    predicates = []
+    if low is not None and check.min_value is not None and low < check.min_value:
+        predicates.append(f"{check.expr} < {check.min_value}")
+    if high is not None and check.max_value is not None and high > check.max_value:
+        predicates.append(f"{check.expr} > {check.max_value}")
+    observed = {"observed_min": low, "observed_max": high}
+    if not predicates:
+        return {"estimate": 0, "lower": 0, "upper": 0, **observed}
+    # Same failing-row predicate as the exact check, so fail_count is comparable.
+    if not check.error_budget:
+        failed = con.execute(f"SELECT COUNT(*) FROM {check.table} WHERE {' OR '.join(predicates)}").fetchone()[0]
+        return {"estimate": failed, "lower": failed, "upper": failed, **observed}
+    sampled = ApproximateCheck(
+        name=check.name,
+        table=check.table,
+        method="sample",
+        expr=" OR ".join(predicates),
+        error_budget=check.error_budget,
+        confidence=check.confidence,
+    )
+    return {**_sample_result(con, sampled, rng), **observed}
+
+
+def _approximate_results(con: Connection, check: ApproximateCheck, seed: int | None) -> dict[str, dict[str, object]]:
+    if check.method == "sample":
+        result = _sample_result(con, check, np.random.default_rng(seed))
+    elif check.method == "distinct":
+        result = _distinct_result(con, check)
+    else:
+        result = _range_result(con, check, np.random.default_rng(seed))
+    return {check.name: {"fail_count": round(result["estimate"]), **result}}
+
+
+def run_checks(
+    con: Connection,
+    checks: list[QualityCheck | ApproximateCheck] = QUALITY_CHECKS,
+    max_workers: int = 4,
+    seed: int | None = None,
+) -> list[dict[str, object]]:
+    """Run ``checks`` with one scan per exact target table, tables in parallel.
+
+    Approximate checks run as their own tasks alongside the fused exact
+    queries. Results keep the order of ``checks``. An approximate check fails
+    only when the lower bound of its estimate exceeds the threshold. In-memory
+    connections cannot be shared across threads, so their tasks run serially.
+    """
+    by_table: dict[str, list[QualityCheck]] = {}
+    tasks: list[Callable[[Connection], dict[str, dict[str, object]]]] = []
+    for check in checks:
+        if isinstance(check, ApproximateCheck):
+            tasks.append(partial(_approximate_results, check=check, seed=seed))
+        else:
+            by_table.setdefault(check.table, []).append(check)
+    for table, table_checks in by_table.items():
+        tasks.append(partial(_exact_results, table=table, checks=table_checks))
+
+    outcomes: dict[str, dict[str, object]] = {}
+    warehouse_path = warehouse_file(con)
+    if not warehouse_path or max_workers <= 1 or len(tasks) == 1:
+        for task in tasks:
+            outcomes.update(task(con))
+    else:
+        con.commit()
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(tasks))) as pool:
+            for outcome in pool.map(lambda task: _on_connection(warehouse_path, task), tasks):
+                outcomes.update(outcome)
+
     results: list[dict[str, object]] = []
-    for check in QUALITY_CHECKS:
-        fail_count = int(con.execute(check.query).fetchone()[0])
-        status = "PASS" if fail_count <= check.max_fail_count else "FAIL"
+    for check in checks:
+        outcome = outcomes[check.name]
+        status = "PASS" if outcome["lower"] <= check.max_fail_count else "FAIL"
         results.append(
             {
                 "check": check.name,
-                "fail_count": fail_count,
+                "fail_count": outcome["fail_count"],
                 "threshold": check.max_fail_count,
                 "status": status,
+                "mode": check.mode,
+                "error_budget": check.error_budget,
+                **{key: value for key, value in outcome.items() if key != "fail_count"},
             }
         )
     return results
@@ -73,9 +315,15 @@ def export_quality_report(results: list[dict[str, object]]) -> None:
 
     json_path.write_text(json.dumps(results, indent=2), encoding="utf-8")
 
-    lines = ["# Quality Report", "", "| Check | Fail Count | Threshold | Status |", "|---|---:|---:|---|"]
+    lines = [
+        "# Quality Report",
+        "",
+        "| Check | Mode | Fail Count | Bounds | Threshold | Status |",
+        "|---|---|---:|---|---:|---|",
+    ]
     for r in results:
         lines.append(
-            f"| {r['check']} | {r['fail_count']} | {r['threshold']} | {r['status']} |"
+            f"| {r['check']} | {r['mode']} | {r['fail_count']} | [{r['lower']}, {r['upper']}] "
+            f"| {r['threshold']} | {r['status']} |"
         )
     md_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
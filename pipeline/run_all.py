@@ -1,51 +1,109 @@
 from __future__ import annotations
 
+import argparse
 from pathlib import Path
+from typing import Any
 
-from .config import BASE_DIR, ensure_directories, load_config
+from .config import CONFIG_PATH, SQL_FOLDERS, ensure_directories, load_config
 from .exports import export_marts
 from .generate_data import GeneratorConfig, generate_raw_data
-from .quality import export_quality_report, run_checks
-from .sql_runner import connect, execute_sql_folder, load_raw_tables
+from .incremental import run_incremental
+from .metrics import RunMetrics, profiled
+from .quality import CHECK_SETS, export_quality_report, run_checks
+from .sql_dag import discover_models
+from .sql_runner import STAGING_INDEXES, connect, execute_sql_folders, load_raw_tables
 
 
-def run() -> None:
-    cfg = load_config()
+def run(force: bool = False, config_path: Path = CONFIG_PATH) -> None:
+    """Run the pipeline; ``force`` rebuilds tables and exports even when cached."""
+    cfg = load_config(config_path)
     ensure_directories()
 
+    with profiled(str(cfg["pipeline"].get("profiler") or "none")):
+        _run_stages(cfg, force)
+
+
+def _run_stages(cfg: dict[str, Any], force: bool) -> None:
+    metrics = RunMetrics()
+
     gen_cfg = GeneratorConfig(
         random_seed=int(cfg["pipeline"]["random_seed"]),
         days_back=int(cfg["pipeline"]["days_back"]),
         n_users=int(cfg["pipeline"]["n_users"]),
         avg_events_per_user=int(cfg["pipeline"]["avg_events_per_user"]),
         avg_tickets_per_user=float(cfg["pipeline"]["avg_tickets_per_user"]),
+        chunk_size=int(cfg["pipeline"].get("chunk_size") or 0),
+        workers=int(cfg["pipeline"].get("workers") or 1),
+        raw_format=str(cfg["pipeline"].get("raw_format", "csv")),
+        # YAML reads an unquoted YYYY-MM-DD as a date.
+        reference_date=str(cfg["pipeline"]["reference_date"]) if cfg["pipeline"].get("reference_date") else None,
     )
 
     print("[1/6] Generating synthetic raw data")
-    generate_raw_data(gen_cfg)
+    with metrics.stage("generate") as stage:
+        stage.rows_out = generate_raw_data(gen_cfg)
+
+    incremental = bool(cfg["pipeline"].get("incremental", False))
+    engine = str(cfg["pipeline"].get("engine", "sqlite"))
+    if incremental and engine != "sqlite":
+        raise ValueError("incremental mode requires engine: sqlite")
 
     print("[2/6] Connecting to warehouse")
-    con = connect(reset_database=bool(cfg["pipeline"]["reset_database"]))
+    with metrics.stage("connect"):
+        con = connect(reset_database=bool(cfg["pipeline"]["reset_database"]) and not incremental, engine=engine)
 
     try:
         print("[3/6] Loading raw tables")
-        load_raw_tables(con)
+        with metrics.stage("load") as stage:
+            loaded = load_raw_tables(con, raw_format=gen_cfg.raw_format, force=force)
+            stage.rows_in = stage.rows_out = sum(loaded.values())
 
-        print("[4/6] Running staging SQL")
-        execute_sql_folder(con, BASE_DIR / "sql" / "staging")
+        print("[4/6] Running staging, intermediate and mart SQL models")
+        sql_folders = SQL_FOLDERS
+        sql_workers = int(cfg["pipeline"].get("sql_workers") or 4)
+        indexes = STAGING_INDEXES if cfg["pipeline"].get("staging_indexes", True) else None
+        with metrics.stage("sql_models") as stage:
+            if incremental:
+                timings = run_incremental(con, sql_folders, max_workers=sql_workers, indexes=indexes)
+            else:
+                timings = execute_sql_folders(
+                    con, sql_folders, max_workers=sql_workers, indexes=indexes, force=force
+                )
+            stage.rows_in = sum(loaded.values())
+        stage.rows_out = metrics.record_models(con, discover_models(sql_folders), timings)
 
-        print("[5/6] Running mart SQL")
-        execute_sql_folder(con, BASE_DIR / "sql" / "marts")
+        print("[5/6] Running quality checks")
+        with metrics.stage("quality") as stage:
+            quality_mode = str(cfg["pipeline"].get("quality_mode", "exact"))
+            quality_results = run_checks(
+                con, CHECK_SETS[quality_mode], max_workers=sql_workers, seed=gen_cfg.random_seed
+            )
+            export_quality_report(quality_results)
+            stage.rows_out = len(quality_results)
 
-        print("[6/6] Running quality checks and exports")
-        quality_results = run_checks(con)
-        export_quality_report(quality_results)
-        export_marts(con)
+        print("[6/6] Exporting marts")
+        with metrics.stage("export") as stage:
+            export_formats = list(cfg["pipeline"].get("export_formats") or ["csv"])
+            manifest = export_marts(con, export_formats, max_workers=sql_workers, force=force)
+            stage.rows_out = sum(entry["rows"] for entry in manifest["marts"].values())
+        unchanged = [name for name, entry in manifest["marts"].items() if not entry["changed"]]
+        if unchanged:
+            print(f"      unchanged, not rewritten: {', '.join(unchanged)}")
     finally:
         con.close()
 
-    print("Pipeline completed. See data/exports for outputs.")
+    metrics_path = metrics.write()
+    print(f"Run metrics written to {metrics_path}")
+    print(f"Pipeline completed. See {metrics_path.parent} for outputs.")
 
 
 if __name__ == "__main__":
-    run()
+    parser = argparse.ArgumentParser(description="Run the local lakehouse pipeline end to end.")
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Reload raw tables, rebuild every SQL model and rewrite exports even when unchanged.",
+    )
+    parser.add_argument("--config", type=Path, default=CONFIG_PATH, help="Pipeline YAML config to run with.")
+    args = parser.parse_args()
+    run(force=args.force, config_path=args.config)
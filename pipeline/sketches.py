@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import math
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+
+def z_score(confidence: float) -> float:
+    """Two-sided normal quantile, e.g. 1.96 for 0.95."""
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+def sample_size(error_budget: float, confidence: float = 0.95) -> int:
+    """Rows needed so a proportion's confidence half-width is at most ``error_budget``."""
+    return math.ceil(z_score(confidence) ** 2 * 0.25 / error_budget**2)
+
+
+def wilson_interval(successes: int, trials: int, confidence: float = 0.95) -> tuple[float, float]:
+    """Wilson score interval for a binomial proportion (well-behaved at 0 and 1)."""
+    if trials == 0:
+        return 0.0, 1.0
+    z = z_score(confidence)
+    p = successes / trials
+    denom = 1 + z**2 / trials
+    centre = (p + z**2 / (2 * trials)) / denom
+    half = z * math.sqrt(p * (1 - p) / trials + z**2 / (4 * trials**2)) / denom
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+_MISSING_HASH = np.uint64(0x9E3779B97F4A7C15)
+
+
+class HyperLogLog:
+    """Distinct-count sketch with ``2**precision`` registers of one byte each.
+
+    Relative standard error is ``1.04 / sqrt(2**precision)``; ``add`` hashes a
+    whole array at a time.
+    """
+
+    def __init__(self, precision: int = 14) -> None:
+        if not 4 <= precision <= 18:
+            raise ValueError("precision must be between 4 and 18")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    @classmethod
+    def for_error(cls, relative_error: float) -> HyperLogLog:
+        """Smallest sketch whose standard error is within ``relative_error``."""
+        precision = math.ceil(math.log2((1.04 / relative_error) ** 2))
+        return cls(min(max(precision, 4), 18))
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def add(self, values: np.ndarray | pd.Series | list[object]) -> None:
+        series = pd.Series(values)
+        missing = series.isna().to_numpy()
+        # Hash typed arrays (object arrays are hashed via str, ~100x slower);
+        # all missing values count as one distinct key, like SQL GROUP BY.
+        hashes = pd.util.hash_array(series[~missing].infer_objects().to_numpy())
+        if missing.any():
+            hashes = np.append(hashes, _MISSING_HASH)
+        index = hashes >> np.uint64(64 - self.precision)
+        # Rank of the first set bit among the top 32 remaining bits; frexp is
+        # exact for 32-bit integers, and all-zero (p = 2**-32) saturates.
+        rest = ((hashes << np.uint64(self.precision)) >> np.uint64(32)).astype(np.float64)
+        _, exponent = np.frexp(rest)
+        rank = np.where(rest > 0, 33 - exponent, 33).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def estimate(self) -> float:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int32)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is far more accurate for small cardinalities.
+            return m * math.log(m / zeros)
+        return float(raw)
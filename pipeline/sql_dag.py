@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import re
+import sqlite3
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Protocol
+
+from .metrics import peak_rss_mb
+
+_TARGET_RE = re.compile(r"\bCREATE\s+TABLE\s+([A-Za-z_][A-Za-z0-9_]*)", re.IGNORECASE)
+_REFERENCE_RE = re.compile(r"\b(?:FROM|JOIN)\s+([A-Za-z_][A-Za-z0-9_]*)", re.IGNORECASE)
+
+
+class Connection(Protocol):
+    """The warehouse connection API shared by ``sqlite3`` and DuckDB."""
+
+    def execute(self, sql: str, parameters: Any = ..., /) -> Any: ...
+
+    def cursor(self) -> Any: ...
+
+    def commit(self) -> None: ...
+
+    def close(self) -> None: ...
+
+
+@dataclass
+class SqlModel:
+    name: str
+    path: Path
+    sql: str
+    references: set[str]
+    depends_on: set[str] = field(default_factory=set)
+
+    @property
+    def select_sql(self) -> str:
+        """The ``SELECT`` that defines the model, without the surrounding DDL."""
+        match = re.search(rf"\bCREATE\s+TABLE\s+{self.name}\s+AS\s+(.*?);?\s*$", self.sql, re.IGNORECASE | re.DOTALL)
+        if match is None:
+            raise ValueError(f"{self.path} is not a CREATE TABLE ... AS SELECT model")
+        return match.group(1)
+
+
+@dataclass
+class ModelTiming:
+    wall_s: float
+    cpu_s: float
+    # Process-lifetime RSS high-water mark (see metrics.peak_rss_mb).
+    rss_high_water_mb: float | None = None
+
+
+def parse_model(path: Path) -> SqlModel:
+    """Read a ``DROP TABLE IF EXISTS x; CREATE TABLE x AS ...`` model file."""
+    sql = path.read_text(encoding="utf-8")
+    match = _TARGET_RE.search(sql)
+    if match is None:
+        raise ValueError(f"{path} does not contain a CREATE TABLE statement")
+    name = match.group(1)
+    references = set(_REFERENCE_RE.findall(sql)) - {name}
+    return SqlModel(name=name, path=path, sql=sql, references=references)
+
+
+def discover_models(folders: Iterable[Path]) -> dict[str, SqlModel]:
+    """Parse every ``*.sql`` model and resolve dependencies between them.
+
+    References that are not produced by another model (raw tables, CTE names)
+    are treated as external inputs.
+    """
+    models: dict[str, SqlModel] = {}
+    for folder in folders:
+        for sql_file in sorted(folder.glob("*.sql")):
+            model = parse_model(sql_file)
+            models[model.name] = model
+    for model in models.values():
+        model.depends_on = model.references & models.keys()
+    return models
+
+
+def _temp_sql(model: SqlModel) -> str:
+    """Rewrite a model to materialize into the connection's TEMP schema."""
+    sql = re.sub(
+        rf"\bDROP\s+TABLE\s+IF\s+EXISTS\s+{model.name}\s*;",
+        "",
+        model.sql,
+        flags=re.IGNORECASE,
+    )
+    return re.sub(rf"\bCREATE\s+TABLE\s+{model.name}\b", f"CREATE TEMP TABLE {model.name}", sql, flags=re.IGNORECASE)
+
+
+def _build_model(
+    warehouse_path: str,
+    model: SqlModel,
+    on_built: Callable[[sqlite3.Connection, str], None] | None,
+) -> ModelTiming:
+    """Compute a model into TEMP on its own connection, then swap it into main.
+
+    The expensive query only reads the warehouse, so models run concurrently
+    under WAL; the write lock is held just for the final copy.
+    """
+    start, cpu_start = time.perf_counter(), time.thread_time()
+    con = sqlite3.connect(warehouse_path, timeout=600)
+    try:
+        con.executescript(_temp_sql(model))
+        con.execute("BEGIN IMMEDIATE")
+        con.execute(f"DROP TABLE IF EXISTS main.{model.name}")
+        con.execute(f"CREATE TABLE main.{model.name} AS SELECT * FROM temp.{model.name}")
+        # Drop the TEMP copy so unqualified names in on_built resolve to main.
+        con.execute(f"DROP TABLE temp.{model.name}")
+        if on_built is not None:
+            on_built(con, model.name)
+        con.commit()
+    finally:
+        con.close()
+    return ModelTiming(time.perf_counter() - start, time.thread_time() - cpu_start, peak_rss_mb())
+
+
+def warehouse_file(con: Connection) -> str:
+    """File behind a SQLite connection, or "" when it cannot be reopened per thread."""
+    if not isinstance(con, sqlite3.Connection):
+        return ""
+    for _, name, file in con.execute("PRAGMA database_list").fetchall():
+        if name == "main":
+            return file
+    return ""
+
+
+def run_models(
+    con: sqlite3.Connection,
+    models: dict[str, SqlModel],
+    max_workers: int = 4,
+    on_built: Callable[[sqlite3.Connection, str], None] | None = None,
+) -> dict[str, ModelTiming]:
+    """Run models in dependency order, independent ones concurrently.
+
+    Returns per-model wall and CPU time in seconds. In-memory connections cannot be
+    shared across threads, so they fall back to serial execution on ``con``.
+    """
+    warehouse_path = warehouse_file(con)
+    con.commit()
+    if not warehouse_path or max_workers <= 1:
+        return _run_serial(con, models, on_built)
+
+    con.execute("PRAGMA journal_mode=WAL")
+    timings: dict[str, ModelTiming] = {}
+    pending = dict(models)
+    running: dict[Future[ModelTiming], str] = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            ready = [m for m in pending.values() if not (m.depends_on & (pending.keys() | set(running.values())))]
+            for model in ready:
+                del pending[model.name]
+                running[pool.submit(_build_model, warehouse_path, model, on_built)] = model.name
+            if not running:
+                raise ValueError(f"Cyclic model dependencies: {sorted(pending)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                timings[name] = future.result()
+                print(f"      {name}: {timings[name].wall_s:.2f}s")
+    return timings
+
+
+def _run_serial(
+    con: sqlite3.Connection,
+    models: dict[str, SqlModel],
+    on_built: Callable[[sqlite3.Connection, str], None] | None,
+) -> dict[str, ModelTiming]:
+    timings: dict[str, ModelTiming] = {}
+    pending = dict(models)
+    while pending:
+        ready = [m for m in pending.values() if not (m.depends_on & pending.keys())]
+        if not ready:
+            raise ValueError(f"Cyclic model dependencies: {sorted(pending)}")
+        for model in ready:
+            start, cpu_start = time.perf_counter(), time.thread_time()
+            con.executescript(model.sql)
+            if on_built is not None:
+                on_built(con, model.name)
+            con.commit()
+            timings[model.name] = ModelTiming(
+                time.perf_counter() - start, time.thread_time() - cpu_start, peak_rss_mb()
+            )
+            print(f"      {model.name}: {timings[model.name].wall_s:.2f}s")
+            del pending[model.name]
+    return timings
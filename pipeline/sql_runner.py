@@ -1,14 +1,41 @@
 from __future__ import annotations
 
+import hashlib
+import re
 import sqlite3
+import uuid
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
+from . import duckdb_backend
 from .config import RAW_DIR, WAREHOUSE_PATH
+from .duckdb_backend import is_duckdb
+from .sql_dag import Connection, ModelTiming, SqlModel, discover_models, run_models
 
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency; loads fall back to pandas
+    pa = None
+
+ENGINES = ("sqlite", "duckdb")
+
+
+def connect(reset_database: bool = False, engine: str = "sqlite") -> Connection:
+    """Open the warehouse for ``engine``; ``duckdb`` returns a DuckDB connection."""
+    if engine not in ENGINES:
+        raise ValueError(f"Unsupported engine {engine!r}; expected one of {ENGINES}")
+    if engine == "duckdb":
+        return duckdb_backend.connect(reset_database)
 
-def connect(reset_database: bool = False) -> sqlite3.Connection:
     if reset_database and WAREHOUSE_PATH.exists():
         WAREHOUSE_PATH.unlink()
 
@@ -17,20 +44,436 @@ def connect(reset_database: bool = False) -> sqlite3.Connection:
     return con
 
 
-def load_raw_tables(con: sqlite3.Connection) -> None:
-    tables = {
-        "raw_users": RAW_DIR / "users.csv",
-        "raw_events": RAW_DIR / "events.csv",
-        "raw_payments": RAW_DIR / "payments.csv",
-        "raw_support_tickets": RAW_DIR / "support_tickets.csv",
-    }
-    for table_name, csv_path in tables.items():
-        df = pd.read_csv(csv_path)
-        df.to_sql(table_name, con, if_exists="replace", index=False)
+# Raw source files and the declared schema of the raw tables loaded from them.
+RAW_TABLES: dict[str, tuple[str, dict[str, str]]] = {
+    "raw_users": (
+        "users",
+        {
+            "user_id": "INTEGER",
+            "signup_ts": "TEXT",
+            "acquisition_channel": "TEXT",
+            "country": "TEXT",
+            "plan_tier": "TEXT",
+            "company_size": "TEXT",
+        },
+    ),
+    "raw_events": (
+        "events",
+        {
+            "event_id": "INTEGER",
+            "user_id": "INTEGER",
+            "event_ts": "TEXT",
+            "event_type": "TEXT",
+            "feature_name": "TEXT",
+            "experiment_name": "TEXT",
+            "experiment_variant": "TEXT",
+            "session_duration_sec": "REAL",
+        },
+    ),
+    "raw_payments": (
+        "payments",
+        {
+            "payment_id": "INTEGER",
+            "user_id": "INTEGER",
+            "payment_ts": "TEXT",
+            "amount_usd": "REAL",
+            "payment_status": "TEXT",
+            "invoice_type": "TEXT",
+        },
+    ),
+    "raw_support_tickets": (
+        "support_tickets",
+        {
+            "ticket_id": "INTEGER",
+            "user_id": "INTEGER",
+            "created_ts": "TEXT",
+            "resolved_ts": "TEXT",
+            "severity": "TEXT",
+            "csat_score": "INTEGER",
+        },
+    ),
+}
+
+LOAD_BATCH_ROWS = 100_000
+# Rows per multi-row INSERT are sized to SQLite's historical 999 bound-variable limit.
+MAX_BIND_VARIABLES = 999
+# Negative cache_size is in KiB: 256 MiB of page cache while loading.
+LOAD_PRAGMAS = {"synchronous": "OFF", "cache_size": "-262144"}
+# pyarrow's CSV reader batches by bytes; raw rows average well under 100 bytes.
+_CSV_BLOCK_BYTES = LOAD_BATCH_ROWS * 100
+_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _raw_parquet_files(source: str) -> list[Path]:
+    return sorted((RAW_DIR / source).glob("*.parquet"))
+
+
+def iter_raw_batches(table_name: str, raw_format: str = "csv") -> Iterator[pa.RecordBatch]:
+    """Stream the projected columns of a raw table as Arrow batches, never the whole file."""
+    if pa is None:
+        raise RuntimeError("streaming raw tables requires `pip install pyarrow`")
+    source, schema = RAW_TABLES[table_name]
+    columns = list(schema)
+    if raw_format == "parquet":
+        for path in _raw_parquet_files(source):
+            yield from pq.ParquetFile(path).iter_batches(batch_size=LOAD_BATCH_ROWS, columns=columns)
+        return
+    arrow_types = {"INTEGER": pa.int64(), "REAL": pa.float64(), "TEXT": pa.string()}
+    yield from pa_csv.open_csv(
+        RAW_DIR / f"{source}.csv",
+        read_options=pa_csv.ReadOptions(block_size=_CSV_BLOCK_BYTES),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=columns,
+            column_types={col: arrow_types[sql_type] for col, sql_type in schema.items()},
+            strings_can_be_null=True,
+        ),
+    )
+
+
+def iter_raw_table(table_name: str, raw_format: str = "csv") -> Iterator[pd.DataFrame]:
+    """Yield the projected columns of a raw table in frames of ``LOAD_BATCH_ROWS`` rows."""
+    source, schema = RAW_TABLES[table_name]
+    columns = list(schema)
+    if raw_format == "parquet":
+        for batch in iter_raw_batches(table_name, raw_format):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(RAW_DIR / f"{source}.csv", usecols=columns, chunksize=LOAD_BATCH_ROWS)
+
+
+def read_raw_table(table_name: str, raw_format: str = "csv") -> pd.DataFrame:
+    return pd.concat(iter_raw_table(table_name, raw_format), ignore_index=True)
+
+
+def _timestamps_as_text(df: pd.DataFrame) -> pd.DataFrame:
+    """Format datetime columns as SQLite text in one pass instead of per row."""
+    for col in df.select_dtypes("datetime64").columns:
+        values = df[col].to_numpy().astype("datetime64[s]")
+        text = np.datetime_as_string(values)
+        # ISO output is "YYYY-MM-DDTHH:MM:SS"; swap the separator in place.
+        text.view("<U1").reshape(len(text), -1)[:, 10] = " "
+        text = text.astype(object)
+        text[np.isnat(values)] = None
+        df[col] = text
+    return df
+
+
+def _column_values(series: pd.Series) -> list[object]:
+    """Python scalars for sqlite3 binding, with missing values as None."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Code -1 (missing) indexes the trailing None.
+        lookup = np.array([*series.cat.categories.tolist(), None], dtype=object)
+        return lookup[series.cat.codes.to_numpy()].tolist()
+    values = series.tolist()
+    if series.hasnans:
+        for i in np.flatnonzero(series.isna().to_numpy()):
+            values[i] = None
+    return values
+
+
+def _arrow_column_values(column: pa.Array) -> list[object]:
+    """Python scalars for sqlite3 binding; timestamps become SQLite text."""
+    if pa.types.is_timestamp(column.type):
+        column = pc.strftime(column.cast(pa.timestamp("s", column.type.tz), safe=False), _TIMESTAMP_FORMAT)
+    return column.to_pylist()
+
+
+def _interleave(column_values: list[list[object]]) -> list[object]:
+    """Row-major flat list of column lists, built with one slice assignment per column."""
+    width = len(column_values)
+    flat: list[object] = [None] * (width * len(column_values[0]))
+    for i, values in enumerate(column_values):
+        flat[i::width] = values
+    return flat
+
+
+def _raw_value_batches(table_name: str, raw_format: str) -> Iterator[list[object]]:
+    """Row-major values of a raw table, one flat list per batch."""
+    columns = list(RAW_TABLES[table_name][1])
+    if pa is not None:
+        for batch in iter_raw_batches(table_name, raw_format):
+            if batch.num_rows:
+                yield _interleave([_arrow_column_values(batch.column(col)) for col in columns])
+        return
+    for df in iter_raw_table(table_name, raw_format):
+        if len(df):
+            df = _timestamps_as_text(df)
+            yield _interleave([_column_values(df[col]) for col in columns])
+
+
+def _insert_flat(con: sqlite3.Connection, table_name: str, columns: list[str], flat: list[object]) -> int:
+    """Insert row-major ``flat`` values with multi-row VALUES statements.
+
+    Binding dominates a sqlite3 load, and one statement per row pays the
+    per-step overhead on every row; packing rows amortises it.
+    """
+    width = len(columns)
+    rows_per_stmt = max(1, MAX_BIND_VARIABLES // width)
+    row_sql = f"({', '.join('?' for _ in columns)})"
+    insert_sql = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES "
+    stmt_width = rows_per_stmt * width
+    packed = len(flat) - len(flat) % stmt_width
+    con.executemany(
+        insert_sql + ", ".join([row_sql] * rows_per_stmt),
+        (flat[i : i + stmt_width] for i in range(0, packed, stmt_width)),
+    )
+    con.executemany(insert_sql + row_sql, (flat[i : i + width] for i in range(packed, len(flat), width)))
+    return len(flat) // width
+
+
+@contextmanager
+def bulk_load_pragmas(con: sqlite3.Connection) -> Iterator[None]:
+    """Relax durability and enlarge the page cache for the duration of a bulk load."""
+    previous = {name: con.execute(f"PRAGMA {name}").fetchone()[0] for name in LOAD_PRAGMAS}
+    con.execute("PRAGMA journal_mode=WAL")
+    for name, value in LOAD_PRAGMAS.items():
+        con.execute(f"PRAGMA {name}={value}")
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            con.execute(f"PRAGMA {name}={value}")
+
+
+MODEL_CACHE_TABLE = "_pipeline_model_cache"
+# SQL whose result depends on when it runs can never be served from cache.
+_VOLATILE_RE = re.compile(r"'now'|\bCURRENT_(?:DATE|TIME|TIMESTAMP)\b|\brandom\s*\(", re.IGNORECASE)
+
+
+def _ensure_cache_table(con: Connection) -> None:
+    con.execute(
+        f"CREATE TABLE IF NOT EXISTS {MODEL_CACHE_TABLE} ("
+        "table_name TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, materialized_at TEXT NOT NULL)"
+    )
+
+
+def get_fingerprints(con: Connection) -> dict[str, str]:
+    """Fingerprint of every table as of its last recorded materialization."""
+    _ensure_cache_table(con)
+    return dict(con.execute(f"SELECT table_name, fingerprint FROM {MODEL_CACHE_TABLE}").fetchall())
 
 
-def execute_sql_folder(con: sqlite3.Connection, folder: Path) -> None:
-    for sql_file in sorted(folder.glob("*.sql")):
-        sql_text = sql_file.read_text(encoding="utf-8")
-        con.executescript(sql_text)
+def record_fingerprint(con: Connection, table: str, fingerprint: str) -> None:
+    """Record ``fingerprint`` for ``table`` in the caller's transaction."""
+    _ensure_cache_table(con)
+    con.execute(
+        f"INSERT OR REPLACE INTO {MODEL_CACHE_TABLE} VALUES (?, ?, ?)",
+        (table, fingerprint, datetime.now().isoformat(timespec="seconds")),
+    )
+
+
+def invalidate_fingerprints(con: Connection, tables: list[str]) -> None:
+    """Forget recorded fingerprints, e.g. after tables are modified outside the cache."""
+    _ensure_cache_table(con)
+    con.executemany(f"DELETE FROM {MODEL_CACHE_TABLE} WHERE table_name = ?", [(t,) for t in tables])
     con.commit()
+
+
+def raw_source_fingerprint(table_name: str, raw_format: str = "csv") -> str:
+    """BLAKE2b over the bytes of a raw table's source file(s)."""
+    source, _ = RAW_TABLES[table_name]
+    if raw_format == "parquet":
+        files = _raw_parquet_files(source)
+    else:
+        files = [RAW_DIR / f"{source}.csv"]
+    digest = hashlib.blake2b(raw_format.encode(), digest_size=16)
+    for path in files:
+        digest.update(path.name.encode())
+        with path.open("rb") as f:
+            while block := f.read(1 << 20):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def _existing_tables(con: Connection) -> set[str]:
+    return {row[0] for row in con.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()}
+
+
+def load_raw_tables(con: Connection, raw_format: str = "csv", force: bool = False) -> dict[str, int]:
+    """Load every raw table into typed tables inside a single transaction.
+
+    Tables whose source files hash to the fingerprint recorded at their last
+    load are kept as they are unless ``force``. Returns rows per table.
+    """
+    row_counts: dict[str, int] = {}
+    recorded = get_fingerprints(con)
+    existing = _existing_tables(con)
+    con.commit()
+    if is_duckdb(con):
+        return _load_raw_tables_duckdb(con, raw_format, force, recorded, existing)
+    with bulk_load_pragmas(con):
+        con.execute("BEGIN")
+        try:
+            for table_name, (_, schema) in RAW_TABLES.items():
+                fingerprint = raw_source_fingerprint(table_name, raw_format)
+                if not force and table_name in existing and recorded.get(table_name) == fingerprint:
+                    row_counts[table_name] = con.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+                    print(f"      {table_name}: unchanged, kept")
+                    continue
+                columns = list(schema)
+                column_defs = ", ".join(f"{col} {sql_type}" for col, sql_type in schema.items())
+                con.execute(f"DROP TABLE IF EXISTS {table_name}")
+                con.execute(f"CREATE TABLE {table_name} ({column_defs})")
+                row_counts[table_name] = 0
+                for flat in _raw_value_batches(table_name, raw_format):
+                    row_counts[table_name] += _insert_flat(con, table_name, columns, flat)
+                record_fingerprint(con, table_name, fingerprint)
+            con.commit()
+        except BaseException:
+            con.rollback()
+            raise
+    return row_counts
+
+
+def _load_raw_tables_duckdb(
+    con: Connection,
+    raw_format: str,
+    force: bool,
+    recorded: dict[str, str],
+    existing: set[str],
+) -> dict[str, int]:
+    """DuckDB scans the raw files itself, in parallel; no rows pass through Python."""
+    row_counts: dict[str, int] = {}
+    con.execute("BEGIN TRANSACTION")
+    try:
+        for table_name, (source, schema) in RAW_TABLES.items():
+            fingerprint = raw_source_fingerprint(table_name, raw_format)
+            if force or table_name not in existing or recorded.get(table_name) != fingerprint:
+                con.execute(duckdb_backend.raw_table_sql(table_name, source, schema, raw_format))
+                record_fingerprint(con, table_name, fingerprint)
+            else:
+                print(f"      {table_name}: unchanged, kept")
+            row_counts[table_name] = con.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+        con.execute("COMMIT")
+    except BaseException:
+        con.execute("ROLLBACK")
+        raise
+    return row_counts
+
+
+@dataclass
+class IndexSpec:
+    table: str
+    columns: tuple[str, ...]
+
+    @property
+    def name(self) -> str:
+        return f"idx_{self.table}__{'_'.join(self.columns)}"
+
+
+# Trailing columns make each index covering for the mart CTEs that use it;
+# a bare (event_type, user_id) index is slower than a scan because every
+# match then needs a table lookup. event_date second makes each event type
+# date-partitioned: windowed marts range-scan only the days they read and
+# daily rollups group in index order; event_ts keeps the exact window trim
+# covered too.
+STAGING_INDEXES = [
+    IndexSpec("staging_users", ("user_id",)),
+    IndexSpec("staging_events", ("event_type", "event_date", "user_id", "event_ts")),
+    IndexSpec("staging_events", ("experiment_name", "experiment_variant", "user_id")),
+    IndexSpec("staging_payments", ("user_id", "payment_status", "amount_usd")),
+    IndexSpec("staging_support_tickets", ("user_id", "resolved_ts")),
+    # The planner misjudges the exposures subquery in the experiment mart and
+    # will not build an automatic index for its join, so supply one.
+    IndexSpec("int_user_facts", ("user_id", "converted", "net_revenue_usd")),
+]
+
+# Rows sampled per index by ANALYZE; plenty for the planner and far cheaper
+# than a full pass over every index.
+ANALYSIS_LIMIT = 1000
+
+
+def create_indexes(con: sqlite3.Connection, indexes: list[IndexSpec] = STAGING_INDEXES) -> None:
+    """Create and ANALYZE ``indexes``; the caller commits, so they can share its transaction."""
+    for spec in indexes:
+        con.execute(f"CREATE INDEX IF NOT EXISTS {spec.name} ON {spec.table} ({', '.join(spec.columns)})")
+    con.execute(f"PRAGMA analysis_limit={ANALYSIS_LIMIT}")
+    for table in sorted({spec.table for spec in indexes}):
+        con.execute(f"ANALYZE {table}")
+
+
+def model_fingerprints(
+    con: Connection,
+    models: dict[str, SqlModel],
+    recorded: dict[str, str],
+) -> dict[str, str]:
+    """Cache key of every model: a hash of its SQL and its inputs' fingerprints.
+
+    Upstream models contribute their own key, external tables the fingerprint
+    recorded when they were loaded. A model that is volatile or reads an
+    unfingerprinted table gets a fresh random key, so it and everything
+    downstream of it always rebuilds.
+    """
+    existing = _existing_tables(con)
+    keys: dict[str, str] = {}
+    pending = dict(models)
+    while pending:
+        ready = [m for m in pending.values() if not (m.depends_on & pending.keys())]
+        if not ready:
+            raise ValueError(f"Cyclic model dependencies: {sorted(pending)}")
+        for model in ready:
+            digest = hashlib.sha256(model.sql.encode())
+            cacheable = not _VOLATILE_RE.search(model.sql)
+            for ref in sorted(model.references):
+                upstream = keys.get(ref) or recorded.get(ref)
+                if upstream is None and ref in existing:
+                    cacheable = False
+                digest.update(f"\0{ref}={upstream}".encode())
+            keys[model.name] = digest.hexdigest() if cacheable else f"volatile-{uuid.uuid4().hex}"
+            del pending[model.name]
+    return keys
+
+
+def _built_hook(
+    indexes: list[IndexSpec] | None,
+    fingerprints: dict[str, str],
+) -> Callable[[Connection, str], None]:
+    def on_built(con: Connection, table: str) -> None:
+        table_indexes = [spec for spec in indexes or [] if spec.table == table]
+        if table_indexes:
+            create_indexes(con, table_indexes)
+        # Same transaction as the table swap, so the cache never outlives a failed build.
+        record_fingerprint(con, table, fingerprints[table])
+
+    return on_built
+
+
+def execute_sql_folders(
+    con: Connection,
+    folders: list[Path],
+    max_workers: int = 4,
+    indexes: list[IndexSpec] | None = None,
+    force: bool = False,
+) -> dict[str, ModelTiming]:
+    """Run the models in ``folders`` as one dependency graph.
+
+    Models whose cache key matches the fingerprint recorded at their last
+    materialization are skipped unless ``force``. Each table's ``indexes`` are
+    built as soon as the table is materialized, before dependent models start.
+    Returns per-model timings of the models that ran.
+    """
+    models = discover_models(folders)
+    recorded = get_fingerprints(con)
+    con.commit()
+    fingerprints = model_fingerprints(con, models, recorded)
+    existing = _existing_tables(con)
+    stale = {
+        name: model
+        for name, model in models.items()
+        if force or name not in existing or recorded.get(name) != fingerprints[name]
+    }
+    for name in (name for name in models if name not in stale):
+        print(f"      {name}: cached")
+    if is_duckdb(con):
+        # No secondary indexes: DuckDB scans columnar zone maps instead.
+        return duckdb_backend.run_models(con, stale, on_built=_built_hook(None, fingerprints))
+    return run_models(con, stale, max_workers=max_workers, on_built=_built_hook(indexes, fingerprints))
+
+
+def execute_sql_folder(
+    con: Connection,
+    folder: Path,
+    max_workers: int = 4,
+    force: bool = False,
+) -> dict[str, ModelTiming]:
+    return execute_sql_folders(con, [folder], max_workers=max_workers, force=force)
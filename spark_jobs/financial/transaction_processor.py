@@ -127,12 +127,17 @@ class FinancialPipeline:
         writer.save(output_path)
         logger.info(f"Successfully wrote to {output_path}")
 
-    def run_pipeline(self, input_path, output_path):
-        """Execute full pipeline."""
+    def run_pipeline(self, input_path, output_path, input_format="csv"):
+        """Execute full pipeline.
+
+        With input_format="parquet", input_path can be the API's compacted
+        transaction log (date=YYYY-MM-DD/ partitions), which also provides
+        the ``date`` column the anomaly output is partitioned by.
+        """
         logger.info("Starting pipeline...")
         
         # Load data
-        df = self.load_transactions(input_path)
+        df = self.load_transactions(input_path, format=input_format)
         
         # Detect anomalies
         anomalies = self.detect_anomalies(df)
@@ -155,14 +160,15 @@ class FinancialPipeline:
 
 def main():
     if len(sys.argv) < 3:
-        print("Usage: python -m pipelines.transaction_processor --input <path> --output <path>")
+        print("Usage: python -m pipelines.transaction_processor <input_path> <output_path> [csv|parquet]")
         sys.exit(1)
     
     input_path = sys.argv[1]
     output_path = sys.argv[2]
+    input_format = sys.argv[3] if len(sys.argv) > 3 else "csv"
     
     pipeline = FinancialPipeline()
-    results = pipeline.run_pipeline(input_path, output_path)
+    results = pipeline.run_pipeline(input_path, output_path, input_format)
     print(f"Pipeline results: {results}")
 
 
@@ -0,0 +1,48 @@
+DROP TABLE IF EXISTS int_user_facts;
+CREATE TABLE int_user_facts AS
+-- One row per user with the per-user facts the marts share, computed in a
+-- single grouped pass per staging table instead of once per mart. Nothing
+-- here depends on the clock, so it stays cacheable; see
+-- 02_user_recent_sessions.sql for the "last 30 days" activity.
+WITH payment_facts AS (
+  SELECT
+    user_id,
+    MAX(CASE WHEN payment_status = 'success' THEN 1 ELSE 0 END) AS is_paying,
+    SUM(CASE WHEN payment_status = 'success' THEN amount_usd ELSE 0 END) -
+    SUM(CASE WHEN payment_status = 'refund' THEN amount_usd ELSE 0 END) AS net_revenue_usd
+  FROM staging_payments
+  GROUP BY 1
+),
+event_facts AS (
+  SELECT
+    user_id,
+    MAX(CASE WHEN event_type = 'subscription_started' THEN 1 ELSE 0 END) AS converted,
+    MAX(CASE WHEN event_type = 'churned' THEN 1 ELSE 0 END) AS churn_signal
+  FROM staging_events
+  -- Only the event types used above (see the event_type index); the rest of
+  -- the table is never read.
+  WHERE event_type IN ('subscription_started', 'churned')
+  GROUP BY 1
+),
+ticket_facts AS (
+  SELECT
+    user_id,
+    SUM(CASE WHEN resolved_ts IS NULL THEN 1 ELSE 0 END) AS open_ticket_count
+  FROM staging_support_tickets
+  GROUP BY 1
+)
+SELECT
+  u.user_id,
+  u.signup_ts,
+  u.acquisition_channel,
+  u.plan_tier,
+  COALESCE(e.converted, 0) AS converted,
+  COALESCE(e.churn_signal, 0) AS churn_signal,
+  COALESCE(p.is_paying, 0) AS is_paying,
+  -- NULL (not 0) for users with no payments, so averages skip them.
+  p.net_revenue_usd,
+  COALESCE(t.open_ticket_count, 0) AS open_ticket_count
+FROM staging_users u
+LEFT JOIN payment_facts p USING (user_id)
+LEFT JOIN event_facts e USING (user_id)
+LEFT JOIN ticket_facts t USING (user_id);
@@ -0,0 +1,13 @@
+DROP TABLE IF EXISTS int_user_recent_sessions;
+CREATE TABLE int_user_recent_sessions AS
+-- Sessions per user in the last 30 days. Kept apart from int_user_facts
+-- because it reads 'now': only this model and customer_health rebuild on
+-- every run. Reads just the last ~30 days of the event_date index.
+SELECT
+  user_id,
+  COUNT(*) AS sessions_last_30d
+FROM staging_events
+WHERE event_type = 'session_start'
+  AND event_date >= DATE('now', '-30 day')
+  AND event_ts >= datetime('now', '-30 day')
+GROUP BY 1;
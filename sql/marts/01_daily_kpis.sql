@@ -6,22 +6,26 @@ WITH signups AS (
   GROUP BY 1
 ),
 active_users AS (
-  SELECT DATE(event_ts) AS metric_date, COUNT(DISTINCT user_id) AS active_users
+  SELECT event_date AS metric_date, COUNT(DISTINCT user_id) AS active_users
   FROM staging_events
   WHERE event_type = 'session_start'
   GROUP BY 1
 ),
 conversions AS (
-  SELECT DATE(event_ts) AS metric_date, COUNT(DISTINCT user_id) AS paid_conversions
+  SELECT event_date AS metric_date, COUNT(DISTINCT user_id) AS paid_conversions
   FROM staging_events
   WHERE event_type = 'subscription_started'
   GROUP BY 1
 ),
 revenue AS (
   SELECT
-    DATE(payment_ts) AS metric_date,
-    SUM(CASE WHEN payment_status = 'success' THEN amount_usd ELSE 0 END) AS gross_revenue_usd,
-    SUM(CASE WHEN payment_status = 'refund' THEN amount_usd ELSE 0 END) AS refunded_usd
+    payment_date AS metric_date,
+    -- Summed in whole cents so the total does not depend on row order
+    -- (index-ordered partition refreshes vs full scans).
+    SUM(CASE WHEN payment_status = 'success' THEN CAST(ROUND(amount_usd * 100) AS BIGINT) ELSE 0 END) / 100.0
+      AS gross_revenue_usd,
+    SUM(CASE WHEN payment_status = 'refund' THEN CAST(ROUND(amount_usd * 100) AS BIGINT) ELSE 0 END) / 100.0
+      AS refunded_usd
   FROM staging_payments
   GROUP BY 1
 ),
@@ -48,7 +52,7 @@ SELECT
   COALESCE(t.tickets_opened, 0) AS tickets_opened,
   CASE
     WHEN COALESCE(s.new_users, 0) = 0 THEN 0
-    ELSE CAST(COALESCE(c.paid_conversions, 0) AS REAL) / s.new_users
+    ELSE CAST(COALESCE(c.paid_conversions, 0) AS DOUBLE) / s.new_users
   END AS conversion_rate,
   CASE
     WHEN COALESCE(r.gross_revenue_usd, 0) = 0 THEN 0
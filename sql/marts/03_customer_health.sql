@@ -1,57 +1,48 @@
 DROP TABLE IF EXISTS marts_customer_health;
 CREATE TABLE marts_customer_health AS
-WITH sessions_30d AS (
+WITH facts AS (
   SELECT
-    user_id,
-    COUNT(*) AS sessions_last_30d
-  FROM staging_events
-  WHERE event_type = 'session_start'
-    AND datetime(event_ts) >= datetime('now', '-30 day')
-  GROUP BY 1
+    f.user_id,
+    f.signup_ts,
+    f.acquisition_channel,
+    f.plan_tier,
+    COALESCE(s.sessions_last_30d, 0) AS sessions_last_30d,
+    COALESCE(f.net_revenue_usd, 0) AS net_revenue_usd,
+    f.open_ticket_count,
+    f.churn_signal
+  FROM int_user_facts f
+  LEFT JOIN int_user_recent_sessions s USING (user_id)
 ),
-revenue AS (
+raw_scores AS (
   SELECT
-    user_id,
-    SUM(CASE WHEN payment_status = 'success' THEN amount_usd ELSE 0 END) -
-    SUM(CASE WHEN payment_status = 'refund' THEN amount_usd ELSE 0 END) AS net_revenue_usd
-  FROM staging_payments
-  GROUP BY 1
+    *,
+    55
+    + CASE WHEN sessions_last_30d < 20 THEN sessions_last_30d ELSE 20 END * 2
+    + CASE WHEN net_revenue_usd / 20.0 < 20 THEN net_revenue_usd / 20.0 ELSE 20 END
+    - open_ticket_count * 7
+    - churn_signal * 25 AS raw_score
+  FROM facts
 ),
-open_tickets AS (
+clamped_scores AS (
+  -- CASE rather than scalar MIN/MAX (SQLite only).
   SELECT
-    user_id,
-    COUNT(*) AS open_ticket_count
-  FROM staging_support_tickets
-  WHERE resolved_ts IS NULL
-  GROUP BY 1
-),
-churn_signals AS (
-  SELECT DISTINCT user_id, 1 AS churn_signal
-  FROM staging_events
-  WHERE event_type = 'churned'
+    *,
+    CASE WHEN raw_score < 0 THEN 0 WHEN raw_score > 100 THEN 100 ELSE raw_score END AS clamped_score
+  FROM raw_scores
 )
 SELECT
-  u.user_id,
-  u.signup_ts,
-  u.acquisition_channel,
-  u.plan_tier,
-  COALESCE(s.sessions_last_30d, 0) AS sessions_last_30d,
-  ROUND(COALESCE(r.net_revenue_usd, 0), 2) AS net_revenue_usd,
-  COALESCE(o.open_ticket_count, 0) AS open_ticket_count,
-  COALESCE(c.churn_signal, 0) AS churn_signal,
-  CAST(MAX(
-    0,
-    MIN(
-      100,
-      55
-      + MIN(COALESCE(s.sessions_last_30d, 0), 20) * 2
-      + MIN(COALESCE(r.net_revenue_usd, 0) / 20.0, 20)
-      - COALESCE(o.open_ticket_count, 0) * 7
-      - COALESCE(c.churn_signal, 0) * 25
-    )
-  ) AS INTEGER) AS customer_health_score
-FROM staging_users u
-LEFT JOIN sessions_30d s USING (user_id)
-LEFT JOIN revenue r USING (user_id)
-LEFT JOIN open_tickets o USING (user_id)
-LEFT JOIN churn_signals c USING (user_id);
+  user_id,
+  signup_ts,
+  acquisition_channel,
+  plan_tier,
+  sessions_last_30d,
+  ROUND(net_revenue_usd, 2) AS net_revenue_usd,
+  open_ticket_count,
+  churn_signal,
+  -- Floor without FLOOR(), which SQLite only has when built with math
+  -- functions; engines disagree on whether CAST truncates or rounds.
+  CASE
+    WHEN CAST(clamped_score AS BIGINT) > clamped_score THEN CAST(clamped_score AS BIGINT) - 1
+    ELSE CAST(clamped_score AS BIGINT)
+  END AS customer_health_score
+FROM clamped_scores;
@@ -1,7 +1,7 @@
 DROP TABLE IF EXISTS staging_users;
 CREATE TABLE staging_users AS
 SELECT
-  CAST(user_id AS INTEGER) AS user_id,
+  CAST(user_id AS BIGINT) AS user_id,
   signup_ts AS signup_ts,
   acquisition_channel AS acquisition_channel,
   country AS country,
@@ -0,0 +1,378 @@
+from pathlib import Path
+import asyncio
+import json
+import random
+import statistics
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from fastapi import HTTPException, Response
+from fastapi.testclient import TestClient
+
+from api import main
+
+
+def _txn(i: int, amount: float = 25.0) -> dict:
+    return {"transaction_id": f"t{i}", "account_id": f"a{i % 3}", "timestamp": "2026-01-01T00:00:00", "amount": amount}
+
+
+@pytest.fixture(autouse=True)
+def _clear_stores():
+    main.transactions_store.clear()
+    main.anomalies_store.clear()
+    main.anomaly_detector.clear()
+    for metric in (main.REQUESTS, main.REQUEST_LATENCY, main.BATCH_SIZE):
+        metric.clear()
+    yield
+
+
+def test_processed_ack_waits_for_storage(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(main, "settings", main.IngestSettings(ack_mode="processed", batch_size=4))
+    with TestClient(main.app) as client:
+        single = client.post("/api/v1/ingest", json=_txn(0, amount=20_000))
+        batch = client.post("/api/v1/ingest/batch", json={"transactions": [_txn(i) for i in range(1, 11)]})
+
+        assert single.status_code == 200 and single.json()["status"] == "processed"
+        assert batch.status_code == 200 and {r["status"] for r in batch.json()} == {"processed"}
+        assert client.get("/api/v1/transactions/t10").json()["amount"] == 25.0
+        assert [a["anomaly_type"] for a in client.get("/api/v1/anomalies").json()] == ["very_high_amount"]
+
+
+def test_accepted_ack_returns_202_and_drains_on_shutdown(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(main, "settings", main.IngestSettings(ack_mode="accepted"))
+    with TestClient(main.app) as client:
+        response = client.post("/api/v1/ingest/batch", json={"transactions": [_txn(i) for i in range(50)]})
+        assert response.status_code == 202 and response.json()[0]["status"] == "accepted"
+    # Shutdown processes everything already accepted.
+    assert len(main.transactions_store) == 50
+
+
+def test_backpressure_rejects_when_full_or_stopped(monkeypatch: pytest.MonkeyPatch) -> None:
+    txn = main.Transaction(**_txn(0))
+
+    async def scenario() -> list[int]:
+        queue = main.IngestQueue(maxsize=2, batch_size=10)
+        monkeypatch.setattr(main, "ingest_queue", queue)
+        codes = []
+        for txns in ([txn], [txn, txn, txn]):
+            try:
+                await main._enqueue(txns, Response())
+            except HTTPException as exc:
+                codes.append(exc.status_code)
+        queue.start()
+        # Fill the queue before the consumer gets a turn.
+        queue.put_all([txn, txn], wait=False)
+        try:
+            await main._enqueue([txn], Response())
+        except HTTPException as exc:
+            codes.append(exc.status_code)
+            assert exc.headers["Retry-After"] == str(main.settings.retry_after_s)
+        await queue.stop()
+        return codes
+
+    # Not started -> 503 (twice); then full -> 429.
+    assert asyncio.run(scenario()) == [503, 503, 429]
+
+
+def test_store_round_trips_transactions_and_caps_anomalies() -> None:
+    store = main.TransactionStore()
+    timestamps = [
+        "2026-01-01T10:00:00",
+        "2026-01-01 10:00:00.250000",
+        "2026-01-01T10:00:00Z",
+        "yesterday",
+        "2026-01-01X10:00:00",
+    ]
+    txns = [
+        main.Transaction(**{**_txn(i), "timestamp": ts, "location": "NYC" if i % 2 else None})
+        for i, ts in enumerate(timestamps)
+    ]
+    for txn in txns:
+        store.add(txn)
+    assert [store.get(t.transaction_id) for t in txns] == [t.model_dump() for t in txns]
+
+    updated = main.Transaction(**{**_txn(1), "amount": 99.5})
+    assert store.add(updated) == 1 and len(store) == 5
+    assert store.get("t1") == updated.model_dump()
+    assert store.get("missing") is None
+
+    anomalies = main.AnomalyLog(store, retention=2)
+    for row in range(4):
+        anomalies.append(row, "very_high_amount")
+    assert anomalies.total == 4 and len(anomalies) == 2
+    assert [a["transaction_id"] for a in anomalies.recent(100)] == ["t2", "t3"]
+    assert [a["transaction_id"] for a in anomalies.recent(1)] == ["t3"]
+
+
+def test_log_replays_after_restart_and_truncates_torn_tail(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    wal_dir = tmp_path / "wal"
+    monkeypatch.setattr(main, "settings", main.IngestSettings(ack_mode="processed", wal_dir=str(wal_dir), wal_flush_ms=1))
+    with TestClient(main.app) as client:
+        assert client.post("/api/v1/ingest/batch", json={"transactions": [_txn(i) for i in range(5)]}).status_code == 200
+        assert client.get("/api/v1/stats").json()["durable"] is True
+    # A crash mid-append leaves a partial frame behind.
+    segment = sorted(wal_dir.glob("wal-*.log"))[-1]
+    with segment.open("ab") as f:
+        f.write(b"\x40\x00\x00\x00garbage")
+
+    main.transactions_store.clear()
+    with TestClient(main.app) as client:
+        assert client.get("/api/v1/stats").json()["total_transactions"] == 5
+        assert client.get("/api/v1/transactions/t4").json()["account_id"] == "a1"
+    assert segment.read_bytes()[-7:] != b"garbage"
+
+
+def test_failed_fsync_fails_the_log_and_refuses_ingestion(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    def failing_fsync(fd: int) -> None:
+        raise OSError(5, "Input/output error")
+
+    monkeypatch.setattr(main, "settings", main.IngestSettings(ack_mode="processed", wal_dir=str(tmp_path), wal_flush_ms=1))
+    with TestClient(main.app) as client:
+        monkeypatch.setattr(main.os, "fsync", failing_fsync)
+        first = client.post("/api/v1/ingest/batch", json={"transactions": [_txn(0)]})
+        assert first.status_code == 503 and "Write-ahead log" in first.json()["detail"]
+        assert client.get("/api/v1/stats").json()["durable"] is False
+        # Refused up front now, instead of waiting out process_timeout_s.
+        second = client.post("/api/v1/ingest", json=_txn(1))
+        assert second.status_code == 503 and "t1" not in main.transactions_store
+    # Shutdown still closes the log cleanly.
+    assert main.transaction_log is None
+
+
+def test_sealed_segments_compact_to_date_partitioned_parquet(tmp_path: Path) -> None:
+    pq = pytest.importorskip("pyarrow.parquet")
+    log = main.TransactionLog(tmp_path / "wal", tmp_path / "parquet", flush_ms=1, compact_interval_s=60)
+    txns = [
+        main.Transaction(**{**_txn(0), "timestamp": "2026-01-01T23:30:00-02:00"}),
+        main.Transaction(**{**_txn(1), "timestamp": "2026-01-02 08:00:00"}),
+        main.Transaction(**{**_txn(2), "timestamp": "not a timestamp"}),
+    ]
+
+    async def scenario() -> None:
+        log.open()
+        log.append(txns)
+        await log.rotate()
+        log.compact()
+        await log.close()
+
+    asyncio.run(scenario())
+    assert [p.name for p in log.segments()] == ["wal-00000002.log"]
+    dates = sorted(p.name for p in (tmp_path / "parquet").iterdir())
+    assert dates == ["date=2026-01-02", "date=__HIVE_DEFAULT_PARTITION__"]
+    table = pq.read_table(tmp_path / "parquet" / "date=2026-01-02")
+    assert sorted(table.column("transaction_id").to_pylist()) == ["t0", "t1"]
+    assert str(table.schema.field("timestamp").type) == "timestamp[us, tz=UTC]"
+
+
+def test_compacted_history_is_served_after_restart(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    pytest.importorskip("pyarrow")
+    wal_dir = tmp_path / "wal"
+    monkeypatch.setattr(main, "settings", main.IngestSettings(ack_mode="processed", wal_dir=str(wal_dir), wal_flush_ms=1))
+    txns = [_txn(i) for i in range(4)]
+    txns[1]["timestamp"] = "2026-01-01T23:30:00-02:00"
+    with TestClient(main.app) as client:
+        assert client.post("/api/v1/ingest/batch", json={"transactions": txns}).status_code == 200
+    for segment in sorted(wal_dir.glob("wal-*.log")):
+        main.compact_segment(segment, tmp_path / "transactions")
+
+    main.transactions_store.clear()
+    with TestClient(main.app) as client:
+        assert client.get("/api/v1/stats").json()["total_transactions"] == 0
+        expected = {**txns[3], "merchant_category": None, "location": None, "currency": "USD"}
+        assert client.get("/api/v1/transactions/t3").json() == expected
+        assert client.get("/api/v1/transactions/t1").json()["timestamp"] == "2026-01-02T01:30:00"
+        assert client.get("/api/v1/transactions/missing").status_code == 404
+    assert main.transaction_log is None
+
+
+def test_compacted_lookup_only_serves_the_newest_indexed_ids(tmp_path: Path) -> None:
+    pytest.importorskip("pyarrow")
+    log = main.TransactionLog(tmp_path / "wal", tmp_path / "parquet", flush_ms=1, compact_interval_s=60, index_size=2)
+
+    async def scenario() -> None:
+        log.open()
+        for ids in ([0, 1], [2], [1]):
+            log.append([main.Transaction(**_txn(i)) for i in ids])
+            await log.rotate()
+            log.compact()
+            await log._compaction
+        await log.close()
+
+    asyncio.run(scenario())
+    assert list(log._index) == ["t2", "t1"]
+    assert log.lookup("t0") is None
+    assert log.lookup("t1")["transaction_id"] == "t1"
+
+    reloaded = main.TransactionLog(tmp_path / "wal", tmp_path / "parquet", flush_ms=1, compact_interval_s=60, index_size=2)
+    reloaded.load_index()
+    assert list(reloaded._index) == ["t2", "t1"]
+    assert reloaded._index["t1"].name == "part-wal-00000003.parquet"
+
+
+def _batch_rules(amounts: list[float], window: int) -> list:
+    """FinancialPipeline.detect_anomalies for one account, recomputed per row."""
+    results = []
+    for i, amount in enumerate(amounts):
+        rows = amounts[max(0, i - window + 1):i + 1]
+        if len(rows) > 1 and amount > statistics.mean(rows) + 3 * statistics.stdev(rows):
+            results.append("high_amount")
+        elif len(rows) > 10:
+            results.append("high_velocity")
+        elif amount > 10_000:
+            results.append("very_high_amount")
+        else:
+            results.append(None)
+    return results
+
+
+@pytest.mark.parametrize("window", [12, 30, 1001])
+def test_online_detector_matches_batch_rules(window: int) -> None:
+    rng = random.Random(window)
+    detector = main.AnomalyDetector(window=window, max_accounts=1_000)
+    by_account: dict[str, list[float]] = {}
+    online = {}
+    for i in range(3_000):
+        account = f"a{rng.randrange(40 if window > 30 else 300)}"
+        amount = rng.choice([rng.uniform(5, 200), rng.uniform(5, 200), 50.0, rng.uniform(1_000, 20_000)])
+        by_account.setdefault(account, []).append(amount)
+        online.setdefault(account, []).append(detector.observe(account, amount))
+
+    assert online == {account: _batch_rules(amounts, window) for account, amounts in by_account.items()}
+    assert any(t == "high_amount" for types in online.values() for t in types)
+
+
+def test_online_detector_evicts_least_recently_seen_accounts() -> None:
+    detector = main.AnomalyDetector(window=1001, max_accounts=2)
+    for _ in range(11):
+        detector.observe("a", 10.0)
+    detector.observe("b", 10.0)
+    detector.observe("a", 10.0)
+    detector.observe("c", 10.0)
+
+    assert list(detector.accounts) == ["a", "c"]
+    assert detector.observe("a", 10.0) == "high_velocity"
+    # "b" starts again from an empty window.
+    assert detector.observe("b", 20_000.0) == "very_high_amount"
+
+
+def test_retried_transactions_are_not_observed_again() -> None:
+    big = main.Transaction(**{**_txn(0, amount=20_000), "account_id": "a0"})
+    for _ in range(12):
+        main.process_batch([big])
+    assert main.anomalies_store.total == 1 and len(main.transactions_store) == 1
+
+    # Retries did not fill a0's velocity window: with nine new ones it holds ten, not over the limit.
+    assert main.process_batch([main.Transaction(**{**_txn(i), "account_id": "a0"}) for i in range(1, 10)]) == 0
+    corrected = main.Transaction(**{**_txn(0, amount=30.0), "account_id": "a0"})
+    main.process_batch([corrected])
+    assert main.transactions_store.get("t0")["amount"] == 30.0
+    assert main.anomalies_store.total == 1
+
+
+def test_bulk_ingest_validates_columns_and_reports_rejected_rows(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(main, "settings", main.IngestSettings(ack_mode="processed", batch_size=3))
+    columns = {
+        "transaction_id": ["b0", "b1", "b2", "b3", 4, "b5"],
+        "account_id": ["a0", "a0", "a1", "a1", "a2", "a2"],
+        "timestamp": ["2026-01-01T00:00:00"] * 6,
+        "amount": [10.0, 20_000, -5.0, "x", 10.0, 7],
+        "merchant_category": ["grocery", None, "travel", "grocery", "grocery", 3],
+    }
+    with TestClient(main.app) as client:
+        response = client.post("/api/v1/ingest/bulk", json=columns)
+        assert response.status_code == 200
+        assert response.json() == {
+            "status": "processed",
+            "accepted": 2,
+            "rejected": 4,
+            "errors": {"transaction_id": [4], "amount": [2, 3], "merchant_category": [5]},
+        }
+        assert client.get("/api/v1/transactions/b1").json() == {
+            "transaction_id": "b1", "account_id": "a0", "timestamp": "2026-01-01T00:00:00",
+            "amount": 20_000.0, "merchant_category": None, "location": None, "currency": "USD",
+        }
+        assert [a["transaction_id"] for a in client.get("/api/v1/anomalies").json()] == ["b1"]
+
+        ndjson = "\n".join(json.dumps(_txn(i)) for i in range(10, 15)) + "\n"
+        response = client.post("/api/v1/ingest/bulk", content=ndjson, headers={"Content-Type": "application/x-ndjson"})
+        assert response.json()["accepted"] == 5 and "t14" in main.transactions_store
+
+        assert client.post("/api/v1/ingest/bulk", json={"amount": [1.0]}).status_code == 422
+        assert client.post("/api/v1/ingest/bulk", content="a,b", headers={"Content-Type": "text/csv"}).status_code == 415
+        rejected = client.post("/api/v1/ingest/bulk", json={**columns, "amount": [0] * 6})
+        assert rejected.status_code == 422 and rejected.json()["rejected"] == 6
+
+
+def test_bulk_ingest_reads_arrow_ipc(monkeypatch: pytest.MonkeyPatch) -> None:
+    pa = pytest.importorskip("pyarrow")
+    monkeypatch.setattr(main, "settings", main.IngestSettings(ack_mode="processed"))
+    table = pa.table({
+        "transaction_id": [f"r{i}" for i in range(1_000)],
+        "account_id": [f"a{i % 7}" for i in range(1_000)],
+        "timestamp": ["2026-01-01 09:30:00"] * 1_000,
+        "amount": pa.array([None if i == 3 else float(i % 50 + 1) for i in range(1_000)], type=pa.float32()),
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    with TestClient(main.app) as client:
+        response = client.post(
+            "/api/v1/ingest/bulk",
+            content=sink.getvalue().to_pybytes(),
+            headers={"Content-Type": "application/vnd.apache.arrow.stream"},
+        )
+        assert response.json() == {"status": "processed", "accepted": 999, "rejected": 1, "errors": {"amount": [3]}}
+        assert client.get("/api/v1/transactions/r999").json()["timestamp"] == "2026-01-01 09:30:00"
+
+
+@pytest.mark.parametrize("ack_mode", main.ACK_MODES)
+def test_bulk_larger_than_the_queue_is_queued_progressively(monkeypatch: pytest.MonkeyPatch, ack_mode: str) -> None:
+    monkeypatch.setattr(main, "settings", main.IngestSettings(ack_mode=ack_mode, queue_size=20, batch_size=5))
+    columns = {
+        "transaction_id": [f"q{i}" for i in range(53)],
+        "account_id": [f"a{i % 7}" for i in range(53)],
+        "timestamp": ["2026-01-01T00:00:00"] * 53,
+        "amount": [10.0] * 53,
+    }
+    with TestClient(main.app) as client:
+        response = client.post("/api/v1/ingest/bulk", json=columns)
+        assert response.status_code == (200 if ack_mode == "processed" else 202)
+        assert response.json()["accepted"] == 53
+        # The per-request cap still applies to the non-bulk endpoint.
+        too_big = client.post("/api/v1/ingest/batch", json={"transactions": [_txn(i) for i in range(21)]})
+        assert too_big.status_code == 413
+    assert len(main.transactions_store) == 53 and "q52" in main.transactions_store
+    assert main.BATCH_SIZE.series[()][1] == 53
+
+
+def test_metrics_endpoint_exposes_route_histograms_and_sampled_traces(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(main, "settings", main.IngestSettings(ack_mode="processed", trace_sample_rate=1.0))
+    main.request_traces.clear()
+    with TestClient(main.app) as client:
+        client.post("/api/v1/ingest/batch", json={"transactions": [_txn(i, amount=20_000) for i in range(3)]})
+        client.get("/api/v1/transactions/t1")
+        client.get("/api/v1/transactions/missing")
+        response = client.get("/metrics")
+
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        lines = response.text.splitlines()
+        route = 'method="GET",route="/api/v1/transactions/{transaction_id}"'
+        assert f'http_requests_total{{{route},status="200"}} 1' in lines
+        assert f'http_requests_total{{{route},status="404"}} 1' in lines
+        assert f'http_request_duration_seconds_bucket{{{route},le="+Inf"}} 2' in lines
+        assert f"http_request_duration_seconds_count{{{route}}} 2" in lines
+        assert 'ingest_anomalies_total{type="very_high_amount"} 3' in lines
+        assert "ingest_batch_size_count 1" in lines
+        # Buckets are cumulative.
+        bucket = f"http_request_duration_seconds_bucket{{{route}"
+        counts = [int(line.rsplit(" ", 1)[1]) for line in lines if line.startswith(bucket)]
+        assert counts == sorted(counts)
+
+        traces = client.get("/api/v1/traces").json()
+        assert [t["path"] for t in traces[:3]] == ["/api/v1/ingest/batch", "/api/v1/transactions/t1", "/api/v1/transactions/missing"]
@@ -0,0 +1,20 @@
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.bench_pipeline import compare
+
+
+def _run(load_s: float, quality_s: float, peak_mb: float) -> dict:
+    stages = {"load": {"wall_s": load_s}, "quality": {"wall_s": quality_s}}
+    return {"results": [{"n_users": 10_000, "peak_rss_mb": peak_mb, "stages": stages}]}
+
+
+def test_compare_flags_only_material_regressions() -> None:
+    baseline = _run(load_s=2.0, quality_s=0.01, peak_mb=200)
+
+    assert compare(_run(2.1, 0.05, 205)["results"], baseline, threshold=0.10) == []
+    regressions = compare(_run(2.6, 0.05, 260)["results"], baseline, threshold=0.10)
+    assert [line.split(":")[0] for line in regressions] == ["10,000 users peak_rss_mb", "10,000 users load.wall_s"]
+    assert compare(_run(2.6, 0.05, 200)["results"], {"results": []}, threshold=0.10) == []
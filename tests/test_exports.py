@@ -0,0 +1,81 @@
+from pathlib import Path
+import csv
+import gzip
+import json
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from pipeline import exports
+from pipeline.exports import MART_TABLES, export_marts, load_manifest
+
+ROWS = [(i, f"2024-01-{i % 28 + 1:02d}", i * 1.5 if i % 3 else i, None if i % 7 == 0 else "x") for i in range(1, 251)]
+
+
+def _warehouse(path: Path) -> sqlite3.Connection:
+    con = sqlite3.connect(path)
+    for table in MART_TABLES:
+        con.execute(f"CREATE TABLE {table} (id, metric_date, amount, label)")
+        con.executemany(f"INSERT INTO {table} VALUES (?, ?, ?, ?)", ROWS)
+    con.commit()
+    return con
+
+
+def test_export_streams_every_format(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(exports, "EXPORT_BATCH_ROWS", 64)
+    con = _warehouse(tmp_path / "warehouse.sqlite")
+    out_dir = tmp_path / "exports"
+
+    manifest = export_marts(con, ["csv", "csv.gz", "jsonl"], max_workers=4, out_dir=out_dir)
+
+    assert [entry["rows"] for entry in manifest["marts"].values()] == [len(ROWS)] * len(MART_TABLES)
+    with gzip.open(out_dir / "daily_kpis.csv.gz", "rt", newline="") as f:
+        gz_rows = list(csv.reader(f))
+    with (out_dir / "daily_kpis.csv").open(newline="") as f:
+        assert list(csv.reader(f)) == gz_rows
+    assert gz_rows[0] == ["id", "metric_date", "amount", "label"]
+    assert len(gz_rows) == len(ROWS) + 1
+    jsonl = [json.loads(line) for line in (out_dir / "customer_health.jsonl").read_text().splitlines()]
+    assert [tuple(r.values()) for r in jsonl] == ROWS
+    assert not list(out_dir.glob("*.tmp"))
+
+
+def test_parquet_export_uses_widest_storage_class(tmp_path: Path) -> None:
+    pq = pytest.importorskip("pyarrow.parquet")
+    con = _warehouse(tmp_path / "warehouse.sqlite")
+
+    export_marts(con, ["parquet"], max_workers=1, out_dir=tmp_path)
+
+    table = pq.read_table(tmp_path / "daily_kpis.parquet")
+    assert [str(f.type) for f in table.schema] == ["int64", "string", "double", "string"]
+    assert table.column("amount").to_pylist() == [float(r[2]) for r in ROWS]
+
+
+def test_unchanged_marts_are_not_rewritten(tmp_path: Path) -> None:
+    con = _warehouse(tmp_path / "warehouse.sqlite")
+    out_dir = tmp_path / "exports"
+    first = export_marts(con, ["csv", "csv.gz"], out_dir=out_dir)
+    mtimes = {p.name: p.stat().st_mtime_ns for p in out_dir.glob("*.csv*")}
+
+    con.execute("UPDATE marts_daily_kpis SET amount = amount + 1 WHERE id = 5")
+    con.commit()
+    second = export_marts(con, ["csv", "csv.gz"], out_dir=out_dir)
+
+    changed = {name for name, entry in second["marts"].items() if entry["changed"]}
+    assert changed == {"marts_daily_kpis"}
+    assert second["marts"]["marts_customer_health"] == {**first["marts"]["marts_customer_health"], "changed": False}
+    assert second["marts"]["marts_daily_kpis"]["fingerprint"] != first["marts"]["marts_daily_kpis"]["fingerprint"]
+    for name, mtime in mtimes.items():
+        assert (out_dir / name).stat().st_mtime_ns == mtime or name.startswith("daily_kpis")
+    assert load_manifest(out_dir) == second
+
+    (out_dir / "channel_performance.csv.gz").unlink()
+    third = export_marts(con, ["csv", "csv.gz"], out_dir=out_dir)
+    assert {name for name, entry in third["marts"].items() if entry["changed"]} == {"marts_channel_performance"}
+    forced = export_marts(con, ["csv", "csv.gz"], out_dir=out_dir, force=True)
+    assert all(entry["changed"] for entry in forced["marts"].values())
+    # gzip output is reproducible, so identical content hashes identically.
+    assert forced["marts"]["marts_daily_kpis"]["files"] == second["marts"]["marts_daily_kpis"]["files"]
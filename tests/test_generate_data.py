@@ -0,0 +1,230 @@
+from dataclasses import replace
+from datetime import datetime, timedelta
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline import generate_data
+from pipeline.generate_data import (
+    BLOCK_ID_STRIDE,
+    GeneratorConfig,
+    build_events,
+    build_payments,
+    build_support_tickets,
+    build_users,
+    iter_raw_chunks,
+)
+
+
+def _cfg(**overrides: object) -> GeneratorConfig:
+    params: dict[str, object] = {
+        "random_seed": 7,
+        "days_back": 60,
+        "n_users": 250,
+        "avg_events_per_user": 10,
+        "avg_tickets_per_user": 0.5,
+    }
+    params.update(overrides)
+    return GeneratorConfig(**params)
+
+
+def test_build_events_is_deterministic_per_seed() -> None:
+    cfg = _cfg()
+    users = build_users(cfg)
+    first = build_events(users, cfg)
+    second = build_events(users, cfg)
+    pd.testing.assert_frame_equal(first, second)
+    assert first["event_id"].is_unique
+    assert set(first["user_id"]) <= set(users["user_id"])
+
+
+def test_chunks_have_unique_block_keys() -> None:
+    cfg = _cfg(chunk_size=60, block_size=50)
+    chunks = list(iter_raw_chunks(cfg))
+    # 60 users round up to two 50-user blocks.
+    assert len(chunks) == 3
+
+    users, events, payments, tickets = (pd.concat(parts, ignore_index=True) for parts in zip(*chunks))
+    assert sorted(users["user_id"]) == list(range(1, cfg.n_users + 1))
+    for frame, key in ((events, "event_id"), (payments, "payment_id"), (tickets, "ticket_id")):
+        assert frame[key].is_unique
+        # Contiguous from 1 within each block.
+        for _, local in (frame[key] % BLOCK_ID_STRIDE).groupby(frame[key] // BLOCK_ID_STRIDE):
+            assert sorted(local) == list(range(1, len(local) + 1))
+
+
+def test_parallel_generation_is_reproducible(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    cfg = _cfg(workers=2)
+    outputs = []
+    for run_dir in (tmp_path / "a", tmp_path / "b"):
+        monkeypatch.setattr(generate_data, "RAW_DIR", run_dir)
+        generate_data.generate_raw_data(cfg)
+        outputs.append(pd.read_csv(run_dir / "events.csv").drop(columns=["event_ts"]))
+
+    pd.testing.assert_frame_equal(outputs[0], outputs[1])
+    assert outputs[0]["event_id"].is_unique
+    assert not (tmp_path / "a" / generate_data.PARTS_DIR_NAME).exists()
+
+
+def test_parquet_raw_layer_round_trips_typed_columns(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    pytest.importorskip("pyarrow")
+    from pipeline import sql_runner
+
+    monkeypatch.setattr(generate_data, "RAW_DIR", tmp_path)
+    monkeypatch.setattr(sql_runner, "RAW_DIR", tmp_path)
+    generate_data.generate_raw_data(_cfg(raw_format="parquet", chunk_size=100, block_size=50))
+
+    events = sql_runner.read_raw_table("raw_events", raw_format="parquet")
+    assert len(list((tmp_path / "events").glob("part-*.parquet"))) == 3
+    assert events["event_id"].is_unique
+    assert pd.api.types.is_datetime64_any_dtype(events["event_ts"])
+    assert isinstance(events["event_type"].dtype, pd.CategoricalDtype)
+
+
+@pytest.mark.parametrize(
+    "layout",
+    [{"chunk_size": 50}, {"chunk_size": 120}, {"workers": 2}, {"workers": 3, "chunk_size": 100}],
+    ids=["chunks-of-1", "chunks-of-3", "2-workers", "3-workers-chunked"],
+)
+def test_same_seed_writes_same_rows_for_any_layout(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, layout: dict[str, int]
+) -> None:
+    cfg = _cfg(block_size=40, reference_date="2026-02-01")
+    contents = []
+    for run_dir, run_cfg in ((tmp_path / "single", cfg), (tmp_path / "layout", replace(cfg, **layout))):
+        monkeypatch.setattr(generate_data, "RAW_DIR", run_dir)
+        generate_data.generate_raw_data(run_cfg)
+        contents.append({table: (run_dir / f"{table}.csv").read_bytes() for table in generate_data.RAW_TABLES})
+    assert contents[0] == contents[1]
+
+
+def test_same_day_regeneration_writes_identical_files(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(generate_data, "RAW_DIR", tmp_path)
+    contents = []
+    for _ in range(2):
+        generate_data.generate_raw_data(_cfg())
+        contents.append({table: (tmp_path / f"{table}.csv").read_bytes() for table in generate_data.RAW_TABLES})
+    assert contents[0] == contents[1]
+
+    generate_data.generate_raw_data(_cfg(reference_date="2025-06-30"))
+    events = pd.read_csv(tmp_path / "events.csv", parse_dates=["event_ts"])
+    assert events["event_ts"].max() < pd.Timestamp("2025-06-30")
+
+
+def _baseline_timestamps(rng, start_dt, end_dt, count: int) -> pd.DatetimeIndex:
+    offsets = rng.integers(0, max(int((end_dt - start_dt).total_seconds()), 1), size=count)
+    return pd.to_datetime([start_dt + timedelta(seconds=int(o)) for o in offsets])
+
+
+def _baseline_events(users: pd.DataFrame, cfg: GeneratorConfig, end_dt: datetime) -> pd.DataFrame:
+    """The per-row loop build_events replaced, kept as the statistical reference."""
+    rng = np.random.default_rng(cfg.random_seed + 1)
+    uplift = users["plan_tier"].map({"free": 0, "pro": 5, "enterprise": 11}).to_numpy()
+    n_events_per_user = np.clip(rng.poisson(lam=cfg.avg_events_per_user, size=len(users)) + uplift, 4, None)
+    rows = []
+    for user, n_events in zip(users.itertuples(index=False), n_events_per_user):
+        for ts in _baseline_timestamps(rng, user.signup_ts.to_pydatetime(), end_dt, int(n_events)).sort_values():
+            event_type = rng.choice(
+                ["session_start", "feature_used", "trial_started", "subscription_started", "churned"],
+                p=[0.60, 0.25, 0.06, 0.06, 0.03],
+            )
+            exp_name = "new_onboarding" if rng.random() < 0.72 else None
+            rows.append(
+                {
+                    "event_id": len(rows) + 1,
+                    "user_id": user.user_id,
+                    "event_ts": ts,
+                    "event_type": event_type,
+                    "experiment_name": exp_name,
+                    "experiment_variant": rng.choice(["A", "B"]) if exp_name else None,
+                    "session_duration_sec": int(rng.integers(20, 3600)) if event_type == "session_start" else None,
+                }
+            )
+    return pd.DataFrame(rows)
+
+
+def _baseline_payments(users: pd.DataFrame, cfg: GeneratorConfig, end_dt: datetime) -> pd.DataFrame:
+    rng = np.random.default_rng(cfg.random_seed + 2)
+    rows = []
+    for user in users[users["plan_tier"].isin(["pro", "enterprise"])].itertuples(index=False):
+        signup_dt = user.signup_ts.to_pydatetime()
+        n_invoices = max(1, max((end_dt - signup_dt).days, 1) // 30 + int(rng.integers(0, 2)))
+        base_price = 49.0 if user.plan_tier == "pro" else 199.0
+        for ts in _baseline_timestamps(rng, signup_dt, end_dt, n_invoices).sort_values():
+            rows.append(
+                {
+                    "payment_id": len(rows) + 1,
+                    "user_id": user.user_id,
+                    "payment_ts": ts,
+                    "payment_status": rng.choice(["success", "refund", "failed"], p=[0.91, 0.05, 0.04]),
+                    "amount_usd": round(max(5.0, float(base_price + rng.normal(0, base_price * 0.12))), 2),
+                }
+            )
+    return pd.DataFrame(rows)
+
+
+def _baseline_tickets(users: pd.DataFrame, cfg: GeneratorConfig, end_dt: datetime) -> pd.DataFrame:
+    rng = np.random.default_rng(cfg.random_seed + 3)
+    n_tickets = int(len(users) * cfg.avg_tickets_per_user)
+    user_ids = rng.choice(users["user_id"].to_numpy(), size=n_tickets, replace=True)
+    created_ts = _baseline_timestamps(rng, end_dt - timedelta(days=cfg.days_back), end_dt, n_tickets)
+    hours = rng.integers(2, 96, size=n_tickets)
+    unresolved = rng.random(n_tickets) < 0.14
+    resolved_ts = [pd.NaT if u else c + pd.Timedelta(hours=int(h)) for c, h, u in zip(created_ts, hours, unresolved)]
+    return pd.DataFrame({"ticket_id": np.arange(1, n_tickets + 1), "user_id": user_ids, "resolved_ts": resolved_ts})
+
+
+def _shares(series: pd.Series) -> pd.Series:
+    return series.value_counts(normalize=True, dropna=False)
+
+
+def test_vectorized_builders_match_baseline_distributions() -> None:
+    cfg = _cfg(n_users=400, avg_tickets_per_user=4.0, days_back=120, reference_date="2026-02-01")
+    end_dt = generate_data._end_dt(cfg)
+    users = build_users(cfg)
+    pairs = {
+        "events": (build_events(users, cfg), _baseline_events(users, cfg, end_dt)),
+        "payments": (build_payments(users, cfg), _baseline_payments(users, cfg, end_dt)),
+        "tickets": (build_support_tickets(users, cfg), _baseline_tickets(users, cfg, end_dt)),
+    }
+
+    for name, (new, old) in pairs.items():
+        assert len(new) == pytest.approx(len(old), rel=0.05), name
+        key = new.columns[0]
+        assert new[key].is_unique and old[key].is_unique, name
+        # Share of rows repeating a user's timestamp; collisions are rare but possible.
+        ts = new.columns[2]
+        if name != "tickets":
+            assert new.duplicated(["user_id", ts]).mean() == pytest.approx(
+                old.duplicated(["user_id", ts]).mean(), abs=0.005
+            ), name
+
+    events, old_events = pairs["events"]
+    pd.testing.assert_series_equal(
+        _shares(events["event_type"]).sort_index(), _shares(old_events["event_type"]).sort_index(), atol=0.02
+    )
+    for col in ("experiment_name", "experiment_variant", "session_duration_sec"):
+        assert events[col].isna().mean() == pytest.approx(old_events[col].isna().mean(), abs=0.02), col
+
+    payments, old_payments = pairs["payments"]
+    # Amounts relative to the plan's list price, so the pro/enterprise mix does not dominate the tails.
+    base_price = users.set_index("user_id")["plan_tier"].map({"pro": 49.0, "enterprise": 199.0})
+    quantiles = [0.05, 0.25, 0.5, 0.75, 0.95]
+    np.testing.assert_allclose(
+        (payments["amount_usd"] / payments["user_id"].map(base_price)).quantile(quantiles),
+        (old_payments["amount_usd"] / old_payments["user_id"].map(base_price)).quantile(quantiles),
+        rtol=0.03,
+    )
+    pd.testing.assert_series_equal(
+        _shares(payments["payment_status"]).sort_index(),
+        _shares(old_payments["payment_status"]).sort_index(),
+        atol=0.03,
+    )
+
+    tickets, old_tickets = pairs["tickets"]
+    assert tickets["resolved_ts"].isna().mean() == pytest.approx(old_tickets["resolved_ts"].isna().mean(), abs=0.03)
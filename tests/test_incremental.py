@@ -0,0 +1,110 @@
+from pathlib import Path
+import sqlite3
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from pipeline.generate_data import GeneratorConfig, build_events, build_payments, build_support_tickets, build_users
+from pipeline.config import SQL_FOLDERS
+from pipeline.incremental import run_incremental
+from pipeline.sql_runner import STAGING_INDEXES, execute_sql_folders
+
+
+def _raw_frames(reference_date: str | None = None) -> dict:
+    cfg = GeneratorConfig(
+        random_seed=11,
+        days_back=30,
+        n_users=200,
+        avg_events_per_user=8,
+        avg_tickets_per_user=0.5,
+        reference_date=reference_date,
+    )
+    users = build_users(cfg)
+    return {
+        "raw_users": (users, "user_id"),
+        "raw_events": (build_events(users, cfg), "event_id"),
+        "raw_payments": (build_payments(users, cfg), "payment_id"),
+        "raw_support_tickets": (build_support_tickets(users, cfg), "ticket_id"),
+    }
+
+
+def _rows(df: pd.DataFrame):
+    """Frame rows as Python values, with timestamps as SQLite text and missing values as None."""
+    for col in df.select_dtypes("datetime64").columns:
+        df[col] = df[col].dt.strftime("%Y-%m-%d %H:%M:%S")
+    return df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+
+
+def _load(con: sqlite3.Connection, frames: dict, keep) -> None:
+    for table, (df, key) in frames.items():
+        part = df[keep(df[key], df[key].median())]
+        columns = list(part.columns)
+        con.execute(f"DROP TABLE IF EXISTS {table}")
+        con.execute(f"CREATE TABLE {table} ({', '.join(columns)})")
+        con.executemany(f"INSERT INTO {table} VALUES ({', '.join('?' for _ in columns)})", _rows(part.copy()))
+    con.commit()
+
+
+def test_incremental_daily_kpis_match_full_rebuild() -> None:
+    frames = _raw_frames()
+
+    incremental = sqlite3.connect(":memory:")
+    _load(incremental, frames, lambda key, cut: key <= cut)
+    run_incremental(incremental, SQL_FOLDERS, indexes=STAGING_INDEXES)
+    _load(incremental, frames, lambda key, cut: key > cut)
+    run_incremental(incremental, SQL_FOLDERS, indexes=STAGING_INDEXES)
+
+    full = sqlite3.connect(":memory:")
+    _load(full, frames, lambda key, cut: key == key)
+    execute_sql_folders(full, SQL_FOLDERS)
+
+    query = "SELECT * FROM marts_daily_kpis ORDER BY metric_date"
+    assert incremental.execute(query).fetchall() == full.execute(query).fetchall()
+    for table in ("staging_events", "staging_payments"):
+        count = f"SELECT COUNT(*) FROM {table}"
+        assert incremental.execute(count).fetchone() == full.execute(count).fetchone()
+
+
+def test_unchanged_raw_history_plus_new_rows_is_appended(capsys) -> None:
+    frames = _raw_frames()
+
+    incremental = sqlite3.connect(":memory:")
+    _load(incremental, frames, lambda key, cut: key <= cut)
+    run_incremental(incremental, SQL_FOLDERS, indexes=STAGING_INDEXES)
+    capsys.readouterr()
+    _load(incremental, frames, lambda key, cut: key == key)
+    run_incremental(incremental, SQL_FOLDERS, indexes=STAGING_INDEXES)
+    assert "rebuilding" not in capsys.readouterr().out
+
+    marks = incremental.execute("SELECT check_from, high_water_mark FROM _pipeline_watermarks").fetchall()
+    assert all(check_from < mark <= check_from + 1000 for check_from, mark in marks)
+    full = sqlite3.connect(":memory:")
+    _load(full, frames, lambda key, cut: key == key)
+    execute_sql_folders(full, SQL_FOLDERS)
+    query = "SELECT * FROM marts_daily_kpis ORDER BY metric_date"
+    assert incremental.execute(query).fetchall() == full.execute(query).fetchall()
+
+
+def test_regenerated_raw_history_is_rebuilt_not_appended() -> None:
+    everything = lambda key, cut: key == key  # noqa: E731
+    query = "SELECT * FROM marts_daily_kpis ORDER BY metric_date"
+
+    incremental = sqlite3.connect(":memory:")
+    _load(incremental, _raw_frames("2026-03-01"), everything)
+    run_incremental(incremental, SQL_FOLDERS, indexes=STAGING_INDEXES)
+    # A later day's regeneration reuses ids 1..n for different rows.
+    regenerated = _raw_frames("2026-03-08")
+    for _ in range(2):
+        _load(incremental, regenerated, everything)
+        run_incremental(incremental, SQL_FOLDERS, indexes=STAGING_INDEXES)
+
+    full = sqlite3.connect(":memory:")
+    _load(full, regenerated, everything)
+    execute_sql_folders(full, SQL_FOLDERS)
+
+    assert incremental.execute(query).fetchall() == full.execute(query).fetchall()
+    for table in ("staging_users", "staging_events", "staging_payments", "staging_support_tickets"):
+        count = f"SELECT COUNT(*) FROM {table}"
+        assert incremental.execute(count).fetchone() == full.execute(count).fetchone()
@@ -0,0 +1,33 @@
+from pathlib import Path
+import json
+import sqlite3
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from pipeline.metrics import RunMetrics
+from pipeline.sql_dag import discover_models, run_models
+
+
+def test_run_metrics_records_stages_models_and_plans(tmp_path: Path) -> None:
+    (tmp_path / "01_staging_a.sql").write_text("DROP TABLE IF EXISTS staging_a;\nCREATE TABLE staging_a AS SELECT x FROM src;\n")
+    (tmp_path / "02_marts_b.sql").write_text(
+        "DROP TABLE IF EXISTS marts_b;\nCREATE TABLE marts_b AS SELECT x % 2 AS k, COUNT(*) AS n FROM staging_a GROUP BY 1;\n"
+    )
+    con = sqlite3.connect(":memory:")
+    con.execute("CREATE TABLE src (x INTEGER)")
+    con.executemany("INSERT INTO src VALUES (?)", [(i,) for i in range(10)])
+
+    metrics = RunMetrics()
+    with metrics.stage("sql_models") as stage:
+        models = discover_models([tmp_path])
+        timings = run_models(con, models)
+    stage.rows_out = metrics.record_models(con, models, timings)
+    report = json.loads(metrics.write(tmp_path / "run_metrics.json").read_text())
+
+    assert [s["name"] for s in report["stages"]] == ["sql_models"]
+    assert report["stages"][0]["rows_out"] == 12
+    by_name = {m["name"]: m for m in report["models"]}
+    assert (by_name["staging_a"]["rows_in"], by_name["staging_a"]["rows_out"]) == (10, 10)
+    assert by_name["staging_a"]["query_plan"] == []
+    assert any("staging_a" in line for line in by_name["marts_b"]["query_plan"])
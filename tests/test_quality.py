@@ -0,0 +1,85 @@
+from pathlib import Path
+import sqlite3
+import sys
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from pipeline.quality import QUALITY_CHECKS, ApproximateCheck, compile_table_checks, run_checks
+from pipeline.sketches import HyperLogLog
+
+# The per-check queries the fused engine replaced.
+LEGACY_QUERIES = {
+    "duplicate_user_ids": "SELECT COUNT(*) FROM (SELECT user_id FROM staging_users GROUP BY user_id HAVING COUNT(*) > 1)",
+    "null_event_timestamp": "SELECT COUNT(*) FROM staging_events WHERE event_ts IS NULL",
+    "negative_payment_amount": "SELECT COUNT(*) FROM staging_payments WHERE amount_usd < 0",
+    "daily_kpi_not_empty": "SELECT CASE WHEN COUNT(*) > 0 THEN 0 ELSE 1 END FROM marts_daily_kpis",
+    "conversion_rate_range": "SELECT COUNT(*) FROM marts_daily_kpis WHERE conversion_rate < 0 OR conversion_rate > 1",
+}
+
+
+def _warehouse(path: Path | str, kpis: list[tuple]) -> sqlite3.Connection:
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE staging_users (user_id INTEGER)")
+    con.executemany("INSERT INTO staging_users VALUES (?)", [(1,), (2,), (2,), (3,), (3,), (3,), (None,), (None,)])
+    con.execute("CREATE TABLE staging_events (event_ts TEXT)")
+    con.executemany("INSERT INTO staging_events VALUES (?)", [("2024-01-01",), (None,), (None,)])
+    con.execute("CREATE TABLE staging_payments (amount_usd REAL)")
+    con.executemany("INSERT INTO staging_payments VALUES (?)", [(-1.0,), (5.0,)])
+    con.execute("CREATE TABLE marts_daily_kpis (conversion_rate REAL)")
+    con.executemany("INSERT INTO marts_daily_kpis VALUES (?)", kpis)
+    con.commit()
+    return con
+
+
+def test_fused_checks_match_per_check_queries(tmp_path: Path) -> None:
+    for con in (
+        _warehouse(tmp_path / "warehouse.sqlite", [(0.5,), (1.5,), (-0.1,)]),
+        _warehouse(":memory:", []),
+    ):
+        results = run_checks(con, max_workers=4)
+        expected = {name: con.execute(query).fetchone()[0] for name, query in LEGACY_QUERIES.items()}
+        assert {r["check"]: r["fail_count"] for r in results} == expected
+        assert [r["check"] for r in results] == [c.name for c in QUALITY_CHECKS]
+
+
+def test_checks_compile_to_one_query_per_table() -> None:
+    sql = compile_table_checks("marts_daily_kpis", [c for c in QUALITY_CHECKS if c.table == "marts_daily_kpis"])
+    assert sql.count("FROM") == 1
+    assert "daily_kpi_not_empty" in sql and "conversion_rate_range" in sql
+
+
+def test_approximate_checks_bound_the_exact_counts(tmp_path: Path) -> None:
+    con = sqlite3.connect(tmp_path / "warehouse.sqlite")
+    con.execute("CREATE TABLE staging_events (user_id INTEGER, amount REAL)")
+    rows = [(i % 40_000, -1.0 if i % 50 == 0 else float(i)) for i in range(100_000)]
+    con.executemany("INSERT INTO staging_events VALUES (?, ?)", rows)
+    con.commit()
+    checks = [
+        ApproximateCheck("dupes", "staging_events", "distinct", "user_id", error_budget=0.01, max_fail_count=100_000),
+        ApproximateCheck("negatives", "staging_events", "sample", "amount < 0", error_budget=0.01, max_fail_count=1),
+        ApproximateCheck("range", "staging_events", "range", "amount", min_value=0, error_budget=0.01),
+        ApproximateCheck("in_range", "staging_events", "range", "amount", min_value=-1, max_value=100_000),
+    ]
+
+    results = {r["check"]: r for r in run_checks(con, checks, seed=7)}
+
+    assert results["dupes"]["lower"] <= 60_000 <= results["dupes"]["upper"]
+    assert results["dupes"]["status"] == "PASS"
+    assert results["negatives"]["lower"] <= 2_000 <= results["negatives"]["upper"]
+    assert results["negatives"]["sample_rows"] < 20_000
+    assert results["negatives"]["status"] == "FAIL"
+    # Range failures are counted in rows, like the exact check, not in violated bounds.
+    assert results["range"]["lower"] <= 2_000 <= results["range"]["upper"]
+    assert abs(results["range"]["fail_count"] - 2_000) < 1_000 and results["range"]["observed_min"] == -1.0
+    assert (results["in_range"]["fail_count"], results["in_range"]["status"]) == (0, "PASS")
+    assert all(r["mode"] == "approximate" for r in results.values())
+
+
+def test_hyperloglog_estimate_within_error_budget() -> None:
+    sketch = HyperLogLog.for_error(0.01)
+    for start in range(0, 500_000, 100_000):
+        sketch.add(np.arange(start, start + 100_000))
+    sketch.add(np.arange(1_000))
+    assert abs(sketch.estimate() / 500_000 - 1) < 3 * sketch.relative_error
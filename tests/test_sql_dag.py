@@ -0,0 +1,37 @@
+from pathlib import Path
+import sqlite3
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from pipeline.config import SQL_FOLDERS
+from pipeline.sql_dag import discover_models, run_models
+
+
+
+def test_discover_models_resolves_dependencies() -> None:
+    models = discover_models(SQL_FOLDERS)
+    assert models["staging_events"].depends_on == set()
+    assert models["int_user_facts"].depends_on == {
+        "staging_users", "staging_events", "staging_payments", "staging_support_tickets"
+    }
+    assert models["marts_channel_performance"].depends_on == {"int_user_facts"}
+    assert models["marts_experiment_performance"].depends_on == {"staging_events", "int_user_facts"}
+
+
+def test_run_models_builds_in_dependency_order(tmp_path: Path) -> None:
+    (tmp_path / "01_a.sql").write_text("DROP TABLE IF EXISTS a;\nCREATE TABLE a AS SELECT x FROM src;\n")
+    (tmp_path / "02_b.sql").write_text("DROP TABLE IF EXISTS b;\nCREATE TABLE b AS SELECT SUM(x) AS total FROM a;\n")
+    (tmp_path / "03_c.sql").write_text("DROP TABLE IF EXISTS c;\nCREATE TABLE c AS SELECT COUNT(*) AS n FROM src;\n")
+
+    con = sqlite3.connect(tmp_path / "warehouse.sqlite")
+    con.execute("CREATE TABLE src (x INTEGER)")
+    con.executemany("INSERT INTO src VALUES (?)", [(1,), (2,), (3,)])
+    con.commit()
+
+    timings = run_models(con, discover_models([tmp_path]), max_workers=3)
+
+    assert set(timings) == {"a", "b", "c"}
+    assert con.execute("SELECT total FROM b").fetchone() == (6,)
+    assert con.execute("SELECT n FROM c").fetchone() == (3,)
+    assert con.execute("SELECT COUNT(*) FROM sqlite_temp_master").fetchone() == (0,)
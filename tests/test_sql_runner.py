@@ -0,0 +1,120 @@
+from pathlib import Path
+import sqlite3
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from pipeline import generate_data, sql_runner
+from pipeline.config import SQL_FOLDERS
+from pipeline.metrics import query_plan
+from pipeline.sql_dag import discover_models
+from pipeline.sql_runner import (
+    RAW_TABLES,
+    STAGING_INDEXES,
+    create_indexes,
+    execute_sql_folders,
+    load_raw_tables,
+    record_fingerprint,
+)
+
+
+def _write_models(folder: Path, b_sql: str = "SUM(x)") -> None:
+    (folder / "01_a.sql").write_text("DROP TABLE IF EXISTS a;\nCREATE TABLE a AS SELECT x FROM src;\n")
+    (folder / "02_b.sql").write_text(f"DROP TABLE IF EXISTS b;\nCREATE TABLE b AS SELECT {b_sql} AS total FROM a;\n")
+    (folder / "03_c.sql").write_text("DROP TABLE IF EXISTS c;\nCREATE TABLE c AS SELECT COUNT(*) AS n FROM src;\n")
+    (folder / "04_d.sql").write_text("DROP TABLE IF EXISTS d;\nCREATE TABLE d AS SELECT datetime('now') AS ts, n FROM c;\n")
+
+
+def _load_src(con: sqlite3.Connection, version: str) -> None:
+    con.execute("DROP TABLE IF EXISTS src")
+    con.execute("CREATE TABLE src (x INTEGER)")
+    con.executemany("INSERT INTO src VALUES (?)", [(1,), (2,), (3,)])
+    record_fingerprint(con, "src", version)
+    con.commit()
+
+
+def test_unchanged_models_are_served_from_cache(tmp_path: Path) -> None:
+    models_dir = tmp_path / "models"
+    models_dir.mkdir()
+    _write_models(models_dir)
+    con = sqlite3.connect(tmp_path / "warehouse.sqlite")
+    _load_src(con, "v1")
+
+    assert set(execute_sql_folders(con, [models_dir])) == {"a", "b", "c", "d"}
+    # Only the volatile model reruns when nothing changed.
+    assert set(execute_sql_folders(con, [models_dir])) == {"d"}
+
+    _write_models(models_dir, b_sql="SUM(x) * 2")
+    assert set(execute_sql_folders(con, [models_dir])) == {"b", "d"}
+    assert con.execute("SELECT total FROM b").fetchone() == (12,)
+
+    _load_src(con, "v2")
+    assert set(execute_sql_folders(con, [models_dir])) == {"a", "b", "c", "d"}
+
+    con.execute("DROP TABLE c")
+    assert set(execute_sql_folders(con, [models_dir])) == {"c", "d"}
+    assert set(execute_sql_folders(con, [models_dir], force=True)) == {"a", "b", "c", "d"}
+
+
+def test_unfingerprinted_inputs_are_never_cached(tmp_path: Path) -> None:
+    _write_models(tmp_path)
+    con = sqlite3.connect(":memory:")
+    con.execute("CREATE TABLE src (x INTEGER)")
+
+    execute_sql_folders(con, [tmp_path])
+    assert set(execute_sql_folders(con, [tmp_path])) == {"a", "b", "c", "d"}
+
+
+def test_recent_sessions_window_prunes_to_recent_event_dates() -> None:
+    con = sqlite3.connect(":memory:")
+    con.execute(
+        "CREATE TABLE staging_events (event_id, user_id, event_ts, event_date, event_type, "
+        "feature_name, experiment_name, experiment_variant, session_duration_sec)"
+    )
+    event_types = ["session_start", "feature_used", "feature_used", "page_view", "page_view", "page_view"]
+    con.executemany(
+        "INSERT INTO staging_events (user_id, event_ts, event_date, event_type) VALUES (?, ?, DATE(?), ?)",
+        [
+            (i % 50, ts, ts, event_types[i % len(event_types)])
+            for i, ts in enumerate(f"2020-{m:02d}-{d:02d} 12:00:00" for m in range(1, 13) for d in range(1, 29))
+        ],
+    )
+    create_indexes(con, [spec for spec in STAGING_INDEXES if spec.table == "staging_events"])
+
+    plan = query_plan(con, discover_models(SQL_FOLDERS)["int_user_recent_sessions"].select_sql)
+    assert any("COVERING INDEX" in line and "event_date>?" in line for line in plan), plan
+
+
+def _table_rows(con: sqlite3.Connection, table: str) -> list[tuple]:
+    return sorted(con.execute(f"SELECT * FROM {table}").fetchall(), key=repr)
+
+
+@pytest.mark.parametrize("raw_format", generate_data.RAW_FORMATS)
+def test_streamed_load_matches_to_sql(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, raw_format: str) -> None:
+    if raw_format == "parquet":
+        pytest.importorskip("pyarrow")
+    for fmt, module in (("csv", generate_data), (raw_format, sql_runner)):
+        monkeypatch.setattr(module, "RAW_DIR", tmp_path / fmt)
+        (tmp_path / fmt).mkdir(exist_ok=True)
+    cfg = generate_data.GeneratorConfig(
+        random_seed=11, days_back=30, n_users=120, avg_events_per_user=8, avg_tickets_per_user=0.5, reference_date="2026-01-15"
+    )
+    generate_data.generate_raw_data(cfg)
+    if raw_format == "parquet":
+        monkeypatch.setattr(generate_data, "RAW_DIR", tmp_path / raw_format)
+        generate_data.generate_raw_data(generate_data.GeneratorConfig(**{**cfg.__dict__, "raw_format": "parquet"}))
+
+    # The loader this replaced: pandas.read_csv + DataFrame.to_sql.
+    expected = sqlite3.connect(":memory:")
+    for table_name, (source, _) in RAW_TABLES.items():
+        pd.read_csv(tmp_path / "csv" / f"{source}.csv").to_sql(table_name, expected, index=False)
+
+    con = sqlite3.connect(tmp_path / "warehouse.sqlite")
+    counts = load_raw_tables(con, raw_format=raw_format)
+    for table_name in RAW_TABLES:
+        rows = _table_rows(con, table_name)
+        assert counts[table_name] == len(rows)
+        assert rows == _table_rows(expected, table_name), table_name